@@ -1,55 +1,105 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-import threading
-import json
 import time
 import datetime
 import random
 from pathlib import Path
-from typing import List, Dict, Optional, Any
-
-from PIL import Image, ImageTk
+from typing import List, Dict, Tuple, Optional, Any, Callable, TYPE_CHECKING
 
 from app.models.question_model import Question
+from app.models.session_model import QuizSession
 from app.services.settings_manager import SettingsManager
 from app.services.config_manager import ConfigManager
 from app.services.srs_manager import SRSManager
 from app.services.app_data_manager import AppDataManager
-from app.services.text_processing import TextFileParser, SimilarityAnalyser
+from app.services.deck_registry import DeckRegistry
+from app.services.text_processing import SimilarityAnalyser
+from app.services.similarity_cache import SimilarityCache
+from app.services.deck_cache import DeckCache
+from app.services.analytics_snapshot import AnalyticsSnapshot
+from app.services.image_cache import ImageCache, ImagePrefetcher, ImageResizer
+from app.services.thumbnail_cache import ThumbnailCache
+from app.services.job_executor import Job, JobExecutor
 from app.views.main_view import MainView
-from app.views.practice_view import PracticeView
-from app.views.results_view import ResultsView
 from app.views.dialogs import SubjectSelectionDialog, LoadingView
 from app.views.settings_view import SettingsView
-from app.views.analysis_view import AnalysisView
-from tools import image_snipper, text_formatter, pdf_merger
+
+# PIL, le viste delle sessioni, la finestra di analisi (matplotlib) e gli strumenti (PyPDF2) vengono importati
+# al primo utilizzo della schermata o della voce di menu corrispondente: all'avvio serve solo la dashboard
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+    from app.views.practice_view import PracticeView
+    from app.views.results_view import ResultsView
 
 
 class QuizController:
     def __init__(self, root: MainView, settings_manager: SettingsManager, config_manager: ConfigManager):
         self.root = root
+        # Tutto il lavoro in background passa dall'esecutore condiviso: le sue callback arrivano nel thread di Tk
+        self.jobs = JobExecutor.instance()
+        self.jobs.attach(root)
         self.settings_manager = settings_manager
         self.config_manager = config_manager
         self.app_data_manager = AppDataManager(self.settings_manager, self.config_manager)
+        # Un solo gestore SRS per materia, condiviso tra dashboard, analisi e sessioni
+        self.deck_registry = DeckRegistry(self.app_data_manager, self.settings_manager, self.config_manager)
+        # Statistiche della finestra di analisi, materializzate su disco e aggiornate a ogni ripasso
+        self.analytics_snapshot = AnalyticsSnapshot(self.deck_registry)
         self.srs_manager: Optional[SRSManager] = None
         self.current_subject = ""
         self.all_questions: List[Question] = []
         self.active_questions: List[Question] = []
+        self.session: Optional[QuizSession] = None
         self.image_base_path: Optional[Path] = None
         self.current_question_index = 0
-        self.image_cache: Dict[Path, Image.Image] = {}
+        # Immagini decodificate della sessione (LRU con budget in byte) e caricamento anticipato attorno al cursore
+        self.image_cache = ImageCache()
+        self.image_prefetcher: Optional[ImagePrefetcher] = None
+        self.image_resizer: Optional[ImageResizer] = None
+        self.question_image_paths: List[Optional[Path]] = []
+        # Miniature su disco della cartella immagini corrente, create al bisogno e in blocco per il riquadro in uso
+        self.thumbnail_cache: Optional[ThumbnailCache] = None
+        self._thumbnail_batch_box: Optional[Tuple[int, int]] = None
+        self._thumbnail_job: Optional[Job] = None
         self.timer_id: Optional[str] = None
         self.current_mode = ""
-        self.practice_view: Optional[PracticeView] = None
-        self.results_view: Optional[ResultsView] = None
+        self.practice_view: Optional['PracticeView'] = None
+        self.results_view: Optional['ResultsView'] = None
         self.question_start_time = 0.0
         self.srs_session_results: List[bool] = []
+        self._dashboard_job: Optional[Job] = None
+        # Preparazione all'avvio: (paniere, modalità di similarità) -> lavoro nel pool di processi, finché una sessione
+        # non lo usa; e il lavoro che carica i deck uno dopo l'altro
+        self._warmup_jobs: Dict[Tuple[Path, str], Job] = {}
+        self._warmup_deck_job: Optional[Job] = None
 
     def update_dashboard_and_srs_status(self):
-        """Aggiorna la dashboard con statistiche fresche e lo stato dei ripassi."""
+        """
+        Aggiorna la dashboard con statistiche fresche e lo stato dei ripassi. I conteggi per materia (che possono
+        richiedere di caricare i deck) vengono calcolati in un lavoro in background che riporta l'avanzamento
+        materia per materia, così la dashboard resta interattiva.
+        """
         subjects = self.settings_manager.get_subjects(status_filter="In Corso")
-        total_due = 0
-        total_leech = 0
+        # I risultati di un aggiornamento superato da uno più recente vengono scartati
+        if self._dashboard_job: self._dashboard_job.cancel()
+        self._dashboard_job = self.jobs.submit(self._dashboard_worker, subjects, name="dashboard stats",
+                                               on_progress=self.root.show_dashboard_progress, on_done=self._finish_dashboard_update)
+
+    def _dashboard_worker(self, job: Job, subjects: List[str]) -> Dict[str, Any]:
+        counts: Dict[str, Any] = {}
+        for done, subject in enumerate(subjects, 1):
+            if job.cancelled: break
+            try:
+                # Conteggi memorizzati dal registro: ricalcolati solo se il deck o il giorno sono cambiati
+                counts[subject] = self.deck_registry.get_counts(subject)
+            except Exception as e:
+                print(f"Impossibile calcolare i conteggi di {subject}: {e}")
+                counts[subject] = (0, 0)
+            job.progress(done, len(subjects), subject)
+        return counts
+
+    def _finish_dashboard_update(self, counts: Dict[str, Any]):
+        subjects = list(counts)
         next_exam_date = None
         next_exam_subj = ""
 
@@ -62,9 +112,8 @@ class QuizController:
                     next_exam_subj = subject
             except (ValueError, TypeError):
                 pass
-            srs_manager = SRSManager(subject, None, 1.0, self.app_data_manager, self.settings_manager, self.config_manager)
-            total_due += len(srs_manager.get_due_questions())
-            total_leech += len(srs_manager.get_leech_questions())
+        total_due = sum(due for due, _ in counts.values())
+        total_leech = sum(leeches for _, leeches in counts.values())
 
         suggestion = f"Prossimo esame: {next_exam_subj}." if next_exam_subj else "Nessun esame imminente. Ottimo per un ripasso generale!"
         if total_due > 0:
@@ -78,10 +127,48 @@ class QuizController:
             "suggestion": suggestion
         }
         self.root.update_dashboard(stats)
+        # Porta avanti in background lo snapshot delle statistiche (solo le materie con input cambiati)
+        self.analytics_snapshot.refresh()
+
+    def warm_up_subjects(self):
+        """
+        Preparazione all'avvio (impostazione "warmup_on_launch"): per ogni materia "In Corso" il paniere viene
+        analizzato e la sua cache di similarità creata o verificata in un processo del pool, una materia per core,
+        mentre un unico lavoro di sottofondo carica i deck SRS uno dopo l'altro (ogni caricamento tiene il lock del
+        registro). Una sessione su una materia pronta legge solo le cache; se la preparazione della materia è in corso
+        la sessione la attende invece di ripeterla, e quella delle materie non ancora partite viene annullata.
+        """
+        if not self.settings_manager.get_global_settings().get("warmup_on_launch", True): return
+        subjects = self.settings_manager.get_subjects(status_filter="In Corso")
+        for subject in subjects:
+            data = self.settings_manager.get_subject_data(subject)
+            txt_path_str = data.get('txt_path')
+            if not txt_path_str or not Path(txt_path_str).exists(): continue
+            key = (Path(txt_path_str), data.get("similarity_mode", SimilarityAnalyser.MODE_EXACT))
+            if key not in self._warmup_jobs:
+                # Il processo riscrive la cache: la vista di questo processo va chiusa prima (su Windows la sostituzione fallirebbe)
+                SimilarityCache.release(SimilarityAnalyser.cache_path_for(*key))
+                self._warmup_jobs[key] = self.jobs.submit_process(SimilarityCache.refresh_deck, *key, name=f"warm-up {subject}")
+        if self._warmup_deck_job is None and subjects:
+            self._warmup_deck_job = self.jobs.submit(self._warm_up_decks, subjects, name="warm-up decks", background=True)
+
+    def _warm_up_decks(self, job: Job, subjects: List[str]):
+        for subject in subjects:
+            if job.cancelled: return
+            self.deck_registry.get_manager(subject)
+
+    def _cancel_pending_warmups(self):
+        """Una sessione ha la precedenza sulla preparazione all'avvio: le materie non ancora partite non vengono più preparate."""
+        if self._warmup_deck_job is not None:
+            self._warmup_deck_job.cancel()
+        for key, warmup_job in list(self._warmup_jobs.items()):
+            if warmup_job.cancel_pending():
+                del self._warmup_jobs[key]
 
     def open_settings(self):
         initial_profile = self.config_manager.get_active_profile()
         initial_path = self.config_manager.get_data_path()
+        initial_storage = self.config_manager.get_storage_backend()
 
         settings_view = SettingsView(self.root, self.settings_manager, self.config_manager)
         self.root.wait_window(settings_view)
@@ -89,62 +176,42 @@ class QuizController:
         # Dopo la chiusura, ricarica sempre i dati per riflettere qualsiasi cambiamento
         self.settings_manager.reload_settings()
         self.app_data_manager.reload_data()
+        self.deck_registry.invalidate()
         self.update_dashboard_and_srs_status()
 
         final_profile = self.config_manager.get_active_profile()
         final_path = self.config_manager.get_data_path()
+        final_storage = self.config_manager.get_storage_backend()
 
         if initial_profile != final_profile:
             messagebox.showinfo("Profilo Cambiato", f"Il profilo è stato cambiato in '{final_profile}'.\nI dati sono stati ricaricati.", parent=self.root)
         elif initial_path != final_path:
             messagebox.showinfo("Percorso Dati Aggiornato", f"Il percorso dati per '{final_profile}' è stato aggiornato.\nI dati sono stati ricaricati.", parent=self.root)
+        elif initial_storage != final_storage:
+            messagebox.showinfo("Archivio Dati Aggiornato", f"Il profilo '{final_profile}' ora usa l'archivio '{final_storage}'.\nI dati sono stati ricaricati.", parent=self.root)
 
     def open_analysis(self):
-        # Prima, ottieni le statistiche di base dal gestore dati
-        stats = self.app_data_manager.get_overall_stats()
-
-        # Ora, arricchisci queste statistiche con dati che richiedono la logica del controller
-
-        # 1. Aggiungi il conteggio delle carte per ogni materia
-        if "subject_details" not in stats:
-            stats["subject_details"] = {}
-
-        all_subjects = self.settings_manager.get_subjects()
-        for subject in all_subjects:
-            if subject not in stats["subject_details"]:
-                stats["subject_details"][subject] = {}
-
-            details = stats["subject_details"][subject]
-            txt_path_str = self.settings_manager.get_subject_data(subject).get("txt_path")
-            card_count = 0
-            if txt_path_str and Path(txt_path_str).exists():
-                try:
-                    questions = TextFileParser(Path(txt_path_str)).parse()
-                    card_count = len(questions)
-                except Exception as e:
-                    print(f"Impossibile analizzare {txt_path_str} per il conteggio: {e}")
-            details["card_count"] = card_count
-
-        # 2. Recupera le domande "Leech" da ogni materia
-        all_leeches = []
-        for subject in all_subjects:
-            srs_manager = SRSManager(subject, None, 1.0, self.app_data_manager, self.settings_manager, self.config_manager)
-            leech_questions = srs_manager.get_leech_questions()
-            for q in leech_questions:
-                all_leeches.append({"subject": subject, "question_text": q.text})
-
-        stats["leech_questions"] = all_leeches
-
-        AnalysisView(self.root, stats)
+        from app.views.analysis_view import AnalysisView
+        # La finestra viene disegnata subito dallo snapshot materializzato; le materie con input cambiati
+        # vengono ricalcolate in background e, se qualcosa è cambiato, la finestra viene ridisegnata
+        analysis_view = AnalysisView(self.root, self.analytics_snapshot.stats())
+
+        def on_refreshed(changed: bool):
+            if changed and analysis_view.winfo_exists():
+                analysis_view.refresh(self.analytics_snapshot.stats())
+        self.analytics_snapshot.refresh(on_refreshed)
 
     # --- Tool Launchers ---
     def launch_pdf_merger(self):
+        from tools import pdf_merger
         pdf_merger.main(self.root, self.config_manager.get_data_path())
 
     def launch_text_formatter(self):
+        from tools import text_formatter
         text_formatter.main(self.root)
 
     def launch_image_snipper(self):
+        from tools import image_snipper
         image_snipper.main(self.root, self.config_manager.get_data_path())
 
     def start(self, mode: str):
@@ -170,40 +237,75 @@ class QuizController:
             messagebox.showerror("Errore Percorso", f"File Quiz non trovato per {subject}.\nControlla le Impostazioni.")
             return
 
-        threading.Thread(target=self._background_analysis_and_setup, args=(data,), daemon=True).start()
-
-    def _background_analysis_and_setup(self, data: Dict[str, Any]):
+        # La finestra di attesa nasce qui, nel thread di Tk; il lavoro in background non tocca l'interfaccia
         loading_view = LoadingView(self.root)
-        self.root.update_idletasks()
 
+        def on_done(result: Tuple[List[Question], Optional[SRSManager], Optional[Path]]):
+            loading_view.stop()
+            self.all_questions, self.srs_manager, self.image_base_path = result
+            self._finalize_start()
+
+        def on_error(error: BaseException):
+            loading_view.stop()
+            messagebox.showerror("Errore", f"Impossibile preparare la sessione di {subject}:\n{error}")
+        self._prepare_session(subject, data, on_done, on_error)
+
+    def _prepare_session(self, subject: str, data: Dict[str, Any], on_done: Callable[[Any], None], on_error: Callable[[BaseException], None]):
+        """
+        Prepara la sessione a passi, ognuno avviato dalla callback del precedente nel thread di Tk, così nessun thread
+        del pool resta fermo ad attendere un altro lavoro: l'eventuale preparazione all'avvio della materia, poi in
+        parallelo paniere e deck (thread) e similarità (processo), infine la cache di similarità letta qui.
+        """
         txt_path = Path(data.get('txt_path'))
-        self.all_questions = TextFileParser(txt_path).parse()
-
+        similarity_mode = data.get("similarity_mode", SimilarityAnalyser.MODE_EXACT)
+        # Il risultato della preparazione all'avvio si usa una volta sola: poi il paniere può cambiare
+        warmup_job = self._warmup_jobs.pop((txt_path, similarity_mode), None)
+        if warmup_job is not None and warmup_job.cancel_pending():
+            warmup_job = None  # Ancora in coda: la similarità della sessione parte subito, prima delle altre materie
+        self._cancel_pending_warmups()
+
+        def start(warmup_job: Optional[Job]):
+            # Materia preparata all'avvio: il processo ha già analizzato il paniere e aggiornato la cache
+            similarity_job = None
+            if warmup_job is None or not warmup_job.succeeded():
+                # La similarità (solo CPU) gira nel pool di processi mentre un thread prepara il deck SRS. Il processo
+                # riscrive la cache: la vista di questo processo va chiusa prima (su Windows la sostituzione fallirebbe)
+                SimilarityCache.release(SimilarityAnalyser.cache_path_for(txt_path, similarity_mode))
+                similarity_job = self.jobs.submit_process(SimilarityCache.refresh_deck, txt_path, similarity_mode, name="similarity")
+
+            def on_setup_done(result: Tuple[List[Question], Optional[SRSManager], Optional[Path]]):
+                finish = lambda similarity_job: self.jobs.submit(self._background_similarity, result, txt_path, similarity_mode, similarity_job,
+                                                                 name="similarity map", on_done=on_done, on_error=on_error)
+                if similarity_job is None: finish(None)
+                else: similarity_job.then(finish)
+            self.jobs.submit(self._background_analysis_and_setup, subject, data, name="session setup", on_done=on_setup_done, on_error=on_error)
+
+        if warmup_job is None: start(None)
+        else: warmup_job.then(start)
+
+    def _background_analysis_and_setup(self, job: Job, subject: str, data: Dict[str, Any]) -> Tuple[List[Question], Optional[SRSManager], Optional[Path]]:
+        questions = DeckCache(Path(data.get('txt_path'))).load_questions()
         exam_date = None
         try: exam_date = datetime.datetime.strptime(data.get("exam_date", ""), '%d/%m/%Y').date()
         except ValueError: pass
         modifier = data.get("interval_modifier", 1.0)
-        self.srs_manager = SRSManager(self.current_subject, exam_date, modifier, self.app_data_manager, self.settings_manager, self.config_manager)
-
-        cache_path = Path(txt_path).with_suffix('.txt.cache.json')
-
-        try:
-            if cache_path.exists() and cache_path.stat().st_mtime > txt_path.stat().st_mtime:
-                cached_data = json.loads(cache_path.read_text(encoding='utf-8'))
-                similarity_map = {k: set(v) for k, v in cached_data.items()}
-            else:
-                raise FileNotFoundError
-        except (FileNotFoundError, json.JSONDecodeError, KeyError):
-            analyser = SimilarityAnalyser(self.all_questions)
-            similarity_map = analyser.compute_similarity_map()
-            cache_path.write_text(json.dumps({k: list(v) for k, v in similarity_map.items()}, indent=2), encoding='utf-8')
-
-        if self.srs_manager: self.srs_manager.similarity_map = similarity_map
+        srs_manager = self.deck_registry.get_manager(subject, exam_date, modifier)
         img_path_str = data.get('img_path')
-        self.image_base_path = Path(img_path_str) if img_path_str and Path(img_path_str).exists() else None
-
-        self.root.after(0, loading_view.stop)
-        self.root.after(0, self._finalize_start)
+        image_base_path = Path(img_path_str) if img_path_str and Path(img_path_str).exists() else None
+        return questions, srs_manager, image_base_path
+
+    def _background_similarity(self, job: Job, setup: Tuple[List[Question], Optional[SRSManager], Optional[Path]], txt_path: Path,
+                               similarity_mode: str, similarity_job: Optional[Job]) -> Tuple[List[Question], Optional[SRSManager], Optional[Path]]:
+        questions, srs_manager, _ = setup
+        if similarity_job is not None and not similarity_job.succeeded():
+            print(f"Similarità nel pool di processi non riuscita ({similarity_job.future.exception()!r}): calcolo nel processo principale")
+        # Con la cache già aggiornata dal processo questa è solo la verifica degli hash; altrimenti la cache è
+        # aggiornata per singola domanda: solo quelle aggiunte, modificate o rimosse vengono rielaborate
+        analyser = SimilarityAnalyser(questions, similarity_mode)
+        similarity_cache = SimilarityCache(SimilarityAnalyser.cache_path_for(txt_path, similarity_mode), SimilarityAnalyser.legacy_cache_path_for(txt_path, similarity_mode))
+        similarity_map = similarity_cache.refresh(analyser)
+        if srs_manager: srs_manager.similarity_map = similarity_map
+        return setup
 
     def _finalize_start(self):
         self.active_questions = []
@@ -255,13 +357,23 @@ class QuizController:
     def _start_quiz_ui(self, timer_duration: int = 0):
         self.root.withdraw()
         self.current_question_index = 0
-        self.practice_view = PracticeView(self.root, self.on_practice_close, self.current_mode, lambda: self.display_current_question())
+        self.session = QuizSession(self.active_questions)
+        from app.views.practice_view import PracticeView
+        self.practice_view = PracticeView(self.root, self.on_practice_close, self.current_mode, self.refresh_question_image)
         self.practice_view.set_callbacks(self.prev_question, self.next_question, self.submit_or_show_answer, self.rate_srs_question)
         self.practice_view.setup_for_mode()
         if self.current_mode == 'exam':
             self.practice_view.create_navigation_panel(len(self.active_questions), self.jump_to_question)
             if timer_duration > 0: self._start_timer(timer_duration)
-        if self.image_base_path: threading.Thread(target=self._image_loader_worker, daemon=True).start()
+        self._end_image_prefetch()
+        if self.image_base_path:
+            budget_mb = self.settings_manager.get_global_settings().get("image_cache_mb", ImageCache.DEFAULT_BUDGET_MB)
+            self.image_cache.budget_bytes = int(budget_mb * 1024 * 1024)
+            self.question_image_paths = [self.image_base_path / q.image_path if q.image_path else None for q in self.active_questions]
+            if not self.thumbnail_cache or self.thumbnail_cache.img_path != self.image_base_path:
+                self.thumbnail_cache = ThumbnailCache(self.image_base_path, self._load_image)
+            self.image_prefetcher = ImagePrefetcher(self.image_cache, self._load_image, resolve=self._image_source)
+            self.image_resizer = ImageResizer(self.image_prefetcher, self._wrap_image, thumbnails=self.thumbnail_cache)
         self.display_current_question()
 
     def _start_timer(self, duration_minutes: int):
@@ -282,57 +394,107 @@ class QuizController:
     def _stop_timer(self):
         if self.timer_id: self.root.after_cancel(self.timer_id); self.timer_id = None
 
-    def _image_loader_worker(self):
-        if not self.image_base_path: return
-        questions_to_load = self.active_questions if self.active_questions else self.all_questions
-        for q in questions_to_load:
-            if q.image_path:
-                full_path = self.image_base_path / q.image_path
-                if full_path not in self.image_cache and full_path.exists():
-                    try:
-                        img = Image.open(full_path)
-                        img.load()
-                        self.image_cache[full_path] = img
-                    except Exception as e:
-                        print(f"Errore caricamento immagine {full_path}: {e}")
-
-    def get_resized_image(self) -> Optional[ImageTk.PhotoImage]:
-        if not self.practice_view or not self.practice_view.winfo_exists() or not self.active_questions: return None
-        q = self.active_questions[self.current_question_index]
-        if not q.image_path or not self.image_base_path: return None
-        pil_image = self.image_cache.get(self.image_base_path / q.image_path)
-        if not pil_image: return None
-        try:
-            max_h = self.practice_view.winfo_height() * 0.4
-            max_w = self.practice_view.winfo_width() * 0.8
-            if max_h < 100 or max_w < 100: return None
-            img_copy = pil_image.copy()
-            w, h = img_copy.size
-            ratio = min(max_w / w, max_h / h)
-            if ratio < 1:
-                img_copy = img_copy.resize((int(w * ratio), int(h * ratio)), Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(img_copy)
-        except Exception:
-            return None
+    @staticmethod
+    def _load_image(path: Path) -> 'Image.Image':
+        from PIL import Image
+        image = Image.open(path)
+        image.load()
+        return image
+
+    @staticmethod
+    def _wrap_image(image: 'Image.Image') -> 'ImageTk.PhotoImage':
+        from PIL import ImageTk
+        return ImageTk.PhotoImage(image)
+
+    def _end_image_prefetch(self):
+        """Ferma prefetch e ridimensionamento e libera le immagini della sessione: la cache non sopravvive tra una materia e l'altra."""
+        if self.image_resizer:
+            self.image_resizer.shutdown()
+            self.image_resizer = None
+        if self.image_prefetcher:
+            self.image_prefetcher.stop()
+            self.image_prefetcher = None
+        if self._thumbnail_job:
+            self._thumbnail_job.cancel()
+            self._thumbnail_job = None
+        self._thumbnail_batch_box = None
+        self.image_cache.clear()
+
+    def _image_box(self) -> Optional[Tuple[int, int]]:
+        """Riquadro disponibile per la figura nella finestra di studio, arrotondato per riusare i ridimensionamenti."""
+        max_h = self.practice_view.winfo_height() * 0.4
+        max_w = self.practice_view.winfo_width() * 0.8
+        if max_h < 100 or max_w < 100: return None
+        return ImageResizer.bucket(max_w, max_h)
+
+    def _image_source(self, path: Path) -> Path:
+        """File da decodificare in anticipo per la figura: la miniatura già pronta per il riquadro attuale, se c'è."""
+        box = self._image_box() if self.practice_view and self.practice_view.winfo_exists() else None
+        return self.thumbnail_cache.source_for(path, box) if box else path
+
+    def _start_thumbnail_batch(self, box: Tuple[int, int]):
+        """Crea in background le miniature mancanti delle figure della sessione per il riquadro (una volta per riquadro)."""
+        if box == self._thumbnail_batch_box: return
+        self._thumbnail_batch_box = box
+        if self._thumbnail_job: self._thumbnail_job.cancel()
+        paths = [path for path in dict.fromkeys(self.question_image_paths) if path is not None]
+        thumbnails = self.thumbnail_cache
+        self._thumbnail_job = self.jobs.submit(lambda job: thumbnails.build(paths, box, lambda: job.cancelled), name="thumbnail batch", background=True)
+
+    def _current_image_path(self) -> Optional[Path]:
+        if not self.practice_view or not self.practice_view.winfo_exists() or not self.active_questions or not self.image_resizer: return None
+        return self.question_image_paths[self.current_question_index]
+
+    def get_resized_image(self) -> Optional['ImageTk.PhotoImage']:
+        """
+        La figura della domanda corrente se è già stata scalata per la finestra; altrimenti None, e il pool di
+        ridimensionamento la mostra appena pronta. Vengono richieste anche le figure vicine, così scorrere le
+        domande con le frecce non attende mai un ridimensionamento.
+        """
+        image_path = self._current_image_path()
+        box = self._image_box() if image_path else None
+        if not box: return None
+        photo = self.image_resizer.photo(image_path, box)
+        if photo is None:
+            self.image_resizer.request(image_path, box, lambda: self._on_image_ready(image_path, box))
+        for neighbour in self.image_prefetcher.window(self.question_image_paths, self.current_question_index)[1:]:
+            self.image_resizer.request(neighbour, box)
+        self._start_thumbnail_batch(box)
+        return photo
+
+    def _on_image_ready(self, image_path: Path, box: Tuple[int, int]):
+        # La figura è pronta (callback nel thread di Tk): la si mostra solo se l'utente è ancora sulla stessa domanda e finestra
+        if self._current_image_path() == image_path and self._image_box() == box:
+            self.practice_view.show_image(self.image_resizer.photo(image_path, box))
+
+    def refresh_question_image(self):
+        """Dopo un ridimensionamento della finestra: aggiorna solo la figura (la precedente resta finché la nuova non è pronta)."""
+        photo = self.get_resized_image()
+        if photo is not None:
+            self.practice_view.show_image(photo)
 
     def display_current_question(self):
         if not self.practice_view or not self.practice_view.winfo_exists() or not self.active_questions: return
         q = self.active_questions[self.current_question_index]
         status = f"Domanda {self.current_question_index + 1} di {len(self.active_questions)}"
+        if self.image_prefetcher:
+            # Sposta la finestra di prefetch sulla domanda corrente (anche dopo un salto dal pannello di navigazione)
+            self.image_prefetcher.prioritize(self.question_image_paths, self.current_question_index)
         image = self.get_resized_image()
-        self.practice_view.display_question(q, status, image)
+        self.practice_view.display_question(q, status, image, self.session.answer(self.current_question_index))
         self.practice_view.update_navigation_buttons(self.current_question_index > 0, self.current_question_index < len(self.active_questions) - 1)
         if self.current_mode == 'exam':
-            self.practice_view.update_navigation_panel(self.active_questions, self.current_question_index)
+            self.practice_view.update_navigation_panel(self.session, self.current_question_index)
         if self.current_mode != 'review':
             for opt_radio in self.practice_view.option_widgets:
                 opt_radio['radio'].config(command=self.on_answer_selected)
         self.question_start_time = time.monotonic()
 
     def on_answer_selected(self):
+        if not self.practice_view: return
         q = self.active_questions[self.current_question_index]
-        q.time_taken = time.monotonic() - self.question_start_time
-        selected_answer = q.user_answer.get()
+        selected_answer = self.practice_view.get_selected_answer()
+        self.session.record_answer(self.current_question_index, selected_answer, time.monotonic() - self.question_start_time)
         if not selected_answer: return
         is_correct = (selected_answer == q.correct_answer)
         try:
@@ -367,18 +529,22 @@ class QuizController:
     def submit_or_show_answer(self, auto_submit: bool = False):
         if self.current_mode == 'review':
             q = self.active_questions[self.current_question_index]
+            # Nel ripasso le opzioni non si selezionano: il tempo di risposta è quello fino a "Mostra Risposta"
+            self.session.record_time(self.current_question_index, time.monotonic() - self.question_start_time)
             self.practice_view.show_correct_answer(q.correct_answer)
             self.practice_view.switch_to_srs_feedback(True)
         else:
             if not auto_submit and not messagebox.askyesno("Conferma", "Sei sicuro di voler terminare?"):
                 return
             self._stop_timer()
-            incorrect_answers = [q for q in self.active_questions if q.user_answer.get() != q.correct_answer]
+            incorrect_indices = [i for i, q in enumerate(self.active_questions) if self.session.answer(i) != q.correct_answer]
+            incorrect_answers = [self.active_questions[i] for i in incorrect_indices]
             newly_leeches = []
             if self.srs_manager:
                 for q in incorrect_answers:
                     if self.srs_manager.add_or_update_from_exam(q):
                         newly_leeches.append(q)
+                self.analytics_snapshot.record_leeches(self.current_subject, newly_leeches)
             if not incorrect_answers:
                 messagebox.showinfo("Risultato", "Congratulazioni! Sessione completata senza errori.")
                 return self.on_practice_close()
@@ -394,9 +560,11 @@ class QuizController:
                 for q in newly_leeches:
                     leech_text += f"- {q.text[:80]}...\n"
                 summary += leech_text
-            incorrect_display_data = [{"q_number": q.number, "q_text": q.text, "user_answer": q.user_answer.get() or "Nessuna risposta", "correct_answer": q.correct_answer, "options": q.options} for q in incorrect_answers]
+            incorrect_display_data = [{"q_number": q.number, "q_text": q.text, "user_answer": self.session.answer(i) or "Nessuna risposta", "correct_answer": q.correct_answer, "options": q.options}
+                                      for i, q in zip(incorrect_indices, incorrect_answers)]
             if self.practice_view:
                 self.practice_view.withdraw()
+            from app.views.results_view import ResultsView
             self.results_view = ResultsView(self.root, incorrect_display_data, self.on_results_close, title, summary)
 
     def rate_srs_question(self, rating: str):
@@ -404,7 +572,11 @@ class QuizController:
         self.srs_session_results.append(rating != "non_la_sapevo")
         if self.srs_manager:
             # Aggiorna la domanda e controlla se è diventata una leech
-            is_leech = self.srs_manager.update_after_review(q, rating, q.time_taken)
+            self.session.record_time(self.current_question_index, time.monotonic() - self.question_start_time)
+            time_taken = self.session.time_taken(self.current_question_index)
+            reviewed = q.id in self.srs_manager.deck
+            is_leech = self.srs_manager.update_after_review(q, rating, time_taken)
+            if reviewed: self.analytics_snapshot.record_review(self.current_subject, q, is_leech)
             # Mostra l'avviso solo se la domanda è una leech E l'utente ha appena risposto "non la sapevo"
             if is_leech and rating == "non_la_sapevo":
                 messagebox.showwarning("Attenzione: Domanda Ostica!", f"Continui ad avere difficoltà con questa domanda. Prova a studiarla da una fonte diversa.\n\n- {q.text[:100]}...")
@@ -412,6 +584,8 @@ class QuizController:
 
     def on_practice_close(self, show_final_message: bool = False):
         self._stop_timer()
+        self._end_image_prefetch()
+        if self.srs_manager: self.srs_manager.schedule_save()  # Compatta il journal delle valutazioni della sessione
         if self.practice_view:
             self.practice_view.destroy()
             self.practice_view = None
@@ -428,6 +602,8 @@ class QuizController:
         self.update_dashboard_and_srs_status()
 
     def on_results_close(self):
+        if self.srs_manager: self.srs_manager.schedule_save()
+        self._end_image_prefetch()
         if self.results_view:
             self.results_view.destroy()
             self.results_view = None
@@ -8,11 +8,15 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from app.controllers.quiz_controller import QuizController
 from app.services.settings_manager import SettingsManager
 from app.services.config_manager import ConfigManager
+from app.services.write_behind import WriteBehindWriter, install_exit_handlers
+from app.services.job_executor import JobExecutor
 from app.views.main_view import MainView
 from app.views.path_dialog import ask_for_new_datapath
 
 def launch_app():
     """Lancia l'applicazione principale."""
+    # Le scritture differite vengono completate anche se il processo viene terminato
+    install_exit_handlers()
     try:
         config_manager = ConfigManager()
         settings_manager = SettingsManager(config_manager)
@@ -29,8 +33,13 @@ def launch_app():
         )
 
         controller = QuizController(main_window, settings_manager, config_manager)
-        main_window.after(100, controller.update_dashboard_and_srs_status)
+        # La dashboard compare subito con dei segnaposto: le statistiche arrivano da un thread di lavoro
+        main_window.after_idle(controller.update_dashboard_and_srs_status)
+        # Poi, con la dashboard già visibile, le materie "In Corso" vengono preparate in parallelo nel pool di processi
+        main_window.after_idle(controller.warm_up_subjects)
         main_window.mainloop()
+        JobExecutor.instance().shutdown()
+        WriteBehindWriter.flush_all()
 
     except FileNotFoundError as e:
         # Errore specifico catturato quando il data_path non è valido
@@ -44,7 +53,8 @@ def launch_app():
             active_profile = config_manager.get_active_profile()
             config_manager.update_profile_path(active_profile, str(new_path))
 
-            # Riavvia l'applicazione per applicare le modifiche
+            # Riavvia l'applicazione per applicare le modifiche (execv non esegue i gestori atexit)
+            WriteBehindWriter.flush_all()
             os.execv(sys.executable, ['python'] + sys.argv)
         else:
             # L'utente ha annullato, l'applicazione si chiude
@@ -1,9 +1,15 @@
-import tkinter as tk
+import hashlib
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 
 class Question:
-    """Rappresenta una singola domanda del quiz."""
+    """
+    Rappresenta una singola domanda del quiz. Contiene solo dati, senza variabili Tk: può essere creata
+    senza display, fuori dal thread dell'interfaccia e serializzata verso altri processi.
+    Le risposte date durante una sessione sono in QuizSession.
+    """
+    __slots__ = ("id", "number", "text", "options", "correct_answer", "image_path")
+
     def __init__(self, number: str, text: str, options: List[str], correct_answer: Optional[str], image_path: Optional[Path] = None):
         self.id = text.strip()
         self.number = number
@@ -11,8 +17,11 @@ class Question:
         self.options = options
         self.correct_answer = correct_answer
         self.image_path = image_path
-        self.user_answer = tk.StringVar(value="")
-        self.time_taken = 0.0
+
+    @staticmethod
+    def compact_id(question_id: str) -> str:
+        """Id breve e stabile di una domanda (hash del suo id), usato nel log dei ripassi."""
+        return hashlib.sha1(question_id.encode('utf-8')).hexdigest()[:10]
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -0,0 +1,190 @@
+import bisect
+import datetime
+import itertools
+from array import array
+from typing import List, Dict, Optional, Any, Tuple, Union, Callable
+
+class _SubjectColumns:
+    """Colonne di una sola materia: timestamp, posizioni nel log e somme prefisse delle risposte corrette."""
+    __slots__ = ("timestamps", "positions", "correct_prefix")
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.positions = array('I')
+        self.correct_prefix = array('I', [0])
+
+class ReviewLog:
+    """
+    Log dei ripassi in colonne, in ordine cronologico: timestamp in microsecondi dall'epoca (ora locale, come
+    i timestamp ISO salvati, quindi senza perdita nella conversione), id interi delle materie e un byte per
+    l'esito; id compatto della domanda e valutazione (anch'essi come indici interi) e latenza della risposta
+    in millisecondi, assenti (None) nei ripassi registrati prima che venissero salvati.
+    Le somme prefisse delle risposte corrette, globali e per materia, rendono ogni finestra temporale una
+    ricerca binaria e una sottrazione: il costo non dipende dalla lunghezza del log.
+    """
+    EPOCH = datetime.datetime(1970, 1, 1)
+    MICROSECOND = datetime.timedelta(microseconds=1)
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.subject_ids = array('H')
+        self.correct = bytearray()
+        self._correct_prefix = array('I', [0])
+        self.subjects: List[str] = []
+        self._subject_index: Dict[str, int] = {}
+        self._by_subject: List[_SubjectColumns] = []
+        # L'indice 0 di domande e valutazioni, e la latenza -1, indicano un dato assente
+        self.question_ids = array('I')
+        self.questions: List[Optional[str]] = [None]
+        self._question_index: Dict[Optional[str], int] = {None: 0}
+        self.ratings = array('B')
+        self.rating_names: List[Optional[str]] = [None]
+        self._rating_index: Dict[Optional[str], int] = {None: 0}
+        self.latencies_ms = array('i')
+
+    @classmethod
+    def to_micros(cls, timestamp: Union[str, datetime.datetime]) -> int:
+        if isinstance(timestamp, str):
+            timestamp = datetime.datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.replace(tzinfo=None)
+        return (timestamp - cls.EPOCH) // cls.MICROSECOND
+
+    @classmethod
+    def from_micros(cls, micros: int) -> str:
+        return (cls.EPOCH + datetime.timedelta(microseconds=micros)).isoformat()
+
+    @staticmethod
+    def latency_to_ms(latency: Optional[float]) -> int:
+        return -1 if latency is None else int(round(latency * 1000))
+
+    @staticmethod
+    def _intern(values: List[Optional[str]], index: Dict[Optional[str], int], value: Optional[str]) -> int:
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(values)
+            values.append(value)
+        return position
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> 'ReviewLog':
+        """
+        Costruisce il log dai record del formato JSON: {"timestamp", "subject", "is_correct"} più, se presenti,
+        "question_id", "rating" e "latency" (secondi).
+        """
+        log = cls()
+        to_micros, intern, latency_to_ms = cls.to_micros, cls._intern, cls.latency_to_ms
+        micros = [to_micros(r["timestamp"]) for r in records]
+        subject_ids = [log._subject_id(r["subject"]) for r in records]
+        correct = bytes(bool(r["is_correct"]) for r in records)
+        question_ids = [intern(log.questions, log._question_index, r.get("question_id")) for r in records]
+        ratings = [intern(log.rating_names, log._rating_index, r.get("rating")) for r in records]
+        latencies = [latency_to_ms(r.get("latency")) for r in records]
+        order = range(len(records))
+        if any(a > b for a, b in zip(micros, itertools.islice(micros, 1, None))):
+            # Ordinamento stabile: a parità di timestamp resta l'ordine di registrazione
+            order = sorted(order, key=micros.__getitem__)
+            micros, subject_ids, correct = [micros[i] for i in order], [subject_ids[i] for i in order], bytes(correct[i] for i in order)
+            question_ids, ratings, latencies = [question_ids[i] for i in order], [ratings[i] for i in order], [latencies[i] for i in order]
+        log.timestamps, log.subject_ids, log.correct = array('q', micros), array('H', subject_ids), bytearray(correct)
+        log.question_ids, log.ratings, log.latencies_ms = array('I', question_ids), array('B', ratings), array('i', latencies)
+        log._correct_prefix = array('I', itertools.accumulate(correct, initial=0))
+        positions_by_subject: List[List[int]] = [[] for _ in log.subjects]
+        for position, subject_id in enumerate(subject_ids):
+            positions_by_subject[subject_id].append(position)
+        for columns, positions in zip(log._by_subject, positions_by_subject):
+            columns.positions = array('I', positions)
+            columns.timestamps = array('q', [micros[p] for p in positions])
+            columns.correct_prefix = array('I', itertools.accumulate((correct[p] for p in positions), initial=0))
+        return log
+
+    def _subject_id(self, subject: str) -> int:
+        subject_id = self._subject_index.get(subject)
+        if subject_id is None:
+            subject_id = self._subject_index[subject] = len(self.subjects)
+            self.subjects.append(subject)
+            self._by_subject.append(_SubjectColumns())
+        return subject_id
+
+    def _append(self, micros: int, subject: str, is_correct: bool, question_id: Optional[str], rating: Optional[str], latency: Optional[float]):
+        subject_id = self._subject_id(subject)
+        columns = self._by_subject[subject_id]
+        columns.timestamps.append(micros)
+        columns.positions.append(len(self.timestamps))
+        columns.correct_prefix.append(columns.correct_prefix[-1] + is_correct)
+        self.timestamps.append(micros)
+        self.subject_ids.append(subject_id)
+        self.correct.append(is_correct)
+        self._correct_prefix.append(self._correct_prefix[-1] + is_correct)
+        self.question_ids.append(self._intern(self.questions, self._question_index, question_id))
+        self.ratings.append(self._intern(self.rating_names, self._rating_index, rating))
+        self.latencies_ms.append(self.latency_to_ms(latency))
+
+    def append(self, review: Dict[str, Any]):
+        """Aggiunge un ripasso nel formato dei record JSON."""
+        micros = self.to_micros(review["timestamp"])
+        if not self.timestamps or micros >= self.timestamps[-1]:
+            self._append(micros, review["subject"], bool(review["is_correct"]), review.get("question_id"), review.get("rating"), review.get("latency"))
+            return
+        # Orologio spostato all'indietro: caso raro, si ricostruiscono le colonne mantenendo l'ordine cronologico
+        # (nuovi oggetti colonna: le funzioni di frozen_records già create continuano a leggere quelli vecchi)
+        records = self.records()
+        position = bisect.bisect_right(self.timestamps, micros)
+        records.insert(position, review)
+        self.__dict__.update(ReviewLog.from_records(records).__dict__)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def frozen_records(self) -> Callable[[], List[Dict[str, Any]]]:
+        """
+        Funzione che restituisce i record dei ripassi registrati finora, utilizzabile da un altro thread senza
+        copiare le colonne: il log cresce solo in coda, quindi bastano le colonne attuali e la loro lunghezza.
+        """
+        view = ReviewLog.__new__(ReviewLog)
+        view.__dict__.update(self.__dict__)  # Stessi oggetti colonna, che append estende sul posto
+        length = len(self.timestamps)
+        return lambda: [view._record(position) for position in range(length)]
+
+    def latency(self, position: int) -> Optional[float]:
+        latency_ms = self.latencies_ms[position]
+        return None if latency_ms < 0 else latency_ms / 1000
+
+    def _record(self, position: int) -> Dict[str, Any]:
+        return {"timestamp": self.from_micros(self.timestamps[position]), "subject": self.subjects[self.subject_ids[position]],
+                "is_correct": bool(self.correct[position]), "question_id": self.questions[self.question_ids[position]],
+                "rating": self.rating_names[self.ratings[position]], "latency": self.latency(position)}
+
+    def records(self, subject: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ripassi nel formato dei record JSON, in ordine cronologico, eventualmente di una sola materia."""
+        if subject is None:
+            return [self._record(position) for position in range(len(self.timestamps))]
+        subject_id = self._subject_index.get(subject)
+        if subject_id is None: return []
+        return [self._record(position) for position in self._by_subject[subject_id].positions]
+
+    def records_since(self, since: Union[str, datetime.datetime]) -> List[Dict[str, Any]]:
+        start = bisect.bisect_left(self.timestamps, self.to_micros(since))
+        return [self._record(position) for position in range(start, len(self.timestamps))]
+
+    def recent(self, subject: str, limit: int) -> List[Dict[str, Any]]:
+        subject_id = self._subject_index.get(subject)
+        if subject_id is None: return []
+        positions = self._by_subject[subject_id].positions
+        return [self._record(position) for position in positions[max(0, len(positions) - limit):]]
+
+    def count(self, since: Optional[Union[str, datetime.datetime]] = None, subject: Optional[str] = None) -> Tuple[int, int]:
+        """(ripassi corretti, ripassi totali) dal momento `since` in poi, eventualmente di una sola materia."""
+        if subject is None:
+            timestamps, prefix = self.timestamps, self._correct_prefix
+        else:
+            subject_id = self._subject_index.get(subject)
+            if subject_id is None: return 0, 0
+            columns = self._by_subject[subject_id]
+            timestamps, prefix = columns.timestamps, columns.correct_prefix
+        start = 0 if since is None else bisect.bisect_left(timestamps, self.to_micros(since))
+        return prefix[-1] - prefix[start], len(timestamps) - start
+
+    def count_by_subject(self) -> Dict[str, int]:
+        """Numero di ripassi per materia, nell'ordine del primo ripasso di ciascuna."""
+        return {subject: len(columns.timestamps) for subject, columns in zip(self.subjects, self._by_subject) if columns.timestamps}
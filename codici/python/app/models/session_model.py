@@ -0,0 +1,40 @@
+from typing import List, Dict
+
+from .question_model import Question
+
+class AnswerState:
+    """Risposta data a una domanda durante la sessione e tempo impiegato."""
+    __slots__ = ("answer", "time_taken")
+
+    def __init__(self, answer: str = "", time_taken: float = 0.0):
+        self.answer = answer
+        self.time_taken = time_taken
+
+class QuizSession:
+    """
+    Stato delle risposte di una sessione in corso, indicizzato per posizione nella lista delle domande attive.
+    Le domande restano dati puri: la vista lega una sola variabile Tk alla domanda mostrata.
+    """
+    def __init__(self, questions: List[Question]):
+        self.questions = questions
+        self._answers: Dict[int, AnswerState] = {}
+
+    def record_answer(self, index: int, answer: str, time_taken: float):
+        self._answers[index] = AnswerState(answer, time_taken)
+
+    def record_time(self, index: int, time_taken: float):
+        """Tempo di risposta senza una scelta tra le opzioni (ripasso SRS: fino a "Mostra Risposta"); la prima misura resta."""
+        state = self._answers.setdefault(index, AnswerState())
+        if not state.time_taken:
+            state.time_taken = time_taken
+
+    def answer(self, index: int) -> str:
+        state = self._answers.get(index)
+        return state.answer if state else ""
+
+    def time_taken(self, index: int) -> float:
+        state = self._answers.get(index)
+        return state.time_taken if state else 0.0
+
+    def is_answered(self, index: int) -> bool:
+        return bool(self.answer(index))
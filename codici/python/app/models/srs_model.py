@@ -4,25 +4,51 @@ from typing import Dict, Any, Optional
 from .question_model import Question
 
 class SRSItem:
-    """Rappresenta una domanda nel sistema SRS, con i suoi metadati di studio."""
-    def __init__(self, question: Question, srs_level: int = 0, next_review_date: Optional[datetime.date] = None, lapses: int = 0, history: Optional[Dict[str, int]] = None):
-        self.question = question
+    """
+    Rappresenta una domanda nel sistema SRS, con i suoi metadati di studio.
+    I campi di pianificazione sono compatti (la data di ripasso è un ordinale di giorno), mentre la domanda
+    resta il dizionario letto dal file finché qualcuno non la richiede: contare le carte in scadenza
+    non crea nessun oggetto Question.
+    """
+    __slots__ = ("_question", "_question_data", "srs_level", "due_day", "lapses", "history")
+
+    def __init__(self, question: Optional[Question], srs_level: int = 0, next_review_date: Optional[datetime.date] = None, lapses: int = 0, history: Optional[Dict[str, int]] = None, question_data: Optional[Dict[str, Any]] = None):
+        self._question = question
+        self._question_data = question_data
         self.srs_level = srs_level
-        self.next_review_date = next_review_date or (datetime.date.today() + datetime.timedelta(days=1))
+        self.due_day = (next_review_date or (datetime.date.today() + datetime.timedelta(days=1))).toordinal()
         self.lapses = lapses
         # Aggiunge un dizionario per tracciare la storia delle risposte
         self.history = history or {"again": 0, "hard": 0, "good": 0, "easy": 0}
 
+    @property
+    def question(self) -> Question:
+        if self._question is None:
+            self._question = Question.from_dict(self._question_data)
+            self._question_data = None
+        return self._question
+
+    @property
+    def next_review_date(self) -> datetime.date:
+        return datetime.date.fromordinal(self.due_day)
+
+    @next_review_date.setter
+    def next_review_date(self, value: datetime.date):
+        self.due_day = value.toordinal()
+
     def to_dict(self) -> Dict[str, Any]:
+        # La compattazione chiama to_dict da un lavoro in background mentre il thread di Tk può materializzare la domanda:
+        # question imposta _question prima di azzerare _question_data, quindi leggendo in quest'ordine uno dei due c'è sempre
+        question_data = self._question_data
+        question = self._question
         return {
-            "question": self.question.to_dict(), "srs_level": self.srs_level,
+            "question": question.to_dict() if question is not None else question_data, "srs_level": self.srs_level,
             "next_review_date": self.next_review_date.isoformat(), "lapses": self.lapses,
             "history": self.history
         }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'SRSItem':
-        question = Question.from_dict(data["question"])
         # Gestisce la retrocompatibilità per i dati salvati senza la cronologia
         history = data.get("history", {"again": 0, "hard": 0, "good": 0, "easy": 0})
-        return cls(question, data["srs_level"], datetime.date.fromisoformat(data["next_review_date"]), data.get("lapses", 0), history)
+        return cls(None, data["srs_level"], datetime.date.fromisoformat(data["next_review_date"]), data.get("lapses", 0), history, question_data=data["question"])
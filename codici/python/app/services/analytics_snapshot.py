@@ -0,0 +1,221 @@
+import os
+import json
+import threading
+from functools import partial
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Callable, Tuple
+
+from app.models.question_model import Question
+from app.services.deck_cache import DeckCache
+from app.services.deck_registry import DeckRegistry
+from app.services.job_executor import Job, JobExecutor
+from app.services.latency_analytics import LatencyAnalytics
+from app.services.write_behind import atomic_write_text
+
+class AnalyticsSnapshot:
+    """
+    Statistiche materializzate per la finestra di analisi, salvate in analytics_snapshot.json accanto ai dati
+    del profilo: per materia numero di carte e leech, più il riepilogo dei tempi di risposta. La finestra viene
+    disegnata subito dallo snapshot; ritenzione, serie e andamento vengono già dagli aggregati di AppDataManager.
+    Ogni voce ricorda gli input da cui è stata calcolata (paniere e numero di ripassi della materia): refresh()
+    ricalcola in background solo le materie i cui input sono cambiati, mentre i ripassi registrati durante lo
+    studio aggiornano lo snapshot sul momento (record_review, record_leeches, e le latenze da AppDataManager.log_review).
+    """
+    FILE_NAME = "analytics_snapshot.json"
+    VERSION = 1
+
+    def __init__(self, deck_registry: DeckRegistry, jobs: Optional[JobExecutor] = None):
+        self.deck_registry = deck_registry
+        self.app_data_manager = deck_registry.app_data_manager
+        self.settings_manager = deck_registry.settings_manager
+        self.jobs = jobs or JobExecutor.instance()
+        self._lock = threading.RLock()
+        self._refreshing: Optional[Job] = None
+        self._rerun = False
+        self._callbacks: List[Callable[[bool], None]] = []
+        self.path: Optional[Path] = None
+        self._data: Dict[str, Any] = {}
+        self._sync_path()
+        self.app_data_manager.review_listeners.append(self._record_latency)
+
+    def _sync_path(self):
+        """Ogni profilo (cartella dati) ha il suo snapshot: dopo un cambio si rilegge quello nuovo."""
+        storage = self.deck_registry.storage
+        path = storage.data_path / self.FILE_NAME
+        with self._lock:
+            if (path, storage.NAME) == (self.path, self._data.get("storage")): return
+            self.path = path
+            self._data: Dict[str, Any] = {"version": self.VERSION, "storage": storage.NAME, "subjects": {}, "latency": None, "latency_reviews": -1}
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                # Uno snapshot calcolato con l'altro archivio della stessa cartella non è affidabile
+                if data.get("version") == self.VERSION and data.get("storage") == storage.NAME:
+                    self._data = data
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+            # Latenze accumulate in memoria (ricostruite dal log al primo refresh) e testi delle domande per materia
+            self._latency: Optional[LatencyAnalytics] = None
+            self._latency_backlog: Optional[List[Dict[str, Any]]] = None
+            self._question_texts: Dict[str, Dict[str, str]] = {}
+
+    def _save(self):
+        storage = self.deck_registry.storage
+        with self._lock:
+            text = json.dumps(self._data, ensure_ascii=False, separators=(",", ":"))
+        storage.writer.schedule(("analytics_snapshot",), partial(atomic_write_text, self.path, text))
+
+    def _subject_inputs(self, subject: str, review_counts: Dict[str, int]) -> List[int]:
+        """Firma degli input di una materia: data e dimensione del paniere e numero di ripassi registrati."""
+        txt_path_str = self.settings_manager.get_subject_data(subject).get("txt_path")
+        try:
+            stat = os.stat(txt_path_str) if txt_path_str else None
+        except OSError:
+            stat = None
+        return [stat.st_mtime_ns if stat else 0, stat.st_size if stat else 0, review_counts.get(subject, 0)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiche per AnalysisView: aggregati correnti più le voci materializzate (eventualmente non aggiornate)."""
+        self._sync_path()
+        stats = self.app_data_manager.get_overall_stats()
+        subject_details = stats.setdefault("subject_details", {})
+        leech_questions = []
+        with self._lock:
+            for subject in self.settings_manager.get_subjects():
+                entry = self._data["subjects"].get(subject, {})
+                subject_details.setdefault(subject, {})["card_count"] = entry.get("card_count", 0)
+                leech_questions.extend({"subject": subject, "question_text": text} for text in entry.get("leech_questions", []))
+            stats["leech_questions"] = leech_questions
+            stats["latency"] = self._data["latency"] or {}
+        return stats
+
+    def _compute_subject(self, subject: str, inputs: List[int]) -> Dict[str, Any]:
+        txt_path_str = self.settings_manager.get_subject_data(subject).get("txt_path")
+        card_count = 0
+        if txt_path_str and Path(txt_path_str).exists():
+            try:
+                # Basta l'intestazione della cache del paniere: le domande non vengono create
+                card_count = DeckCache(Path(txt_path_str)).question_count()
+            except Exception as e:
+                print(f"Impossibile analizzare {txt_path_str} per il conteggio: {e}")
+        question_texts = {Question.compact_id(question_id): question_id for question_id in self.deck_registry.get_question_ids(subject)}
+        with self._lock:
+            self._question_texts[subject] = question_texts
+        return {"inputs": inputs, "card_count": card_count, "leech_questions": self.deck_registry.get_leech_texts(subject)}
+
+    def _build_latency(self):
+        """
+        Accumula le latenze dell'intero log; i ripassi notificati nel frattempo vengono aggiunti alla fine, tranne
+        quelli che la lettura del log ha già incontrato (riconosciuti da timestamp e domanda).
+        """
+        storage = self.deck_registry.storage
+        source = (storage.data_path / self.FILE_NAME, storage.NAME)
+        with self._lock:
+            if source != (self.path, self._data["storage"]): return  # Profilo appena cambiato: lo rilegge il prossimo refresh
+            self._latency_backlog = []
+        scanned = set()
+
+        def reviews():
+            for review in storage.iter_reviews():
+                if review.get("latency"):  # Gli altri ripassi non contano per LatencyAnalytics
+                    scanned.add((review["timestamp"], review.get("question_id")))
+                yield review
+
+        latency = LatencyAnalytics({}).add_reviews(reviews())
+        with self._lock:
+            # Cambio di profilo o di archivio durante la lettura: _sync_path ha già azzerato lo stato, il risultato è di un altro log
+            if source != (self.path, self._data["storage"]): return
+            latency.add_reviews(r for r in self._latency_backlog if (r["timestamp"], r.get("question_id")) not in scanned)
+            self._latency, self._latency_backlog = latency, None
+
+    def _refresh_once(self) -> bool:
+        changed = False
+        review_counts = self.deck_registry.storage.count_reviews_by_subject()
+        subjects = self.settings_manager.get_subjects()
+        for subject in subjects:
+            inputs = self._subject_inputs(subject, review_counts)
+            with self._lock:
+                entry = self._data["subjects"].get(subject)
+                stale = entry is None or entry["inputs"] != inputs or subject not in self._question_texts
+            if stale:
+                entry = self._compute_subject(subject, inputs)
+                with self._lock:
+                    changed |= entry != self._data["subjects"].get(subject)
+                    self._data["subjects"][subject] = entry
+        with self._lock:
+            for subject in set(self._data["subjects"]) - set(subjects):
+                del self._data["subjects"][subject]; changed = True
+        if self._latency is None:
+            self._build_latency()
+        total_reviews = sum(review_counts.values())
+        with self._lock:
+            if self._latency is not None and (self._data["latency_reviews"] != total_reviews or self._data["latency"] is None):
+                self._latency.question_texts = {k: v for texts in self._question_texts.values() for k, v in texts.items()}
+                self._data["latency"], self._data["latency_reviews"] = self._latency.summary(), total_reviews
+                changed = True
+        if changed:
+            self._save()
+        return changed
+
+    def _run_refresh(self, job: Job) -> Tuple[bool, List[Callable[[bool], None]]]:
+        changed = False
+        while True:
+            try:
+                changed |= self._refresh_once()
+            except Exception as e:
+                print(f"Aggiornamento dello snapshot delle statistiche non riuscito: {e}")
+            with self._lock:
+                # Le richieste arrivate durante il calcolo vengono servite con un altro giro
+                if self._rerun:
+                    self._rerun = False
+                    continue
+                callbacks, self._callbacks, self._refreshing = self._callbacks, [], None
+            return changed, callbacks
+
+    @staticmethod
+    def _notify(result: Tuple[bool, List[Callable[[bool], None]]]):
+        changed, callbacks = result
+        for on_done in callbacks:
+            on_done(changed)
+
+    def refresh(self, on_done: Optional[Callable[[bool], None]] = None):
+        """
+        Ricalcola in background le materie con input cambiati e il riepilogo delle latenze.
+        on_done(cambiato) viene chiamato nel thread di Tk, come ogni callback di JobExecutor.
+        """
+        self._sync_path()
+        with self._lock:
+            if on_done is not None:
+                self._callbacks.append(on_done)
+            if self._refreshing is not None:
+                self._rerun = True
+                return
+            self._rerun = False
+            self._refreshing = self.jobs.submit(self._run_refresh, name="analytics snapshot", on_done=self._notify, background=True)
+
+    def _record_latency(self, review: Dict[str, Any]):
+        """Aggiunge alle latenze in memoria un ripasso appena registrato nello storage (vedi AppDataManager.review_listeners)."""
+        with self._lock:
+            if self._latency_backlog is not None:
+                self._latency_backlog.append(review)
+            elif self._latency is not None:
+                self._latency.add_reviews([review])
+
+    def record_review(self, subject: str, question: Question, is_leech: bool):
+        """Aggiorna lo snapshot dopo un ripasso appena registrato, senza ricalcolare la materia."""
+        self._sync_path()
+        with self._lock:
+            entry = self._data["subjects"].get(subject)
+            if entry is None: return  # Materia mai calcolata: ci penserà il prossimo refresh
+            entry["inputs"][2] += 1
+            if is_leech and question.text not in entry["leech_questions"]:
+                entry["leech_questions"].append(question.text)
+            self._question_texts.setdefault(subject, {})[Question.compact_id(question.id)] = question.id
+        self._save()
+
+    def record_leeches(self, subject: str, questions: List[Question]):
+        """Aggiunge alle leech della materia le domande diventate ostiche fuori da un ripasso (es. in modalità esame)."""
+        with self._lock:
+            entry = self._data["subjects"].get(subject)
+            if entry is None or not questions: return
+            entry["leech_questions"].extend(q.text for q in questions if q.text not in entry["leech_questions"])
+        self._save()
@@ -1,57 +1,67 @@
-import json
 import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable
 from pathlib import Path
 
 from app.services.settings_manager import SettingsManager
 from app.services.config_manager import ConfigManager
+from app.services.storage import Storage
+from app.services.review_aggregates import ReviewAggregates
 
 class AppDataManager:
     def __init__(self, settings_manager: SettingsManager, config_manager: ConfigManager):
         self.settings_manager = settings_manager
         self.config_manager = config_manager
         self.data_path = self.config_manager.get_data_path()
-        self.filepath = self.data_path / "app_data.json"
+        self.storage = Storage.for_config(self.config_manager)
         self.data = self._load_data()
+        self.aggregates = ReviewAggregates(self.storage, self._retention_days())
+        # Chiamati con ogni ripasso appena registrato, lo stesso dizionario salvato nello storage
+        self.review_listeners: List[Callable[[Dict[str, Any]], None]] = []
 
     def _get_default_data(self) -> Dict[str, Any]:
-        """Restituisce la struttura dati di default."""
+        """Restituisce la struttura dati di default (il log dei ripassi è gestito dallo storage)."""
         return {
             "user_stats": {"current_streak": 0, "last_study_date": None, "longest_streak": 0},
-            "review_log": [],
             "retention_trend": []
         }
 
     def _load_data(self) -> Dict[str, Any]:
         """Carica i dati dal percorso dati corrente o crea un file di default."""
         try:
-            self.data_path.mkdir(parents=True, exist_ok=True)
-            if self.filepath.exists():
-                loaded_data = json.loads(self.filepath.read_text(encoding='utf-8'))
+            loaded_data = self.storage.load_app_data()
+            if loaded_data is not None:
                 # Assicura che le nuove chiavi esistano per retrocompatibilità
                 loaded_data.setdefault("retention_trend", [])
                 loaded_data.setdefault("user_stats", {}).setdefault("longest_streak", 0)
                 return loaded_data
             else:
                 default_data = self._get_default_data()
-                self.filepath.write_text(json.dumps(default_data, indent=2, ensure_ascii=False), encoding='utf-8')
+                self.storage.save_app_data(default_data)
                 return default_data
-        except (FileNotFoundError, json.JSONDecodeError):
+        except FileNotFoundError:
             return self._get_default_data()
 
     def _save_data(self):
         """Salva i dati correnti nel percorso dati corrente."""
-        self.data_path.mkdir(parents=True, exist_ok=True)
-        with open(self.filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
-
-    def log_review(self, subject: str, is_correct: bool):
-        """Registra un nuovo evento di ripasso, aggiorna lo streak e l'andamento della ritenzione."""
-        self.data.setdefault("review_log", []).append({
+        self.storage.save_app_data(self.data)
+
+    def log_review(self, subject: str, is_correct: bool, question_id: Optional[str] = None, rating: Optional[str] = None, latency: Optional[float] = None):
+        """
+        Registra un nuovo evento di ripasso (con id compatto della domanda, valutazione e tempo di risposta in
+        secondi), aggiorna lo streak e l'andamento della ritenzione.
+        """
+        review = {
             "timestamp": datetime.datetime.now().isoformat(),
             "subject": subject,
-            "is_correct": is_correct
-        })
+            "is_correct": is_correct,
+            "question_id": question_id,
+            "rating": rating,
+            "latency": None if latency is None else round(latency, 3)
+        }
+        self.storage.add_review(review)
+        self.aggregates.add(review)
+        for listener in self.review_listeners:
+            listener(review)
         self._update_study_streak()
         self._recalibrate_interval_modifier(subject)
         self._update_retention_trend()
@@ -90,12 +100,10 @@ class AppDataManager:
         stats["last_study_date"] = today.isoformat()
 
     def _recalibrate_interval_modifier(self, subject: str):
-        review_log = self.data.get("review_log", [])
-        subject_reviews = [r for r in review_log if r["subject"] == subject]
-        recent_reviews = subject_reviews[-50:]
-        if len(recent_reviews) < 20: return
-        correct_count = sum(1 for r in recent_reviews if r["is_correct"])
-        retention_rate = correct_count / len(recent_reviews)
+        # Esiti degli ultimi 50 ripassi della materia, dal buffer circolare degli aggregati
+        correct_count, recent_count = self.aggregates.recent(subject)
+        if recent_count < 20: return
+        retention_rate = correct_count / recent_count
         subject_data = self.settings_manager.get_subject_data(subject)
         if not subject_data: return
         modifier = subject_data.get("interval_modifier", 1.0)
@@ -106,31 +114,25 @@ class AppDataManager:
         self.settings_manager.save()
 
     def get_overall_stats(self) -> Dict[str, Any]:
-        review_log = self.get_review_log()
+        subject_counts = self.storage.count_reviews_by_subject()
         user_stats = self.get_user_stats()
-        total_reviews = len(review_log)
+        total_reviews = sum(subject_counts.values())
         if total_reviews == 0:
             return {"total_reviews": 0, "overall_retention": 0.0, "longest_streak": user_stats.get("longest_streak", 0), "most_studied": "N/D", "retention_trend": []}
 
-        subject_counts = {}
-        for r in review_log:
-            subject_counts[r["subject"]] = subject_counts.get(r["subject"], 0) + 1
         most_studied = max(subject_counts, key=subject_counts.get) if subject_counts else "N/D"
 
         # --- Dettagli per Materia ---
         subject_details = {}
         all_subjects = self.settings_manager.get_subjects()
-        global_settings = self.settings_manager.get_global_settings()
-        retention_days = global_settings.get("retention_period_days", 7)
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+        retention_days = self._retention_days()
 
         for subject in all_subjects:
             subject_data = self.settings_manager.get_subject_data(subject)
-            recent_subject_reviews = [r for r in review_log if r["subject"] == subject and datetime.datetime.fromisoformat(r["timestamp"]) >= cutoff_date]
+            correct_count, recent_count = self.aggregates.window(retention_days, subject)
             retention_rate = None
-            if recent_subject_reviews:
-                correct_count = sum(1 for r in recent_subject_reviews if r["is_correct"])
-                retention_rate = (correct_count / len(recent_subject_reviews)) * 100
+            if recent_count:
+                retention_rate = (correct_count / recent_count) * 100
             subject_details[subject] = {"status": subject_data.get("status", "N/D"),"retention_rate": retention_rate}
 
         return {
@@ -143,7 +145,7 @@ class AppDataManager:
         }
 
     def get_review_log(self) -> List[Dict[str, Any]]:
-        return self.data.get("review_log", [])
+        return self.storage.get_reviews()
 
     def get_user_stats(self) -> Dict[str, Any]:
         return self.data.get("user_stats", {})
@@ -151,18 +153,17 @@ class AppDataManager:
     def get_current_streak(self) -> int:
         return self.get_user_stats().get("current_streak", 0)
 
+    def _retention_days(self) -> int:
+        return self.settings_manager.get_global_settings().get("retention_period_days", 7)
+
     def get_retention_rate(self) -> float:
-        global_settings = self.settings_manager.get_global_settings()
-        retention_days = global_settings.get("retention_period_days", 7)
-        review_log = self.get_review_log()
-        if not review_log: return 0.0
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=retention_days)
-        relevant_reviews = [r for r in review_log if datetime.datetime.fromisoformat(r["timestamp"]) >= cutoff_date]
-        if not relevant_reviews: return 0.0
-        correct_reviews = sum(1 for review in relevant_reviews if review["is_correct"])
-        return (correct_reviews / len(relevant_reviews)) * 100
+        # Totali della finestra mantenuti dagli aggregati: nessuna scansione del log
+        correct_reviews, relevant_count = self.aggregates.window(self._retention_days())
+        if not relevant_count: return 0.0
+        return (correct_reviews / relevant_count) * 100
 
     def reload_data(self):
         self.data_path = self.config_manager.get_data_path()
-        self.filepath = self.data_path / "app_data.json"
-        self.data = self._load_data()
\ No newline at end of file
+        self.storage = Storage.for_config(self.config_manager)
+        self.data = self._load_data()
+        self.aggregates = ReviewAggregates(self.storage, self._retention_days())
\ No newline at end of file
@@ -71,6 +71,17 @@ class ConfigManager:
         path_str = self.config["profiles"][active_profile_name]["data_path"]
         return Path(path_str)
 
+    def get_storage_backend(self) -> str:
+        """Backend di persistenza del profilo attivo: "json" (predefinito) o "sqlite"."""
+        return self.config["profiles"][self.get_active_profile()].get("storage", "json")
+
+    def set_profile_storage(self, profile_name: str, backend: str):
+        """Imposta il backend di persistenza di un profilo esistente."""
+        if profile_name not in self.config["profiles"]:
+            raise ValueError(f"Profilo '{profile_name}' non trovato.")
+        self.config["profiles"][profile_name]["storage"] = backend
+        self.save_config()
+
     def get_active_profile(self) -> str:
         """Restituisce il nome del profilo attivo."""
         return self.config.get("active_profile", "Default")
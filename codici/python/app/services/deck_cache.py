@@ -0,0 +1,112 @@
+import os
+import json
+import marshal
+import struct
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Tuple
+
+from app.models.question_model import Question
+from app.services.text_processing import TextFileParser
+
+class DeckCache:
+    """
+    Cache persistente del paniere già analizzato, salvata accanto al file .txt.
+    Il file inizia con una breve intestazione JSON (dimensione, mtime e hash del .txt, numero di domande
+    e di immagini) seguita dalle domande serializzate con marshal: contare le carte richiede solo la
+    lettura dell'intestazione, e caricare le domande costa una frazione dell'analisi del testo.
+    """
+    MAGIC = b"DECK"
+    VERSION = 1
+    PREAMBLE = struct.Struct("<4sII")  # magic, versione, lunghezza dell'intestazione JSON
+    HASH_CHUNK_SIZE = 1 << 20
+
+    def __init__(self, txt_path: Path):
+        self.txt_path = Path(txt_path)
+        self.path = self.path_for(self.txt_path)
+
+    @staticmethod
+    def path_for(txt_path: Path) -> Path:
+        return Path(txt_path).with_suffix('.txt.deck.bin')
+
+    def _file_key(self) -> Tuple[int, int]:
+        stat = self.txt_path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _content_hash(self) -> str:
+        digest = hashlib.sha1()
+        with open(self.txt_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _read(self, with_payload: bool) -> Tuple[Optional[Dict[str, Any]], Optional[bytes]]:
+        """Intestazione (e, se richiesto, dati serializzati) del file di cache; (None, None) se assente o illeggibile."""
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, header_len = self.PREAMBLE.unpack(f.read(self.PREAMBLE.size))
+                if magic != self.MAGIC or version != self.VERSION:
+                    return None, None
+                header = json.loads(f.read(header_len).decode('utf-8'))
+                if header.get("marshal_version") != marshal.version:
+                    return None, None
+                return header, f.read() if with_payload else None
+        except (OSError, ValueError, struct.error):
+            return None, None
+
+    def _write(self, header: Dict[str, Any], payload: bytes):
+        """Scrive la cache in modo atomico (file temporaneo e rinomina); un errore non blocca l'applicazione."""
+        header_bytes = json.dumps(header).encode('utf-8')
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.PREAMBLE.pack(self.MAGIC, self.VERSION, len(header_bytes)))
+                f.write(header_bytes)
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Impossibile salvare la cache del paniere {self.path}: {e}")
+
+    def _refresh(self, with_payload: bool) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        """
+        Restituisce intestazione e dati aggiornati. Se dimensione e mtime coincidono la cache è valida senza
+        leggere il .txt; altrimenti si confronta l'hash del contenuto (ad esempio dopo una sincronizzazione
+        che ha solo toccato il file) e si analizza di nuovo il paniere solo se è davvero cambiato.
+        """
+        size, mtime_ns = self._file_key()
+        header, payload = self._read(with_payload)
+        if header is not None and header["size"] == size and header["mtime_ns"] == mtime_ns:
+            return header, payload
+
+        content_hash = self._content_hash()
+        if header is not None and header["content_hash"] == content_hash:
+            header, payload = self._read(True)
+            if header is not None:
+                header.update(size=size, mtime_ns=mtime_ns)
+                self._write(header, payload)
+                return header, payload
+
+        questions = TextFileParser(self.txt_path).parse()
+        payload = marshal.dumps([(q.number, q.text, q.options, q.correct_answer, str(q.image_path) if q.image_path else None) for q in questions])
+        header = {"size": size, "mtime_ns": mtime_ns, "content_hash": content_hash, "marshal_version": marshal.version,
+                  "question_count": len(questions), "image_count": sum(1 for q in questions if q.image_path)}
+        self._write(header, payload)
+        return header, payload
+
+    def metadata(self) -> Dict[str, Any]:
+        """Metadati del paniere (question_count, image_count, ...), letti dall'intestazione senza creare le domande."""
+        header, _ = self._refresh(with_payload=False)
+        return header
+
+    def question_count(self) -> int:
+        return self.metadata()["question_count"]
+
+    def load_questions(self) -> List[Question]:
+        """Domande del paniere, identiche a quelle di TextFileParser.parse(), lette dalla cache quando possibile."""
+        _, payload = self._refresh(with_payload=True)
+        try:
+            records = marshal.loads(payload)
+        except (EOFError, ValueError, TypeError):
+            return TextFileParser(self.txt_path).parse()
+        return [Question(number, text, options, correct_answer, Path(image_path) if image_path else None)
+                for number, text, options, correct_answer, image_path in records]
@@ -0,0 +1,116 @@
+import datetime
+import threading
+from typing import List, Dict, Optional, Tuple, Any
+
+from app.services.srs_manager import SRSManager
+from app.services.app_data_manager import AppDataManager
+from app.services.settings_manager import SettingsManager
+from app.services.config_manager import ConfigManager
+from app.services.storage import Storage
+
+class DeckRegistry:
+    """
+    Registro dei deck SRS condiviso dal controller: un solo SRSManager attivo per materia, riusato tra
+    dashboard, analisi e sessioni di studio. Un gestore viene ricostruito solo se il deck è cambiato su disco
+    (firma dello storage) o se è cambiato il profilo. I conteggi di carte da ripassare e leech vengono dagli
+    indici del gestore attivo oppure, con uno storage indicizzato, da query memorizzate per materia e
+    ricalcolate solo quando cambiano il deck o il giorno.
+    Il registro è usato anche dai thread di lavoro (statistiche della dashboard, snapshot dell'analisi): un RLock
+    serializza la creazione dei gestori, così una materia non viene mai caricata due volte in parallelo.
+    """
+    def __init__(self, app_data_manager: AppDataManager, settings_manager: SettingsManager, config_manager: ConfigManager):
+        self.app_data_manager = app_data_manager
+        self.settings_manager = settings_manager
+        self.config_manager = config_manager
+        self._profile_key: Optional[Tuple[str, str]] = None
+        self._managers: Dict[str, SRSManager] = {}
+        # materia -> (firma del deck, giorno, carte da ripassare, leech)
+        self._counters: Dict[str, Tuple[Any, int, int, int]] = {}
+        self.lock = threading.RLock()
+        # Il gestore di una materia rimossa non deve sopravvivere ai suoi file
+        settings_manager.removal_listeners.append(self.invalidate)
+
+    @property
+    def storage(self) -> Storage:
+        return Storage.for_config(self.config_manager)
+
+    def _sync_profile(self):
+        """Dopo un cambio di profilo, di cartella dati o di backend nessun gestore è più valido."""
+        profile_key = (str(self.config_manager.get_data_path()), self.config_manager.get_storage_backend())
+        if profile_key != self._profile_key:
+            self.invalidate()
+            self._profile_key = profile_key
+
+    def invalidate(self, subject: Optional[str] = None):
+        with self.lock:
+            if subject is None:
+                self._managers.clear(); self._counters.clear()
+            else:
+                self._managers.pop(subject, None); self._counters.pop(subject, None)
+
+    def _live_manager(self, subject: str) -> Optional[SRSManager]:
+        """Il gestore già caricato della materia, se il deck su disco non è cambiato nel frattempo."""
+        manager = self._managers.get(subject)
+        if manager is not None and manager.signature != self.storage.deck_signature(subject):
+            self.invalidate(subject)
+            return None
+        return manager
+
+    def get_manager(self, subject: str, exam_date: Optional[datetime.date] = None, interval_modifier: float = 1.0) -> SRSManager:
+        with self.lock:
+            self._sync_profile()
+            manager = self._live_manager(subject)
+            if manager is None:
+                manager = self._managers[subject] = SRSManager(subject, exam_date, interval_modifier, self.app_data_manager, self.settings_manager, self.config_manager)
+            manager.exam_date = exam_date
+            manager.interval_modifier = interval_modifier
+            return manager
+
+    def _counting_manager(self, subject: str) -> Optional[SRSManager]:
+        """
+        Gestore da usare per i conteggi. Se lo storage non ha query indicizzate (JSON), contare richiede comunque
+        di leggere il deck: conviene caricarlo una volta nel gestore e riusarne gli indici.
+        """
+        manager = self._live_manager(subject)
+        if manager is None and not self.storage.INDEXED_QUERIES:
+            manager = self.get_manager(subject)
+        return manager
+
+    def get_counts(self, subject: str) -> Tuple[int, int]:
+        """(carte da ripassare oggi, leech) della materia, dagli indici del gestore attivo o da una query sullo storage."""
+        with self.lock:
+            self._sync_profile()
+            manager = self._counting_manager(subject)
+            if manager is not None:
+                return manager.get_due_count(), manager.get_leech_count()
+            # Senza gestore attivo il deck cambia solo da fuori: la firma dello storage basta a invalidare i contatori
+            today = datetime.date.today().toordinal()
+            signature = self.storage.deck_signature(subject)
+            cached = self._counters.get(subject)
+            if cached is None or cached[0] != signature or cached[1] != today:
+                due = self.storage.count_due_cards(subject, datetime.date.fromordinal(today), SRSManager.LEECH_THRESHOLD)
+                leeches = self.storage.count_leech_cards(subject, SRSManager.LEECH_THRESHOLD)
+                cached = self._counters[subject] = (signature, today, due, leeches)
+            return cached[2], cached[3]
+
+    def total_due(self, subjects: List[str]) -> int:
+        return sum(self.get_counts(subject)[0] for subject in subjects)
+
+    def total_leeches(self, subjects: List[str]) -> int:
+        return sum(self.get_counts(subject)[1] for subject in subjects)
+
+    def get_question_ids(self, subject: str) -> List[str]:
+        """Id delle domande presenti nel deck della materia."""
+        with self.lock:
+            self._sync_profile()
+            manager = self._counting_manager(subject)
+            return manager.question_ids() if manager is not None else self.storage.get_card_ids(subject)
+
+    def get_leech_texts(self, subject: str) -> List[str]:
+        """Testi delle domande leech della materia, senza caricare il deck se non è già attivo."""
+        with self.lock:
+            self._sync_profile()
+            manager = self._counting_manager(subject)
+            if manager is not None:
+                return [q.text for q in manager.get_leech_questions()]
+            return [item["question"]["text"] for item in self.storage.get_leech_cards(subject, SRSManager.LEECH_THRESHOLD)]
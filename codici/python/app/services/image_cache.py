@@ -0,0 +1,237 @@
+import threading
+import collections
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, Callable, Any, TYPE_CHECKING
+
+from app.services.job_executor import Job, JobExecutor
+
+if TYPE_CHECKING:
+    from app.services.thumbnail_cache import ThumbnailCache
+
+class ImageCache:
+    """
+    Cache LRU delle immagini decodificate, limitata da un budget in byte (larghezza × altezza × canali):
+    quando un'aggiunta supera il budget vengono scartate le immagini usate meno di recente. Condivisa tra il
+    thread di Tk e quello di prefetch, quindi ogni operazione è protetta da un lock.
+    """
+    DEFAULT_BUDGET_MB = 128
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.nbytes = 0
+        self._images: 'collections.OrderedDict[Path, Any]' = collections.OrderedDict()
+        self._sizes: dict = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(image: Any) -> int:
+        width, height = image.size
+        return width * height * len(image.getbands())
+
+    def __contains__(self, path: Path) -> bool:
+        with self._lock:
+            return path in self._images
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def get(self, path: Path) -> Optional[Any]:
+        """L'immagine, se presente, diventa la più recente."""
+        with self._lock:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+            return image
+
+    def put(self, path: Path, image: Any):
+        size = self.image_bytes(image)
+        with self._lock:
+            if path in self._images:
+                self.nbytes -= self._sizes[path]
+            self._images[path] = image; self._sizes[path] = size
+            self._images.move_to_end(path)
+            self.nbytes += size
+            # L'immagine appena aggiunta resta sempre, anche da sola oltre il budget
+            while self.nbytes > self.budget_bytes and len(self._images) > 1:
+                old_path, _ = self._images.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_path)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear(); self._sizes.clear()
+            self.nbytes = 0
+
+class ImagePrefetcher:
+    """
+    Decodifica in background (un lavoro di JobExecutor) le immagini attorno alla domanda corrente. A ogni spostamento del
+    cursore prioritize() sostituisce la coda: prima l'immagine corrente, poi le vicine alternando successiva e
+    precedente fino a `radius` posizioni. Le immagini già in cache vengono solo rinfrescate nell'ordine LRU,
+    così quelle vicine al cursore sono le ultime a essere scartate. Il caricamento (`loader`) è passato da
+    fuori: la libreria di immagini viene importata solo da chi la usa. `resolve` sceglie il file da decodificare
+    per ogni figura (es. la miniatura già pronta invece dell'originale).
+    """
+    DEFAULT_RADIUS = 3
+
+    def __init__(self, cache: ImageCache, loader: Callable[[Path], Any], radius: int = DEFAULT_RADIUS,
+                 resolve: Optional[Callable[[Path], Path]] = None, jobs: Optional[JobExecutor] = None):
+        self.cache = cache
+        self.loader = loader
+        self.radius = radius
+        self.resolve = resolve
+        self.jobs = jobs or JobExecutor.instance()
+        self._queue: List[Path] = []
+        self._lock = threading.Lock()
+        self._stopped = False
+        # Il lavoro resta in esecuzione finché la coda non si svuota; prioritize() ne avvia uno nuovo se serve
+        self._job: Optional[Job] = None
+
+    def window(self, paths: List[Optional[Path]], index: int) -> List[Path]:
+        """Percorsi da caricare in ordine di priorità per il cursore in `index` (None = domanda senza immagine)."""
+        order = [index]
+        for distance in range(1, self.radius + 1):
+            order += [index + distance, index - distance]
+        window = []
+        for position in order:
+            if 0 <= position < len(paths) and paths[position] is not None and paths[position] not in window:
+                window.append(paths[position])
+        return window
+
+    def prioritize(self, paths: List[Optional[Path]], index: int):
+        window = self.window(paths, index)
+        if self.resolve is not None:
+            window = [self.resolve(path) for path in window]
+        # Dalla meno alla più importante: l'immagine corrente diventa la più recente della cache
+        for path in reversed(window):
+            self.cache.get(path)
+        with self._lock:
+            self._queue = [path for path in window if path not in self.cache]
+            if self._queue and self._job is None and not self._stopped:
+                self._job = self.jobs.submit(self._run, name="image prefetch", background=True)
+
+    def load(self, path: Path) -> Optional[Any]:
+        """Carica subito un'immagine nel thread chiamante (es. quella corrente non ancora pronta)."""
+        image = self.cache.get(path)
+        if image is None:
+            try:
+                image = self.loader(path)
+            except Exception as e:
+                print(f"Errore caricamento immagine {path}: {e}")
+                return None
+            self.cache.put(path, image)
+        return image
+
+    def _run(self, job: Job):
+        while True:
+            with self._lock:
+                if job.cancelled or not self._queue:
+                    if self._job is job: self._job = None
+                    return
+                path = self._queue.pop(0)
+            if path not in self.cache and path.exists():
+                self.load(path)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._queue = []
+            if self._job is not None:
+                self._job.cancel()
+
+class ImageResizer:
+    """
+    Ridimensionamento delle figure nel pool di thread di JobExecutor, fuori dal thread di Tk. Il risultato (immagine già
+    scalata per il riquadro) è indicizzato per (percorso, riquadro arrotondato a BUCKET pixel), così i piccoli
+    ridimensionamenti della finestra riusano lo stesso risultato. Il thread di Tk si limita ad avvolgere il
+    risultato con `wrap` (es. ImageTk.PhotoImage) tramite photo(); le ultime immagini avvolte restano in cache.
+    Con `thumbnails` si parte dalla miniatura più piccola che basta per il riquadro, creandola se manca.
+    """
+    BUCKET = 64
+    MAX_READY = 24
+    MAX_PHOTOS = 12
+
+    def __init__(self, prefetcher: ImagePrefetcher, wrap: Callable[[Any], Any], thumbnails: Optional['ThumbnailCache'] = None,
+                 jobs: Optional[JobExecutor] = None):
+        self.prefetcher = prefetcher
+        self.wrap = wrap
+        self.thumbnails = thumbnails
+        self.jobs = jobs or prefetcher.jobs
+        self._jobs: Dict[Tuple[Path, Tuple[int, int]], Job] = {}
+        self._ready: 'collections.OrderedDict[Tuple[Path, Tuple[int, int]], Any]' = collections.OrderedDict()
+        self._photos: 'collections.OrderedDict[Tuple[Path, Tuple[int, int]], Any]' = collections.OrderedDict()
+        self._pending: Dict[Tuple[Path, Tuple[int, int]], List[Callable[[], None]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def bucket(cls, max_width: float, max_height: float) -> Tuple[int, int]:
+        return max(cls.BUCKET, int(max_width) // cls.BUCKET * cls.BUCKET), max(cls.BUCKET, int(max_height) // cls.BUCKET * cls.BUCKET)
+
+    def request(self, path: Path, box: Tuple[int, int], on_ready: Optional[Callable[[], None]] = None):
+        """
+        Richiede l'immagine scalata per il riquadro. on_ready viene chiamato quando è pronta (non se lo era già),
+        nel thread di Tk come ogni callback di JobExecutor.
+        """
+        key = (path, box)
+        with self._lock:
+            if key in self._ready: return
+            callbacks = self._pending.get(key)
+            if callbacks is None:
+                callbacks = self._pending[key] = []
+                self._jobs[key] = self.jobs.submit(self._resize, key, name="image resize", on_done=self._notify)
+            if on_ready is not None:
+                callbacks.append(on_ready)
+
+    def _resize(self, job: Job, key: Tuple[Path, Tuple[int, int]]) -> List[Callable[[], None]]:
+        path, (max_width, max_height) = key
+        resized = None
+        image = None
+        if path.exists():
+            source = self.thumbnails.ensure(path, (max_width, max_height)) if self.thumbnails else path
+            image = self.prefetcher.load(source)
+        if image is not None:
+            try:
+                from PIL import Image
+                width, height = image.size
+                ratio = min(max_width / width, max_height / height)
+                resized = image.resize((int(width * ratio), int(height * ratio)), Image.Resampling.LANCZOS) if ratio < 1 else image.copy()
+                if resized.mode not in ("RGB", "RGBA"):
+                    resized = resized.convert("RGB")
+            except Exception as e:
+                print(f"Errore ridimensionamento immagine {path}: {e}")
+                resized = None
+        with self._lock:
+            callbacks = self._pending.pop(key, [])
+            self._jobs.pop(key, None)
+            if resized is None: return []
+            self._ready[key] = resized
+            while len(self._ready) > self.MAX_READY:
+                self._ready.popitem(last=False)
+        return callbacks
+
+    @staticmethod
+    def _notify(callbacks: List[Callable[[], None]]):
+        for on_ready in callbacks:
+            on_ready()
+
+    def photo(self, path: Path, box: Tuple[int, int]) -> Optional[Any]:
+        """Solo dal thread di Tk: l'immagine pronta avvolta con `wrap`, oppure None se non è ancora stata scalata."""
+        key = (path, box)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        with self._lock:
+            resized = self._ready.get(key)
+            if resized is not None: self._ready.move_to_end(key)
+        if resized is None: return None
+        photo = self._photos[key] = self.wrap(resized)
+        while len(self._photos) > self.MAX_PHOTOS:
+            self._photos.popitem(last=False)
+        return photo
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._ready.clear(); self._pending.clear(); self._jobs.clear()
+        for job in jobs:
+            job.cancel()
+        self._photos.clear()
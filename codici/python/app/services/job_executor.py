@@ -0,0 +1,215 @@
+import os
+import queue
+import threading
+import multiprocessing
+import concurrent.futures
+from typing import Optional, Callable, Any, Set, List
+
+class Job:
+    """
+    Un lavoro inviato a JobExecutor. Il lavoro in un thread riceve il Job come primo argomento: controlla
+    `cancelled` nei punti in cui può fermarsi e segnala l'avanzamento con progress(). Il lavoro in un processo
+    riceve solo i suoi argomenti e può essere annullato solo finché non è partito (il risultato di un lavoro
+    annullato viene comunque scartato). Un lavoro non deve mai attendere un altro con result(): lo occuperebbe un
+    thread del pool per tutta l'attesa. Il passo successivo si aggancia con then().
+    """
+    def __init__(self, executor: 'JobExecutor', name: str, on_done: Optional[Callable[[Any], None]],
+                 on_error: Optional[Callable[[BaseException], None]], on_progress: Optional[Callable[..., None]]):
+        self.name = name
+        self.executor = executor
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.future: Optional[concurrent.futures.Future] = None
+        self._cancel_event = threading.Event()
+        self._finished = False
+        self._followers: List[Callable[['Job'], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Nessuna callback del lavoro verrà più chiamata; se non è ancora partito non partirà."""
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def cancel_pending(self) -> bool:
+        """Annulla il lavoro solo se non è ancora partito; restituisce True se è stato annullato."""
+        if self.future is None or not self.future.cancel(): return False
+        self._cancel_event.set()
+        return True
+
+    def progress(self, *values: Any):
+        if self.on_progress is not None and not self.cancelled:
+            self.executor.dispatch(self._deliver, self.on_progress, values)
+
+    def _deliver(self, callback: Callable[..., None], args: tuple):
+        # Ricontrollato al momento della consegna: l'annullamento può arrivare mentre il messaggio è in coda
+        if not self.cancelled:
+            callback(*args)
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def succeeded(self) -> bool:
+        """True se il lavoro è finito senza errori (anche se annullato mentre era in corso: il risultato c'è)."""
+        future = self.future
+        return future is not None and future.done() and not future.cancelled() and future.exception() is None
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """Il risultato di un lavoro finito (script e benchmark possono anche attenderlo; i lavori e il thread di Tk no)."""
+        return self.future.result(timeout)
+
+    def then(self, callback: Callable[['Job'], None]):
+        """
+        Chiama callback(job) quando il lavoro finisce, in ogni caso (riuscito, fallito o annullato), nel thread di Tk
+        come le altre callback; subito se è già finito. Va chiamato dal thread di Tk.
+        """
+        with self.executor._lock:
+            if not self._finished:
+                self._followers.append(callback)
+                return
+        callback(self)
+
+class JobExecutor:
+    """
+    Esecuzione del lavoro in background: un pool limitato di thread per il lavoro che attende il disco o
+    rilascia il GIL, e un pool di processi, creato al primo uso, per il lavoro di CPU (es. la similarità).
+    I lavori lunghi che nessuno attende (lotti di miniature, prefetch, precaricamenti, snapshot) vanno nel pool di
+    thread di sottofondo (submit(..., background=True)), così non occupano i thread dei lavori brevi che l'utente
+    aspetta, come il ridimensionamento della figura corrente o la preparazione di una sessione.
+    Le callback dei lavori (risultato, errore, avanzamento) non vengono mai chiamate dai thread di lavoro: finiscono
+    in una coda che il thread di Tk legge con after() finché ci sono lavori in corso, quindi possono toccare
+    l'interfaccia. Senza finestra collegata (script e benchmark) vengono eseguite direttamente nel thread di lavoro.
+    Un solo esecutore è condiviso da tutta l'applicazione (instance()), come gli archivi di Storage.for_config.
+    """
+    POLL_MS = 50  # Intervallo di lettura della coda delle callback mentre ci sono lavori in corso
+    MAX_THREADS = 4
+    MAX_BACKGROUND_THREADS = 2
+    _instance: Optional['JobExecutor'] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_threads: int = MAX_THREADS, max_processes: Optional[int] = None, max_background_threads: int = MAX_BACKGROUND_THREADS):
+        self.max_processes = max_processes or max(1, (os.cpu_count() or 2) - 1)
+        self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="job")
+        self._background_threads = concurrent.futures.ThreadPoolExecutor(max_workers=max_background_threads, thread_name_prefix="background-job")
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._root = None
+        self._tk_thread: Optional[int] = None
+        self._callbacks: queue.Queue = queue.Queue()
+        self._jobs: Set[Job] = set()
+        self._lock = threading.Lock()
+        self._polling = False
+
+    @classmethod
+    def instance(cls) -> 'JobExecutor':
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def attach(self, root):
+        """Collega la finestra principale: da qui in poi le callback vengono eseguite nel thread di Tk (il chiamante)."""
+        self._root = root
+        self._tk_thread = threading.get_ident()
+
+    def submit(self, func: Callable[..., Any], *args: Any, name: Optional[str] = None, on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, on_progress: Optional[Callable[..., None]] = None,
+               background: bool = False) -> Job:
+        """Esegue func(job, *args) nel pool di thread, o in quello di sottofondo se `background`."""
+        job = Job(self, name or func.__name__, on_done, on_error, on_progress)
+        threads = self._background_threads if background else self._threads
+        self._start(job, lambda: threads.submit(func, job, *args))
+        return job
+
+    def submit_process(self, func: Callable[..., Any], *args: Any, name: Optional[str] = None, on_done: Optional[Callable[[Any], None]] = None,
+                       on_error: Optional[Callable[[BaseException], None]] = None) -> Job:
+        """Esegue func(*args) nel pool di processi: funzione e argomenti devono essere serializzabili con pickle."""
+        job = Job(self, name or func.__name__, on_done, on_error, None)
+        with self._lock:
+            if self._processes is None:
+                # spawn su ogni sistema: un fork del processo con Tk e i thread di lavoro attivi non è sicuro
+                self._processes = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_processes, mp_context=multiprocessing.get_context("spawn"))
+            processes = self._processes
+        self._start(job, lambda: processes.submit(func, *args))
+        return job
+
+    def _start(self, job: Job, submit: Callable[[], concurrent.futures.Future]):
+        with self._lock:
+            self._jobs.add(job)
+            start_polling = self._root is not None and not self._polling and threading.get_ident() == self._tk_thread
+            if start_polling:
+                self._polling = True
+        try:
+            job.future = submit()
+        except Exception:
+            with self._lock:
+                self._jobs.discard(job)
+            raise
+        job.future.add_done_callback(lambda future: self._finished(job, future))
+        if start_polling:
+            self._root.after(self.POLL_MS, self._poll)
+
+    def _finished(self, job: Job, future: concurrent.futures.Future):
+        # Chiamata dal thread che ha completato il lavoro (o da quello che lo ha annullato)
+        if not future.cancelled() and not job.cancelled:
+            error = future.exception()
+            if error is None:
+                if job.on_done is not None:
+                    self.dispatch(job._deliver, job.on_done, (future.result(),))
+            elif job.on_error is not None:
+                self.dispatch(job._deliver, job.on_error, (error,))
+            else:
+                print(f"Lavoro in background '{job.name}' non riuscito: {error!r}")
+        with self._lock:
+            job._finished = True
+            followers, job._followers = job._followers, []
+        # Accodate prima di togliere il lavoro dall'elenco: la lettura della coda non si ferma prima di consegnarle
+        for callback in followers:
+            self.dispatch(callback, job)
+        with self._lock:
+            self._jobs.discard(job)
+
+    def dispatch(self, callback: Callable[..., None], *args: Any):
+        """Esegue callback(*args) nel thread di Tk (alla prossima lettura della coda), o subito se non c'è una finestra."""
+        if self._root is None:
+            self._run_callback(callback, args)
+        else:
+            self._callbacks.put((callback, args))
+
+    @staticmethod
+    def _run_callback(callback: Callable[..., None], args: tuple):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Errore nella callback di un lavoro in background: {e!r}")
+
+    def _poll(self):
+        while True:
+            try:
+                callback, args = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            self._run_callback(callback, args)
+        with self._lock:
+            # La lettura si ferma quando non ci sono più lavori; un lavoro inviato da un altro thread mentre è ferma
+            # consegna le sue callback alla ripresa (i lavori vengono avviati dal thread di Tk o da altri lavori in corso)
+            self._polling = bool(self._jobs) or not self._callbacks.empty()
+            if not self._polling: return
+        try:
+            self._root.after(self.POLL_MS, self._poll)
+        except Exception:
+            self._polling = False  # Finestra già distrutta
+
+    def shutdown(self):
+        """Annulla i lavori in coda e segnala a quelli in corso di fermarsi; non attende."""
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._background_threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
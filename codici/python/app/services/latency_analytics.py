@@ -0,0 +1,72 @@
+import datetime
+from array import array
+from typing import List, Dict, Any, Iterable
+
+class LatencyAnalytics:
+    """
+    Distribuzioni dei tempi di risposta calcolate dal log dei ripassi: percentili per materia, domande più
+    lente (evidenziando quelle lente ma risposte correttamente) e andamento settimanale della mediana.
+    I ripassi vengono letti in streaming e le latenze raccolte in colonne (array di float) per gruppo;
+    i percentili si calcolano ordinando ogni colonna una sola volta.
+    I ripassi senza latenza (registrati prima che venisse salvata) vengono ignorati.
+    """
+    MIN_REVIEWS = 2        # Ripassi minimi perché una domanda compaia tra le più lente
+    SLOWEST_LIMIT = 15
+    SLOW_CORRECT_RATE = 0.8
+
+    def __init__(self, question_texts: Dict[str, str]):
+        # id compatto -> testo della domanda (vedi Question.compact_id)
+        self.question_texts = question_texts
+        self._by_subject: Dict[str, array] = {}
+        self._by_question: Dict[str, array] = {}
+        self._question_subject: Dict[str, str] = {}
+        self._question_correct: Dict[str, int] = {}
+        self._by_week: Dict[str, array] = {}
+
+    def add_reviews(self, reviews: Iterable[Dict[str, Any]]) -> 'LatencyAnalytics':
+        for review in reviews:
+            latency = review.get("latency")
+            if not latency or latency <= 0: continue
+            subject, question_id = review["subject"], review.get("question_id")
+            self._by_subject.setdefault(subject, array('f')).append(latency)
+            year, week, _ = datetime.date.fromisoformat(review["timestamp"][:10]).isocalendar()
+            self._by_week.setdefault(f"{year}-W{week:02d}", array('f')).append(latency)
+            if question_id is not None:
+                self._by_question.setdefault(question_id, array('f')).append(latency)
+                self._question_subject[question_id] = subject
+                self._question_correct[question_id] = self._question_correct.get(question_id, 0) + bool(review["is_correct"])
+        return self
+
+    @staticmethod
+    def percentile(sorted_values: List[float], fraction: float) -> float:
+        """Percentile con interpolazione lineare tra i due valori più vicini."""
+        position = (len(sorted_values) - 1) * fraction
+        lower = int(position)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        {"subjects": {materia: {count, mean, p50, p90}}, "slowest": [{subject, question_text, count, median,
+        correct_rate, slow_but_correct}], "trend": [{week, count, median}]}
+        """
+        subjects: Dict[str, Dict[str, float]] = {}
+        for subject, latencies in self._by_subject.items():
+            ordered = sorted(latencies)
+            subjects[subject] = {"count": len(ordered), "mean": sum(ordered) / len(ordered),
+                                 "p50": self.percentile(ordered, 0.5), "p90": self.percentile(ordered, 0.9)}
+
+        slowest = []
+        for question_id, latencies in self._by_question.items():
+            if len(latencies) < self.MIN_REVIEWS: continue
+            subject = self._question_subject[question_id]
+            median = self.percentile(sorted(latencies), 0.5)
+            correct_rate = self._question_correct[question_id] / len(latencies)
+            slowest.append({"subject": subject, "question_text": self.question_texts.get(question_id, f"[{question_id}]"),
+                            "count": len(latencies), "median": median, "correct_rate": correct_rate,
+                            "slow_but_correct": correct_rate >= self.SLOW_CORRECT_RATE and median >= subjects[subject]["p90"]})
+        slowest.sort(key=lambda item: item["median"], reverse=True)
+
+        trend = [{"week": week, "count": len(latencies), "median": self.percentile(sorted(latencies), 0.5)}
+                 for week, latencies in sorted(self._by_week.items())]
+        return {"subjects": subjects, "slowest": slowest[:self.SLOWEST_LIMIT], "trend": trend}
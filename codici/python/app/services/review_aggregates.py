@@ -0,0 +1,78 @@
+import datetime
+import collections
+from typing import Dict, Deque, List, Tuple, Any, Iterable, Optional
+
+class ReviewAggregates:
+    """
+    Aggregati dei ripassi aggiornati in O(1) a ogni nuovo ripasso, così registrare un ripasso non costa
+    di più quando il log cresce:
+    - per materia, un buffer circolare con gli esiti degli ultimi RECENT_SIZE ripassi (ricalibrazione);
+    - la finestra di ritenzione (ultimi `retention_days` giorni): i ripassi che vi cadono, in ordine, con
+      i totali globali e per materia. I ripassi usciti dalla finestra vengono scartati alla lettura.
+    Vengono ricostruiti dallo storage al caricamento e quando cambia l'ampiezza della finestra.
+    """
+    RECENT_SIZE = 50
+
+    def __init__(self, storage, retention_days: int):
+        self.storage = storage
+        self._recent: Dict[str, Deque[bool]] = {}
+        self._recent_correct: Dict[str, int] = {}
+        self._window: Deque[Tuple[datetime.datetime, str, bool]] = collections.deque()
+        self._window_totals = [0, 0]
+        self._window_by_subject: Dict[str, List[int]] = {}
+        self.rebuild(retention_days)
+
+    def rebuild(self, retention_days: int):
+        """Ricostruisce buffer e finestra a partire dal log dello storage."""
+        self.retention_days = retention_days
+        self._recent.clear(); self._recent_correct.clear()
+        for subject in self.storage.count_reviews_by_subject():
+            for review in self.storage.get_recent_reviews(subject, self.RECENT_SIZE):
+                self._add_recent(subject, review["is_correct"])
+        self._window.clear(); self._window_by_subject.clear()
+        self._window_totals = [0, 0]
+        since = (datetime.datetime.now() - datetime.timedelta(days=retention_days)).isoformat()
+        self._add_to_window(self.storage.get_reviews_since(since))
+
+    def _add_recent(self, subject: str, is_correct: bool):
+        recent = self._recent.get(subject)
+        if recent is None:
+            recent = self._recent[subject] = collections.deque(maxlen=self.RECENT_SIZE)
+            self._recent_correct[subject] = 0
+        if len(recent) == recent.maxlen:
+            self._recent_correct[subject] -= recent[0]
+        recent.append(is_correct)
+        self._recent_correct[subject] += is_correct
+
+    def _add_to_window(self, reviews: Iterable[Dict[str, Any]]):
+        for review in reviews:
+            timestamp, subject, is_correct = datetime.datetime.fromisoformat(review["timestamp"]), review["subject"], bool(review["is_correct"])
+            self._window.append((timestamp, subject, is_correct))
+            subject_totals = self._window_by_subject.setdefault(subject, [0, 0])
+            for totals in (self._window_totals, subject_totals):
+                totals[0] += is_correct; totals[1] += 1
+
+    def add(self, review: Dict[str, Any]):
+        """Registra un nuovo ripasso ({"timestamp", "subject", "is_correct"}, come nello storage)."""
+        self._add_recent(review["subject"], bool(review["is_correct"]))
+        self._add_to_window([review])
+
+    def _evict(self, retention_days: int):
+        if retention_days != self.retention_days:
+            self.rebuild(retention_days)
+            return
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+        while self._window and self._window[0][0] < cutoff:
+            _, subject, is_correct = self._window.popleft()
+            for totals in (self._window_totals, self._window_by_subject[subject]):
+                totals[0] -= is_correct; totals[1] -= 1
+
+    def recent(self, subject: str) -> Tuple[int, int]:
+        """(corretti, totali) tra gli ultimi RECENT_SIZE ripassi della materia."""
+        return self._recent_correct.get(subject, 0), len(self._recent.get(subject, ()))
+
+    def window(self, retention_days: int, subject: Optional[str] = None) -> Tuple[int, int]:
+        """(corretti, totali) tra i ripassi degli ultimi `retention_days` giorni, globali o di una materia."""
+        self._evict(retention_days)
+        correct, total = self._window_totals if subject is None else self._window_by_subject.get(subject, (0, 0))
+        return correct, total
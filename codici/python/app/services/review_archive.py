@@ -0,0 +1,122 @@
+import os
+import gzip
+import json
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Iterator, Iterable
+
+from app.models.review_log import ReviewLog
+from app.services.write_behind import atomic_write_text
+
+class ReviewArchive:
+    """
+    Archivio dei ripassi dei mesi chiusi, nella cartella review_log/ accanto ad app_data.json.
+    Ogni mese è un segmento compresso e immutabile (AAAA-MM.jsonl.gz): una riga di intestazione con le
+    materie, le domande e le valutazioni del mese, poi una riga compatta per ripasso
+    [microsecondi, indice materia, esito, indice domanda, indice valutazione, latenza in ms o -1].
+    rollups.json contiene i totali precalcolati di ogni mese (per materia, con primo e ultimo timestamp),
+    così all'avvio non si apre nessun segmento e le query che li attraversano leggono solo quelli necessari.
+    """
+    ROLLUPS_NAME = "rollups.json"
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.rollups: Dict[str, Dict[str, Any]] = {}
+        try:
+            self.rollups = json.loads((self.directory / self.ROLLUPS_NAME).read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @staticmethod
+    def month_of(timestamp: str) -> str:
+        return timestamp[:7]
+
+    def months(self) -> List[str]:
+        return sorted(self.rollups)
+
+    def segment_path(self, month: str) -> Path:
+        return self.directory / f"{month}.jsonl.gz"
+
+    def archive_month(self, month: str, records: List[Dict[str, Any]]):
+        """
+        Chiude un mese: scrive il segmento compresso e aggiorna i totali. Se il mese è già archiviato vengono
+        aggiunti solo i ripassi successivi all'ultimo presente (un archivio interrotto può essere ripetuto).
+        """
+        rollup = self.rollups.get(month)
+        if rollup is not None:
+            records = [r for r in records if r["timestamp"] > rollup["last"]]
+            if not records: return
+            records = list(self.iter_month(month)) + records
+        self.directory.mkdir(parents=True, exist_ok=True)
+        subjects: Dict[str, int] = {}
+        questions: Dict[Optional[str], int] = {}
+        ratings: Dict[Optional[str], int] = {}
+        totals: Dict[str, List[int]] = {}
+        tmp_path = self.segment_path(month).with_name(self.segment_path(month).name + ".tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            rows = []
+            for r in records:
+                subject_id = subjects.setdefault(r["subject"], len(subjects))
+                question_id = questions.setdefault(r.get("question_id"), len(questions))
+                rating = ratings.setdefault(r.get("rating"), len(ratings))
+                rows.append(json.dumps([ReviewLog.to_micros(r["timestamp"]), subject_id, int(bool(r["is_correct"])), question_id, rating,
+                                        ReviewLog.latency_to_ms(r.get("latency"))], separators=(",", ":")))
+                subject_totals = totals.setdefault(r["subject"], [0, 0])
+                subject_totals[0] += bool(r["is_correct"]); subject_totals[1] += 1
+            f.write(json.dumps({"month": month, "subjects": list(subjects), "questions": list(questions), "ratings": list(ratings)}, ensure_ascii=False) + "\n")
+            f.write("\n".join(rows) + "\n")
+        os.replace(tmp_path, self.segment_path(month))
+        self.rollups[month] = {"subjects": totals, "first": records[0]["timestamp"], "last": records[-1]["timestamp"]}
+        atomic_write_text(self.directory / self.ROLLUPS_NAME, json.dumps(self.rollups, indent=2, ensure_ascii=False))
+
+    def iter_month(self, month: str) -> Iterator[Dict[str, Any]]:
+        """Ripassi di un mese archiviato, letti in streaming dal segmento compresso."""
+        with gzip.open(self.segment_path(month), 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            subjects, questions, ratings = header["subjects"], header.get("questions", [None]), header.get("ratings", [None])
+            for line in f:
+                row = json.loads(line)
+                # I segmenti scritti prima di domanda, valutazione e latenza hanno solo le prime tre colonne
+                micros, subject_id, is_correct, question_id, rating, latency_ms = row + [0, 0, -1][len(row) - 3:]
+                yield {"timestamp": ReviewLog.from_micros(micros), "subject": subjects[subject_id], "is_correct": bool(is_correct),
+                       "question_id": questions[question_id], "rating": ratings[rating], "latency": None if latency_ms < 0 else latency_ms / 1000}
+
+    def iter_reviews(self, since: Optional[str] = None, subject: Optional[str] = None, months: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Ripassi archiviati in ordine cronologico; i segmenti che non possono contenere risultati non vengono aperti."""
+        for month in (self.months() if months is None else months):
+            rollup = self.rollups[month]
+            if since is not None and rollup["last"] < since: continue
+            if subject is not None and subject not in rollup["subjects"]: continue
+            for review in self.iter_month(month):
+                if (since is None or review["timestamp"] >= since) and (subject is None or review["subject"] == subject):
+                    yield review
+
+    def count(self, since: Optional[str] = None, subject: Optional[str] = None) -> List[int]:
+        """[corretti, totali] dei mesi archiviati: dai totali precalcolati, aprendo solo il mese a cavallo di `since`."""
+        correct, total = 0, 0
+        for month in self.months():
+            rollup = self.rollups[month]
+            if since is not None and rollup["last"] < since: continue
+            if since is None or rollup["first"] >= since:
+                for name, (month_correct, month_total) in rollup["subjects"].items():
+                    if subject is None or name == subject:
+                        correct += month_correct; total += month_total
+            else:
+                for review in self.iter_reviews(since, subject, [month]):
+                    correct += review["is_correct"]; total += 1
+        return [correct, total]
+
+    def count_by_subject(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for month in self.months():
+            for name, (_, month_total) in self.rollups[month]["subjects"].items():
+                counts[name] = counts.get(name, 0) + month_total
+        return counts
+
+    def recent(self, subject: str, limit: int) -> List[Dict[str, Any]]:
+        """Gli ultimi `limit` ripassi archiviati della materia, aprendo i segmenti dal più recente."""
+        recent: List[Dict[str, Any]] = []
+        for month in reversed(self.months()):
+            if len(recent) >= limit: break
+            if subject not in self.rollups[month]["subjects"]: continue
+            recent = [r for r in self.iter_month(month) if r["subject"] == subject] + recent
+        return recent[max(0, len(recent) - limit):]
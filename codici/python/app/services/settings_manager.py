@@ -1,16 +1,19 @@
-import json
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable
 
 from app.services.config_manager import ConfigManager
+from app.services.storage import Storage
+from app.services.similarity_cache import SimilarityCache
 
 class SettingsManager:
     """Gestisce caricamento/salvataggio dei percorsi e metadati per materia e impostazioni globali."""
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         self.data_path = self.config_manager.get_data_path()
-        self.filepath = self.data_path / "quiz_settings.json"
+        self.storage = Storage.for_config(self.config_manager)
         self.settings = self._load()
+        # Chiamati con il nome della materia prima di eliminarne i file (es. DeckRegistry rilascia il gestore)
+        self.removal_listeners: List[Callable[[str], None]] = []
 
     def _get_default_settings(self) -> Dict:
         """Restituisce la struttura delle impostazioni di default."""
@@ -18,34 +21,33 @@ class SettingsManager:
             "global_settings": {
                 "retention_period_days": 7,
                 "srs_intervals": {"again": 10, "hard": 120, "good": 1440, "easy": 4320},
-                "new_cards_per_day": 20
+                "new_cards_per_day": 20,
+                "image_cache_mb": 128,
+                "warmup_on_launch": True
             },
-            "ELETTROTECNICA": {"txt_path": "", "img_path": "", "exam_date": "17/10/2025", "status": "In Corso", "interval_modifier": 1.0},
-            "FONDAMENTI DI INFORMATICA": {"txt_path": "", "img_path": "", "exam_date": "22/10/2025", "status": "In Corso", "interval_modifier": 1.0}
+            "ELETTROTECNICA": {"txt_path": "", "img_path": "", "exam_date": "17/10/2025", "status": "In Corso", "interval_modifier": 1.0, "similarity_mode": "Esatta"},
+            "FONDAMENTI DI INFORMATICA": {"txt_path": "", "img_path": "", "exam_date": "22/10/2025", "status": "In Corso", "interval_modifier": 1.0, "similarity_mode": "Esatta"}
         }
 
     def _load(self) -> Dict:
         """Carica le impostazioni dal percorso dati corrente."""
-        try:
-            # Assicura che la cartella esista prima di tentare di leggere
-            self.data_path.mkdir(parents=True, exist_ok=True)
-            settings = json.loads(self.filepath.read_text(encoding='utf-8'))
-            if "global_settings" not in settings:
-                settings["global_settings"] = self._get_default_settings()["global_settings"]
-            for subj, data in settings.items():
-                if subj != "global_settings":
-                    data.setdefault("interval_modifier", 1.0)
-            return settings
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Se il file non esiste nel percorso dati, ne crea uno nuovo
+        settings = self.storage.load_settings()
+        if settings is None:
+            # Se le impostazioni non esistono nel percorso dati, ne crea di nuove
             default_settings = self._get_default_settings()
-            self.filepath.write_text(json.dumps(default_settings, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.storage.save_settings(default_settings)
             return default_settings
+        if "global_settings" not in settings:
+            settings["global_settings"] = self._get_default_settings()["global_settings"]
+        for subj, data in settings.items():
+            if subj != "global_settings":
+                data.setdefault("interval_modifier", 1.0)
+                data.setdefault("similarity_mode", "Esatta")
+        return settings
 
     def save(self):
         """Salva le impostazioni nel percorso dati corrente."""
-        self.data_path.mkdir(parents=True, exist_ok=True)
-        self.filepath.write_text(json.dumps(self.settings, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.storage.save_settings(self.settings)
 
     def get_global_settings(self) -> Dict[str, Any]:
         return self.settings.get("global_settings", self._get_default_settings()["global_settings"])
@@ -80,29 +82,34 @@ class SettingsManager:
 
     def add_subject(self, subject: str):
         if subject and subject.strip() and subject not in self.settings:
-            self.settings[subject] = {"txt_path": "", "img_path": "", "exam_date": "", "status": "In Corso", "interval_modifier": 1.0}
+            self.settings[subject] = {"txt_path": "", "img_path": "", "exam_date": "", "status": "In Corso", "interval_modifier": 1.0, "similarity_mode": "Esatta"}
             self.save()
 
     def remove_subject(self, subject: str):
         if subject in self.settings and subject != "global_settings":
             subject_data = self.settings[subject]
+            for listener in self.removal_listeners:
+                listener(subject)
             del self.settings[subject]
 
-            # Gestione file associati con il nuovo percorso dati
-            srs_file = self.data_path / f"{subject.replace(' ', '_').lower()}_srs_deck.json"
-            if srs_file.exists():
-                srs_file.unlink()
+            # Deck di studio della materia nel percorso dati corrente
+            self.storage.delete_deck(subject)
+            self.save()
 
-            # Il file di cache è relativo al file .txt, quindi questo non cambia
+            # I file di cache (similarità per ogni modalità di analisi e paniere analizzato) sono relativi al file .txt, quindi questo non cambia.
+            # Le viste mappate vanno chiuse prima (su Windows un file mappato non si elimina); un file che resta non blocca la rimozione
             txt_path_str = subject_data.get("txt_path")
             if txt_path_str:
-                cache_file = Path(txt_path_str).with_suffix('.txt.cache.json')
-                if cache_file.exists():
-                    cache_file.unlink()
-            self.save()
+                for suffix in ('.txt.cache.bin', '.txt.lsh.cache.bin', '.txt.cache.json', '.txt.lsh.cache.json', '.txt.deck.bin'):
+                    cache_file = Path(self.get_absolute_path(txt_path_str)).with_suffix(suffix)
+                    SimilarityCache.release(cache_file)
+                    try:
+                        cache_file.unlink(missing_ok=True)
+                    except OSError as e:
+                        print(f"Impossibile eliminare la cache {cache_file}: {e}")
 
     def reload_settings(self):
         """Ricarica le impostazioni dal percorso dati corrente. Utile dopo aver cambiato cartella."""
         self.data_path = self.config_manager.get_data_path()
-        self.filepath = self.data_path / "quiz_settings.json"
+        self.storage = Storage.for_config(self.config_manager)
         self.settings = self._load()
\ No newline at end of file
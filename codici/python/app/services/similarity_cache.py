@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import math
+import mmap
+import array
+import struct
+import hashlib
+import weakref
+import collections
+from pathlib import Path
+from typing import List, Dict, Set, Optional, Any, Iterator, Mapping
+
+from app.models.question_model import Question
+from app.services.deck_cache import DeckCache
+from app.services.similarity_engine import SparseTfidfMatrix
+from app.services.text_processing import SimilarityAnalyser
+
+class SimilarityCacheView(Mapping):
+    """
+    Vista in sola lettura, mappata in memoria, di un file di cache binario.
+    Il file contiene una tabella di stringhe (id delle domande, vocabolario) e due matrici CSR indicizzate
+    per riga: i vettori TF-IDF e l'adiacenza dei vicini. Gli insiemi di vicini vengono creati solo per
+    gli id effettivamente richiesti, ad esempio da SRSManager.get_due_questions.
+    """
+    MAGIC = b"SIMC"
+    PREAMBLE = struct.Struct("<4sII")  # magic, versione, lunghezza dell'intestazione JSON
+    SECTION_TYPES = {"hashes": "B", "idf": "d", "vec_indptr": "I", "vec_indices": "I", "vec_data": "d", "adj_indptr": "I", "adj_indices": "I"}
+
+    def __init__(self, path: Path, version: int):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        self._sets: Dict[int, Set[str]] = {}
+        try:
+            magic, file_version, header_len = self.PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != self.MAGIC or file_version != version:
+                raise ValueError("formato della cache non riconosciuto")
+            self.header = json.loads(self._mmap[self.PREAMBLE.size:self.PREAMBLE.size + header_len].decode('utf-8'))
+            if self.header["byteorder"] != sys.byteorder:
+                raise ValueError("cache scritta con un ordine dei byte diverso")
+            self.ids = self._strings("ids", self.header["num_rows"])
+            self._row_of = {question_id: i for i, question_id in enumerate(self.ids)}
+            self._adj_indptr = self._section("adj_indptr")
+            self._adj_indices = self._section("adj_indices")
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def mode(self) -> str:
+        return self.header["mode"]
+
+    def _section(self, name: str) -> memoryview:
+        offset, length = self.header["sections"][name]
+        base = memoryview(self._mmap)[offset:offset + length]
+        view = base.cast(self.SECTION_TYPES[name])
+        self._views.extend((base, view))
+        return view
+
+    def _strings(self, name: str, count: int) -> List[str]:
+        offset, length = self.header["sections"][name]
+        return self._mmap[offset:offset + length].decode('utf-8').split("\x00") if count else []
+
+    def row_hashes(self) -> List[str]:
+        raw = self._section("hashes")
+        return [raw[i:i + 8].hex() for i in range(0, len(raw), 8)]
+
+    def neighbours(self, i: int) -> Set[str]:
+        neighbours = self._sets.get(i)
+        if neighbours is None:
+            neighbours = self._sets[i] = {self.ids[j] for j in self._adj_indices[self._adj_indptr[i]:self._adj_indptr[i + 1]]}
+        return neighbours
+
+    # --- Interfaccia Mapping: solo le domande con almeno un vicino, come la similarity_map calcolata ---
+    def __getitem__(self, question_id: str) -> Set[str]:
+        i = self._row_of[question_id]
+        if self._adj_indptr[i] == self._adj_indptr[i + 1]:
+            raise KeyError(question_id)
+        return self.neighbours(i)
+
+    def __iter__(self) -> Iterator[str]:
+        return (question_id for i, question_id in enumerate(self.ids) if self._adj_indptr[i] != self._adj_indptr[i + 1])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Materializza l'intero contenuto nella forma usata per aggiornare e riscrivere la cache."""
+        row_hashes = self.row_hashes()
+        vec_indptr, vec_indices, vec_data = self._section("vec_indptr"), self._section("vec_indices"), self._section("vec_data")
+        rows = {}
+        for i, content_hash in enumerate(row_hashes):
+            start, end = vec_indptr[i], vec_indptr[i + 1]
+            neighbours = self._adj_indices[self._adj_indptr[i]:self._adj_indptr[i + 1]]
+            rows[content_hash] = {"id": self.ids[i], "terms": vec_indices[start:end].tolist(), "weights": vec_data[start:end].tolist(),
+                                  "neighbours": [row_hashes[j] for j in neighbours]}
+        return {"version": self.header["version"], "mode": self.mode, "pending_changes": self.header["pending_changes"],
+                "vocabulary": self._strings("vocabulary", self.header["num_terms"]), "idf": self._section("idf").tolist(), "questions": rows}
+
+    def close(self):
+        """Rilascia il file: i vicini vengono prima copiati in memoria, così la vista resta utilizzabile."""
+        if self._mmap.closed: return
+        if hasattr(self, "_adj_indptr"):
+            for i in range(len(self.ids)):
+                self.neighbours(i)
+            self._adj_indptr = self._adj_indptr.tolist()
+            self._adj_indices = self._adj_indices.tolist()
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    @classmethod
+    def write(cls, path: Path, cached: Dict[str, Any]):
+        """Scrive la cache in formato binario, in modo atomico (file temporaneo e rinomina)."""
+        rows = cached["questions"]
+        row_hashes = list(rows)
+        row_index = {content_hash: i for i, content_hash in enumerate(row_hashes)}
+        vec_indptr, vec_indices, vec_data = array.array("I", [0]), array.array("I"), array.array("d")
+        adj_indptr, adj_indices = array.array("I", [0]), array.array("I")
+        for content_hash in row_hashes:
+            row = rows[content_hash]
+            vec_indices.extend(row["terms"]); vec_data.extend(row["weights"]); vec_indptr.append(len(vec_indices))
+            adj_indices.extend(row_index[n] for n in row["neighbours"]); adj_indptr.append(len(adj_indices))
+
+        sections = {
+            "ids": "\x00".join(row["id"] for row in rows.values()).encode('utf-8'),
+            "hashes": b"".join(bytes.fromhex(content_hash) for content_hash in row_hashes),
+            "vocabulary": "\x00".join(cached["vocabulary"]).encode('utf-8'),
+            "idf": array.array("d", cached["idf"]).tobytes(),
+            "vec_indptr": vec_indptr.tobytes(), "vec_indices": vec_indices.tobytes(), "vec_data": vec_data.tobytes(),
+            "adj_indptr": adj_indptr.tobytes(), "adj_indices": adj_indices.tobytes(),
+        }
+        header = {"version": cached["version"], "mode": cached["mode"], "pending_changes": cached["pending_changes"], "byteorder": sys.byteorder,
+                  "num_rows": len(row_hashes), "num_terms": len(cached["vocabulary"]), "sections": {}}
+        # Gli offset dipendono dalla lunghezza dell'intestazione, che a sua volta li contiene: si riserva spazio fisso
+        header_len = 1024
+        offset = cls.PREAMBLE.size + header_len
+        for name, blob in sections.items():
+            offset += -offset % 8  # Allineamento per le viste tipizzate
+            header["sections"][name] = [offset, len(blob)]
+            offset += len(blob)
+        header_bytes = json.dumps(header).encode('utf-8')
+        if len(header_bytes) > header_len:
+            raise OSError("intestazione della cache troppo lunga")
+        header_bytes = header_bytes.ljust(header_len)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.PREAMBLE.pack(cls.MAGIC, cached["version"], header_len))
+            f.write(header_bytes)
+            for name, blob in sections.items():
+                f.write(b"\x00" * (header["sections"][name][0] - f.tell()))
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+class SimilarityCache:
+    """
+    Cache persistente della similarity_map di un paniere, indicizzata per hash del contenuto di ogni domanda.
+    Insieme alle righe TF-IDF e ai vicini di ogni domanda salva le statistiche IDF dell'ultima ricostruzione:
+    alla riapertura vengono vettorizzate e confrontate solo le domande aggiunte o modificate, mentre
+    quelle rimosse vengono tolte dalle liste dei vicini. Le altre righe restano come sono.
+    Il file è binario (SimilarityCacheView); le cache JSON delle versioni precedenti vengono migrate.
+    """
+    VERSION = 3
+    JSON_VERSION = 2
+    # Oltre questa quota di domande cambiate dall'ultima ricostruzione, l'IDF congelato è troppo vecchio
+    REBUILD_RATIO = 0.1
+    # Viste aperte per percorso: vanno chiuse prima di riscrivere il file (su Windows un file mappato non si sostituisce)
+    _open_views: "weakref.WeakValueDictionary[str, SimilarityCacheView]" = weakref.WeakValueDictionary()
+
+    def __init__(self, path: Path, legacy_json_path: Optional[Path] = None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+
+    @staticmethod
+    def content_hash(question: Question) -> str:
+        content = "\n".join([question.id, question.text, *question.options])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+    def _open_view(self) -> Optional[SimilarityCacheView]:
+        try:
+            view = SimilarityCacheView(self.path, self.VERSION)
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+        self._open_views[str(self.path)] = view
+        return view
+
+    def _load_json(self) -> Optional[Dict[str, Any]]:
+        """Cache nel vecchio formato JSON, letta una sola volta per la migrazione."""
+        if not self.legacy_json_path: return None
+        try:
+            cached = json.loads(self.legacy_json_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Le cache del primo formato (id -> vicini) non hanno vettori né IDF: vanno ricostruite
+        if not isinstance(cached, dict) or cached.get("version") != self.JSON_VERSION:
+            return None
+        cached["version"] = self.VERSION
+        return cached
+
+    @classmethod
+    def release(cls, path: Path):
+        """Chiude la vista aperta sul file, se c'è (i vicini restano in memoria): va fatto prima di sostituirlo o eliminarlo."""
+        open_view = cls._open_views.get(str(path))
+        if open_view is not None:
+            open_view.close()
+
+    def _save(self, cached: Dict[str, Any]) -> bool:
+        self.release(self.path)
+        try:
+            SimilarityCacheView.write(self.path, cached)
+        except OSError as e:
+            print(f"Impossibile salvare la cache di similarità {self.path}: {e}")
+            return False
+        if self.legacy_json_path and self.legacy_json_path.exists():
+            try: self.legacy_json_path.unlink()
+            except OSError: pass
+        return True
+
+    def refresh(self, analyser: SimilarityAnalyser) -> Mapping[str, Set[str]]:
+        """Restituisce la similarity_map delle domande dell'analizzatore, aggiornando la cache solo dove serve."""
+        # Gli hash bastano per riconoscere una cache aggiornata: i token vengono estratti solo se c'è da ricalcolare
+        hashes = {doc_id: self.content_hash(question) for doc_id, question in analyser.question_map.items()}
+
+        view = self._open_view()
+        if view is not None:
+            if view.mode == analyser.mode and set(view.row_hashes()) == set(hashes.values()):
+                return view  # Nessuna modifica: si legge direttamente dal file mappato
+            cached = view.to_dict()
+            view.close()
+        else:
+            cached = self._load_json()
+
+        docs = analyser.documents()
+        if cached is None or cached.get("mode") != analyser.mode:
+            cached = self._rebuild(analyser, docs, hashes)
+        else:
+            rows = cached["questions"]
+            current_hashes = set(hashes.values())
+            added = [doc_id for doc_id, content_hash in hashes.items() if content_hash not in rows]
+            removed = [content_hash for content_hash in rows if content_hash not in current_hashes]
+            cached["pending_changes"] += len(added) + len(removed)
+            if cached["pending_changes"] > self.REBUILD_RATIO * max(len(docs), 1):
+                cached = self._rebuild(analyser, docs, hashes)
+            else:
+                self._patch(cached, {doc_id: docs[doc_id] for doc_id in added}, hashes, removed, len(docs), analyser.SIMILARITY_THRESHOLD)
+
+        if self._save(cached):
+            view = self._open_view()
+            if view is not None:
+                return view
+        rows = cached["questions"]
+        return {doc_id: {rows[n]["id"] for n in rows[content_hash]["neighbours"]}
+                for doc_id, content_hash in hashes.items() if rows[content_hash]["neighbours"]}
+
+    @classmethod
+    def refresh_deck(cls, txt_path: Path, mode: str):
+        """
+        Aggiorna su disco la cache di un paniere partendo solo dal percorso: pensata per il pool di processi di
+        JobExecutor, dopo il quale refresh() nel processo dell'applicazione trova la cache già aggiornata.
+        """
+        analyser = SimilarityAnalyser(DeckCache(txt_path).load_questions(), mode)
+        view = cls(SimilarityAnalyser.cache_path_for(txt_path, analyser.mode), SimilarityAnalyser.legacy_cache_path_for(txt_path, analyser.mode)).refresh(analyser)
+        if isinstance(view, SimilarityCacheView):
+            view.close()
+
+    def _rebuild(self, analyser: SimilarityAnalyser, docs: Dict[str, List[str]], hashes: Dict[str, str]) -> Dict[str, Any]:
+        """Ricostruzione completa: matrice TF-IDF, coppie simili e nuove statistiche IDF."""
+        matrix = SparseTfidfMatrix.from_documents(docs)
+        neighbours = collections.defaultdict(list)
+        for i, j in analyser.similar_pairs(matrix):
+            neighbours[i].append(hashes[matrix.doc_ids[j]])
+            neighbours[j].append(hashes[matrix.doc_ids[i]])
+
+        vocabulary = sorted(matrix.vocabulary, key=matrix.vocabulary.get)
+        rows = {}
+        for i, doc_id in enumerate(matrix.doc_ids):
+            terms, weights = matrix.row(i)
+            rows[hashes[doc_id]] = {"id": doc_id, "terms": list(terms), "weights": list(weights), "neighbours": neighbours[i]}
+        return {"version": self.VERSION, "mode": analyser.mode, "pending_changes": 0, "vocabulary": vocabulary, "idf": matrix.idf, "questions": rows}
+
+    def _patch(self, cached: Dict[str, Any], added_docs: Dict[str, List[str]], hashes: Dict[str, str], removed: List[str], num_docs: int, threshold: float):
+        """Applica alla cache le domande aggiunte e rimosse, senza toccare le altre righe."""
+        rows = cached["questions"]
+        for content_hash in removed:
+            for neighbour in rows[content_hash]["neighbours"]:
+                if neighbour in rows:
+                    rows[neighbour]["neighbours"].remove(content_hash)
+            del rows[content_hash]
+
+        # I termini già noti usano l'IDF salvato; quelli nuovi compaiono solo nelle domande aggiunte
+        vocabulary = {word: term_id for term_id, word in enumerate(cached["vocabulary"])}
+        idf = cached["idf"]
+        new_term_freq = collections.Counter(word for words in added_docs.values() for word in set(words) if word not in vocabulary)
+        for word, df in new_term_freq.items():
+            vocabulary[word] = len(cached["vocabulary"])
+            cached["vocabulary"].append(word)
+            idf.append(math.log(num_docs / (1 + df)))
+
+        for doc_id, words in added_docs.items():
+            terms, weights = SparseTfidfMatrix.weighted_row(collections.Counter(words), len(words), vocabulary, idf)
+            row_vector = dict(zip(terms, weights))
+            content_hash = hashes[doc_id]
+            neighbours = []
+            for other_hash, other in rows.items():
+                if row_vector and sum(row_vector.get(term_id, 0.0) * weight for term_id, weight in zip(other["terms"], other["weights"])) > threshold:
+                    neighbours.append(other_hash)
+                    other["neighbours"].append(content_hash)
+            rows[content_hash] = {"id": doc_id, "terms": terms, "weights": weights, "neighbours": neighbours}
@@ -0,0 +1,210 @@
+import math
+import array
+import bisect
+import hashlib
+import functools
+import collections
+from typing import List, Dict, Set, Tuple, Iterable, Iterator, Sequence, Optional
+
+class SparseTfidfMatrix:
+    """
+    Matrice documento-termine sparsa in formato CSR, con righe TF-IDF normalizzate L2.
+    Con le righe normalizzate la similarità coseno tra due documenti è il semplice prodotto scalare.
+    """
+    BLOCK_SIZE = 512  # Righe elaborate per ogni blocco del prodotto matrice-trasposta
+
+    def __init__(self, doc_ids: List[str], indptr: List[int], indices: List[int], data: List[float], vocabulary: Dict[str, int], idf: List[float]):
+        self.doc_ids = doc_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    @classmethod
+    def from_documents(cls, docs: Dict[str, List[str]]) -> 'SparseTfidfMatrix':
+        """Costruisce la matrice da {id_documento: lista di token}, con la stessa pesatura TF-IDF dell'analisi originale."""
+        doc_ids = list(docs.keys())
+        num_docs = len(doc_ids)
+        vocabulary: Dict[str, int] = {}
+        doc_freq: List[int] = []
+        counted_docs = []
+        for words in docs.values():
+            term_counts = collections.Counter(words)
+            for word in term_counts:
+                term_id = vocabulary.get(word)
+                if term_id is None:
+                    term_id = vocabulary[word] = len(doc_freq)
+                    doc_freq.append(0)
+                doc_freq[term_id] += 1
+            counted_docs.append((term_counts, len(words)))
+
+        idf = [math.log(num_docs / (1 + df)) for df in doc_freq]
+
+        indptr, indices, data = [0], [], []
+        for term_counts, total_terms in counted_docs:
+            terms, weights = cls.weighted_row(term_counts, total_terms, vocabulary, idf)
+            indices.extend(terms)
+            data.extend(weights)
+            indptr.append(len(indices))
+        return cls(doc_ids, indptr, indices, data, vocabulary, idf)
+
+    @staticmethod
+    def weighted_row(term_counts: Dict[str, int], total_terms: int, vocabulary: Dict[str, int], idf: List[float]) -> Tuple[List[int], List[float]]:
+        """Riga TF-IDF normalizzata L2 di un documento, come coppia (id dei termini crescenti, pesi)."""
+        row = []
+        if total_terms:
+            for word, count in term_counts.items():
+                term_id = vocabulary[word]
+                weight = (count / total_terms) * idf[term_id]
+                if weight != 0.0:
+                    row.append((term_id, weight))
+        norm = math.sqrt(sum(weight * weight for _, weight in row))
+        if norm == 0:
+            return [], []
+        row.sort()
+        return [term_id for term_id, _ in row], [weight / norm for _, weight in row]
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.doc_ids)
+
+    def row(self, i: int) -> Tuple[Sequence[int], Sequence[float]]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def _column_postings(self, rows: Sequence[int]) -> Dict[int, Tuple[List[int], List[float]]]:
+        """Trasposta (CSC) delle righe indicate (crescenti): per ogni termine, righe e pesi in ordine crescente di riga."""
+        postings: Dict[int, Tuple[List[int], List[float]]] = {}
+        for i in rows:
+            for term_id, weight in zip(*self.row(i)):
+                row_ids, values = postings.setdefault(term_id, ([], []))
+                row_ids.append(i)
+                values.append(weight)
+        return postings
+
+    def similar_pairs(self, threshold: float, rows: Optional[Sequence[int]] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Restituisce le coppie (i, j), con i < j, la cui similarità coseno supera la soglia (solo tra `rows`, se indicate).
+        Il prodotto X·Xᵀ è calcolato a blocchi di righe sulla sola parte triangolare superiore,
+        accumulando i contributi dalle liste di postings: il costo dipende dai termini condivisi, non da N².
+        """
+        rows = range(self.num_rows) if rows is None else sorted(rows)
+        postings = self._column_postings(rows)
+        for block_start in range(0, len(rows), self.BLOCK_SIZE):
+            for i in rows[block_start:block_start + self.BLOCK_SIZE]:
+                scores: Dict[int, float] = {}
+                for term_id, weight in zip(*self.row(i)):
+                    row_ids, values = postings[term_id]
+                    first = bisect.bisect_right(row_ids, i)
+                    for j, value in zip(row_ids[first:], values[first:]):
+                        scores[j] = scores.get(j, 0.0) + weight * value
+                for j in sorted(j for j, score in scores.items() if score > threshold):
+                    yield i, j
+
+    def weight_counts(self, i: int, levels: int) -> Dict[int, int]:
+        """
+        Riga i come multinsieme di termini: ogni termine compare round(peso² · levels) volte (i pesi al quadrato
+        sommano a 1). La Jaccard pesata di due righe segue la similarità coseno molto meglio di quella sugli insiemi
+        di termini, dominata dai termini comuni; i termini con peso trascurabile spariscono.
+        """
+        counts = {}
+        for term_id, weight in zip(*self.row(i)):
+            count = round(weight * weight * levels)
+            if count:
+                counts[term_id] = count
+        return counts
+
+    def pair_similarities(self, pairs: Iterable[Tuple[int, int]], threshold: float) -> Iterator[Tuple[int, int]]:
+        """Verifica esatta di coppie candidate (i, j): restituisce, ordinate, quelle con similarità sopra soglia."""
+        by_row: Dict[int, List[int]] = collections.defaultdict(list)
+        for i, j in pairs:
+            by_row[i].append(j)
+        for i in sorted(by_row):
+            terms, weights = self.row(i)
+            if not terms: continue
+            row_vector = dict(zip(terms, weights))
+            for j in sorted(by_row[i]):
+                other_terms, other_weights = self.row(j)
+                if sum(row_vector.get(term_id, 0.0) * weight for term_id, weight in zip(other_terms, other_weights)) > threshold:
+                    yield i, j
+
+class MinHashLSH:
+    """
+    Firme MinHash su multinsiemi di token (token con molteplicità, vedi SparseTfidfMatrix.weight_counts),
+    raggruppate in bande LSH. La probabilità che due firme coincidano su una riga è la Jaccard pesata s
+    (somma dei minimi delle molteplicità sulla somma dei massimi). Due documenti diventano candidati solo
+    se coincidono su tutte le r righe di almeno una delle b bande: la probabilità 1 - (1 - s^r)^b è una curva
+    a S che sale intorno a (1/b)^(1/r), quindi le coppie lontane dalla soglia finiscono insieme di rado.
+    """
+    # Con la soglia coseno 0.35 le coppie simili hanno Jaccard pesata da circa 0.1 in su (quasi tutte oltre 0.15),
+    # quelle che condividono solo termini comuni quasi sempre sotto 0.03: con 100 bande da 2 righe la probabilità
+    # di diventare candidate è 90% a 0.15, 98% a 0.2 e 9% a 0.03 (recall misurata: benchmarks.lsh_recall_benchmark)
+    NUM_BANDS = 100
+    ROWS_PER_BAND = 2
+    MAX_BUCKET_SIZE = 200  # Oltre, le coppie del bucket sarebbero troppe: i suoi membri vanno confrontati in modo esatto
+
+    def __init__(self, num_bands: int = NUM_BANDS, rows_per_band: int = ROWS_PER_BAND, seed: int = 1):
+        self.num_bands = num_bands
+        self.rows_per_band = rows_per_band
+        self._num_hashes = num_bands * rows_per_band
+        self._seed = seed
+        # I valori di hash di un token (32 bit) sono impacchettati in un unico intero, uno per corsia da 64 bit
+        # (little-endian): il minimo su tutte le funzioni di hash diventa qualche operazione su interi grandi
+        # (vedi _lane_min). Il bit 32 di ogni corsia fa da guardia
+        self._guard = int.from_bytes(bytes([0, 0, 0, 0, 1, 0, 0, 0]) * self._num_hashes, 'little')
+        self._token_minimums: Dict[object, List[int]] = {}
+
+    def _lane_min(self, a: int, b: int) -> int:
+        """Minimo corsia per corsia: in (a | guardia) - b il bit di guardia di una corsia resta acceso solo se a >= b."""
+        take_b = ((((a | self._guard) - b) & self._guard) >> 32) * 0xFFFFFFFF
+        return a ^ ((a ^ b) & take_b)
+
+    def _hashes(self, token, count: int) -> int:
+        """Per ogni funzione di hash, il minimo sulle prime `count` copie del token (calcolato una volta per token)."""
+        minimums = self._token_minimums.setdefault(token, [])
+        while len(minimums) < count:
+            # Tutti i valori di una copia escono da un'unica chiamata a SHAKE-128, allargati a 64 bit senza cicli Python
+            digest = hashlib.shake_128(f"{self._seed}#{token}#{len(minimums)}".encode('utf-8')).digest(4 * self._num_hashes)
+            lanes = bytearray(8 * self._num_hashes)
+            for byte in range(4):
+                lanes[byte::8] = digest[byte::4]
+            hashes = int.from_bytes(lanes, 'little')
+            minimums.append(self._lane_min(minimums[-1], hashes) if minimums else hashes)
+        return minimums[count - 1]
+
+    def signature(self, token_counts: Dict[object, int]) -> bytes:
+        """Firma MinHash impacchettata (8 byte per funzione di hash): per ognuna, il minimo su tutte le copie dei token."""
+        packed = functools.reduce(self._lane_min, (self._hashes(token, count) for token, count in token_counts.items()))
+        return packed.to_bytes(8 * self._num_hashes, 'little')
+
+    def candidate_pairs(self, token_counts: Sequence[Dict[object, int]]) -> Tuple[Set[Tuple[int, int]], Set[Tuple[int, ...]]]:
+        """
+        Coppie (i, j), con i < j, che collidono in almeno una banda LSH, e bucket con più di MAX_BUCKET_SIZE
+        membri: questi non vengono espansi in coppie ma vanno confrontati in modo esatto (SparseTfidfMatrix.similar_pairs
+        sulle sole righe del bucket, che costa in proporzione ai termini condivisi e non al numero di coppie).
+        """
+        # Chiavi delle bande di ogni documento; i documenti senza termini non finiscono in nessun bucket
+        band_size = 8 * self.rows_per_band
+        documents, band_keys = [], []
+        for i, counts in enumerate(token_counts):
+            if counts:
+                signature = self.signature(counts)
+                documents.append(i)
+                band_keys.append([signature[start:start + band_size] for start in range(0, len(signature), band_size)])
+        candidates: Set[Tuple[int, int]] = set()
+        oversized: Set[Tuple[int, ...]] = set()  # Lo stesso gruppo di quasi duplicati collide in molte bande
+        for keys in zip(*band_keys):
+            # Quasi tutti i bucket hanno un solo membro: Counter li scarta senza passare dal codice Python
+            shared = {key for key, size in collections.Counter(keys).items() if size > 1}
+            if not shared: continue
+            buckets: Dict[bytes, List[int]] = collections.defaultdict(list)
+            for i, key in zip(documents, keys):
+                if key in shared:
+                    buckets[key].append(i)
+            for members in buckets.values():
+                if len(members) > self.MAX_BUCKET_SIZE:
+                    oversized.add(tuple(members))
+                else:
+                    candidates.update((members[a], members[b]) for a in range(len(members)) for b in range(a + 1, len(members)))
+        return candidates, oversized
@@ -1,14 +1,15 @@
-import json
+import bisect
 import datetime
 import collections
-from pathlib import Path
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, Mapping
 
 from app.models.question_model import Question
 from app.models.srs_model import SRSItem
 from app.services.app_data_manager import AppDataManager
 from app.services.settings_manager import SettingsManager
 from app.services.config_manager import ConfigManager
+from app.services.storage import Storage
+from app.services.job_executor import JobExecutor
 
 class SRSManager:
     """Gestisce la logica del deck di studio SRS, con calibrazione dinamica e analisi di interferenza."""
@@ -18,62 +19,146 @@ class SRSManager:
     def __init__(self, subject: str, exam_date: Optional[datetime.date], interval_modifier: float, app_data_manager: AppDataManager, settings_manager: SettingsManager, config_manager: ConfigManager):
         self.subject = subject
         self.data_path = config_manager.get_data_path()
-        self.filepath = self.data_path / f"{self.subject.replace(' ', '_').lower()}_srs_deck.json"
+        # Ogni valutazione salva solo la carta modificata (journal append-only o riga del database)
+        self.storage = Storage.for_config(config_manager)
+        self._compacting = False
         self.deck: Dict[str, SRSItem] = self._load()
+        # Firma del deck su disco dopo l'ultima lettura o scrittura di questo gestore (vedi DeckRegistry)
+        self.signature = self.storage.deck_signature(self.subject)
+        # Indici delle carte: giorno di ripasso -> id (solo carte non leech) e insieme ordinato delle leech.
+        # Le query costano in proporzione al risultato, non alla dimensione del deck.
+        self._due_buckets: Dict[int, Dict[str, None]] = {}
+        self._due_days: List[int] = []
+        self._leeches: Dict[str, None] = {}
+        for item_id, item in self.deck.items():
+            self._index_item(item_id, item)
         self.exam_date = exam_date
         self.interval_modifier = interval_modifier
-        self.similarity_map: Dict[str, Set[str]] = collections.defaultdict(set)
+        self.similarity_map: Mapping[str, Set[str]] = collections.defaultdict(set)
         self.app_data_manager = app_data_manager
         self.settings_manager = settings_manager
 
     def _load(self) -> Dict[str, SRSItem]:
-        if not self.filepath.exists(): return {}
+        """Carica il deck: le domande restano dizionari finché non vengono richieste (vedi SRSItem.question)."""
         try:
-            data = json.loads(self.filepath.read_text(encoding='utf-8'))
-            return {item_id: SRSItem.from_dict(item_data) for item_id, item_data in data.items()}
-        except (json.JSONDecodeError, TypeError): return {}
+            return {item_id: SRSItem.from_dict(item_data) for item_id, item_data in self.storage.load_deck(self.subject).items()}
+        except TypeError: return {}
+
+    def _save_item(self, item_id: str, item: SRSItem):
+        """Salva solo la carta modificata; quando lo storage lo suggerisce il deck viene compattato in background."""
+        with self.storage.lock:
+            start_compaction = self.storage.save_card(self.subject, item_id, item.to_dict()) and not self._compacting
+            self.signature = self.storage.deck_signature(self.subject)
+            if start_compaction:
+                self._compacting = True
+        if start_compaction:
+            JobExecutor.instance().submit(lambda job: self.save(), name="deck compaction", background=True)
+
+    def _index_item(self, item_id: str, item: SRSItem):
+        # Gli indici vengono letti anche dai thread di lavoro (DeckRegistry): si modificano sotto il lock dello storage
+        with self.storage.lock:
+            if item.lapses >= self.LEECH_THRESHOLD:
+                self._leeches[item_id] = None
+                return
+            bucket = self._due_buckets.get(item.due_day)
+            if bucket is None:
+                bucket = self._due_buckets[item.due_day] = {}
+                bisect.insort(self._due_days, item.due_day)
+            bucket[item_id] = None
+
+    def _unindex_item(self, item_id: str, item: SRSItem):
+        with self.storage.lock:
+            if item_id in self._leeches:
+                del self._leeches[item_id]
+                return
+            bucket = self._due_buckets.get(item.due_day)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._due_buckets[item.due_day]
+                    del self._due_days[bisect.bisect_left(self._due_days, item.due_day)]
+
+    def _due_ids(self, until_day: int) -> List[str]:
+        """Id delle carte non leech con ripasso entro until_day, in ordine di data (copiati sotto il lock dello storage)."""
+        with self.storage.lock:
+            return [item_id for day in self._due_days[:bisect.bisect_right(self._due_days, until_day)] for item_id in self._due_buckets[day]]
 
     def save(self):
-        data_to_save = {item_id: item.to_dict() for item_id, item in self.deck.items()}
-        self.filepath.write_text(json.dumps(data_to_save, indent=2, ensure_ascii=False), encoding='utf-8')
+        """
+        Compatta il deck se lo storage ha modifiche in sospeso (con JSON: riscrive la fotografia e svuota il journal).
+        Le carte vengono copiate sotto il lock dello storage e scritte dopo averlo rilasciato: le valutazioni
+        registrate durante la scrittura non la attendono e finiscono nel journal successivo.
+        """
+        try:
+            if self.storage.has_pending_changes(self.subject):
+                self.storage.save_deck(self.subject, lambda: {item_id: item.to_dict() for item_id, item in self.deck.items()})
+                self.signature = self.storage.deck_signature(self.subject)
+        except OSError as e:
+            print(f"Impossibile compattare il deck di {self.subject}: {e}")
+        finally:
+            self._compacting = False
+
+    def schedule_save(self):
+        """Compattazione affidata al thread di scrittura (a fine sessione: chiudere la finestra non attende il disco)."""
+        self.storage.writer.schedule(("compaction", self.subject), self.save)
+
+    def get_due_count(self) -> int:
+        """Numero di carte da ripassare oggi, letto dall'indice per giorno."""
+        today = datetime.date.today().toordinal()
+        with self.storage.lock:
+            return sum(len(self._due_buckets[day]) for day in self._due_days[:bisect.bisect_right(self._due_days, today)])
+
+    def get_leech_count(self) -> int:
+        with self.storage.lock:
+            return len(self._leeches)
 
     def get_due_questions(self) -> List[Question]:
-        today = datetime.date.today()
-        due_items = [item for item in self.deck.values() if item.next_review_date <= today and item.lapses < self.LEECH_THRESHOLD]
+        today = datetime.date.today().toordinal()
         final_due_questions = []
         processed_ids = set()
-        for item in sorted(due_items, key=lambda x: x.next_review_date):
-            if item.question.id not in processed_ids:
-                final_due_questions.append(item.question)
-                processed_ids.add(item.question.id)
-                related_ids = self.similarity_map.get(item.question.id, set())
+        for item_id in self._due_ids(today):
+            if item_id not in processed_ids:
+                final_due_questions.append(self.deck[item_id].question)
+                processed_ids.add(item_id)
+                related_ids = self.similarity_map.get(item_id, set())
                 for related_id in related_ids:
-                    if related_id in self.deck and related_id not in processed_ids and self.deck[related_id].next_review_date <= today + datetime.timedelta(days=2):
+                    if related_id in self.deck and related_id not in processed_ids and self.deck[related_id].due_day <= today + 2:
                         final_due_questions.append(self.deck[related_id].question)
                         processed_ids.add(related_id)
         return final_due_questions
 
     def get_leech_questions(self) -> List[Question]:
-         return [item.question for item in self.deck.values() if item.lapses >= self.LEECH_THRESHOLD]
+        with self.storage.lock:
+            leech_ids = list(self._leeches)
+        return [self.deck[item_id].question for item_id in leech_ids]
+
+    def question_ids(self) -> List[str]:
+        """Id delle carte del deck, copiati sotto il lock dello storage: il deck cresce nel thread di Tk mentre i lavori lo leggono."""
+        with self.storage.lock:
+            return list(self.deck)
 
     def add_or_update_from_exam(self, question: Question) -> bool:
         item = self.deck.get(question.id)
         if item:
+            self._unindex_item(question.id, item)
             item.srs_level = 0; item.lapses += 1
             item.next_review_date = datetime.date.today() + datetime.timedelta(days=1)
         else:
             item = SRSItem(question)
-            self.deck[question.id] = item
-        self.save()
+            with self.storage.lock:
+                self.deck[question.id] = item
+        self._index_item(question.id, item)
+        self._save_item(question.id, item)
         return item.lapses >= self.LEECH_THRESHOLD
 
     def update_after_review(self, question: Question, rating: str, time_taken: float) -> bool:
         if question.id not in self.deck: return False
 
         is_correct = rating != "non_la_sapevo"
-        self.app_data_manager.log_review(self.subject, is_correct)
+        self.app_data_manager.log_review(self.subject, is_correct, Question.compact_id(question.id), rating, time_taken)
 
         item = self.deck[question.id]
+        self._unindex_item(question.id, item)
 
         # Carica gli intervalli SRS dalle impostazioni globali
         global_settings = self.settings_manager.get_global_settings()
@@ -112,5 +197,6 @@ class SRSManager:
         final_interval_days = min(final_interval_days, self.MAX_INTERVAL)
 
         item.next_review_date = datetime.date.today() + datetime.timedelta(days=final_interval_days)
-        self.save()
+        self._index_item(question.id, item)
+        self._save_item(question.id, item)
         return item.lapses >= self.LEECH_THRESHOLD
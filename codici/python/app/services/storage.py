@@ -0,0 +1,783 @@
+import abc
+import copy
+import json
+import shutil
+import weakref
+import sqlite3
+import datetime
+import threading
+from pathlib import Path
+from functools import partial
+from typing import List, Dict, Optional, Any, Tuple, Callable, Iterator
+
+from app.models.review_log import ReviewLog
+from app.services.review_archive import ReviewArchive
+from app.services.write_behind import WriteBehindWriter, atomic_write_text
+
+class Storage(abc.ABC):
+    """
+    Interfaccia comune dei backend di persistenza usati da SettingsManager, AppDataManager e SRSManager.
+    Il backend è scelto per profilo (vedi ConfigManager.get_storage_backend): JsonStorage mantiene i file
+    JSON di sempre, SqliteStorage usa un unico database con tabelle indicizzate.
+    Le scritture passano da un WriteBehindWriter: i metodi save_* aggiornano lo stato in memoria e
+    accodano la scrittura, che avviene in background accorpando le modifiche ravvicinate.
+    """
+    NAME = ""
+    INDEXED_QUERIES = False  # True se conteggi e liste di leech non richiedono di leggere l'intero deck
+    # Un'istanza per cartella dati e backend, condivisa dai gestori (e dal loro lock)
+    _instances: Dict[Tuple[str, str], 'Storage'] = {}
+
+    def __init__(self, data_path: Path):
+        self.data_path = Path(data_path)
+        # Serializza le scritture fatte da thread diversi (ad esempio la compattazione in background).
+        # Non chiamare writer.flush() tenendo `lock`: le scritture differite lo acquisiscono a loro volta.
+        self.lock = threading.RLock()
+        self.writer = WriteBehindWriter(f"{self.NAME} {self.data_path}")
+        self._revisions: Dict[str, int] = {}  # Scritture di questo processo per materia (vedi deck_signature)
+
+    @classmethod
+    def for_config(cls, config_manager) -> 'Storage':
+        return cls.open(config_manager.get_data_path(), config_manager.get_storage_backend())
+
+    @classmethod
+    def open(cls, data_path: Path, backend: str) -> 'Storage':
+        key = (str(data_path), backend)
+        storage = cls._instances.get(key)
+        if storage is None:
+            # Il nuovo backend (o la nuova cartella) potrebbe leggere file con scritture ancora in coda
+            WriteBehindWriter.flush_all()
+            storage_class = SqliteStorage if backend == SqliteStorage.NAME else JsonStorage
+            storage = cls._instances[key] = storage_class(data_path)
+        return storage
+
+    @classmethod
+    def switch_backend(cls, config_manager, profile_name: str, backend: str):
+        """Cambia il backend di un profilo copiando nel nuovo tutti i dati del backend in uso."""
+        profile = config_manager.config["profiles"][profile_name]
+        current = profile.get("storage", JsonStorage.NAME)
+        if backend != current:
+            data_path = Path(profile["data_path"])
+            cls.open(data_path, backend).import_from(cls.open(data_path, current))
+        config_manager.set_profile_storage(profile_name, backend)
+
+    @abc.abstractmethod
+    def import_from(self, source: 'Storage'):
+        """Sostituisce impostazioni, dati dell'applicazione, ripassi e deck con quelli di `source`."""
+
+    @staticmethod
+    def _deck_subjects(settings: Optional[Dict[str, Any]]) -> List[str]:
+        return [subject for subject in settings or {} if subject != "global_settings"]
+
+    def flush(self):
+        """Scrive subito tutte le modifiche ancora in coda."""
+        self.writer.flush()
+
+    def _bump_revision(self, subject: str):
+        self._revisions[subject] = self._revisions.get(subject, 0) + 1
+
+    @staticmethod
+    def deck_file_name(subject: str) -> str:
+        return f"{subject.replace(' ', '_').lower()}_srs_deck.json"
+
+    # --- Impostazioni ---
+    @abc.abstractmethod
+    def load_settings(self) -> Optional[Dict[str, Any]]:
+        """Impostazioni salvate, o None se non esistono ancora."""
+
+    @abc.abstractmethod
+    def save_settings(self, settings: Dict[str, Any]):
+        """Aggiorna le impostazioni; la scrittura su disco può essere differita."""
+
+    # --- Dati dell'applicazione e log dei ripassi ---
+    @abc.abstractmethod
+    def load_app_data(self) -> Optional[Dict[str, Any]]:
+        """Statistiche utente e andamento della ritenzione, o None se non esistono ancora."""
+
+    @abc.abstractmethod
+    def save_app_data(self, data: Dict[str, Any]):
+        """Aggiorna statistiche e andamento della ritenzione (il log dei ripassi passa da add_review)."""
+
+    @abc.abstractmethod
+    def add_review(self, review: Dict[str, Any]):
+        """Aggiunge un ripasso in coda al log."""
+
+    @abc.abstractmethod
+    def get_reviews(self, subject: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ripassi in ordine cronologico, eventualmente di una sola materia."""
+
+    @abc.abstractmethod
+    def iter_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Ripassi in ordine cronologico letti in streaming, per le analisi che attraversano tutto lo storico."""
+
+    @abc.abstractmethod
+    def get_reviews_since(self, since: str) -> List[Dict[str, Any]]:
+        """Ripassi dal timestamp ISO `since` in poi, in ordine cronologico."""
+
+    @abc.abstractmethod
+    def get_recent_reviews(self, subject: str, limit: int) -> List[Dict[str, Any]]:
+        """Gli ultimi `limit` ripassi di una materia, in ordine cronologico."""
+
+    @abc.abstractmethod
+    def count_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Tuple[int, int]:
+        """(ripassi corretti, ripassi totali) dal timestamp ISO `since` in poi."""
+
+    @abc.abstractmethod
+    def count_reviews_by_subject(self) -> Dict[str, int]:
+        """Numero di ripassi per materia."""
+
+    # --- Deck SRS ---
+    @abc.abstractmethod
+    def load_deck(self, subject: str) -> Dict[str, Dict[str, Any]]:
+        """Carte del deck nella forma di SRSItem.to_dict(), indicizzate per id."""
+
+    @abc.abstractmethod
+    def save_card(self, subject: str, item_id: str, item_data: Dict[str, Any]) -> bool:
+        """Salva lo stato di una carta; restituisce True se conviene compattare il deck (vedi save_deck)."""
+
+    def has_pending_changes(self, subject: str) -> bool:
+        return False
+
+    @abc.abstractmethod
+    def deck_signature(self, subject: str) -> Any:
+        """Valore che cambia a ogni modifica del deck, sia di questo processo sia esterna (altro processo, sincronizzazione)."""
+
+    @abc.abstractmethod
+    def save_deck(self, subject: str, snapshot: Callable[[], Dict[str, Dict[str, Any]]]):
+        """
+        Riscrive l'intero deck. snapshot() restituisce lo stato delle carte e viene chiamata tenendo `lock`;
+        la scrittura avviene dopo averlo rilasciato, quindi save_deck non va chiamato tenendo `lock`.
+        """
+
+    @abc.abstractmethod
+    def delete_deck(self, subject: str):
+        """Elimina tutte le carte della materia."""
+
+    def get_card_ids(self, subject: str) -> List[str]:
+        return list(self.load_deck(subject))
+
+    def count_due_cards(self, subject: str, today: datetime.date, leech_threshold: int) -> int:
+        today_str = today.isoformat()
+        return sum(1 for item in self.load_deck(subject).values() if item["next_review_date"] <= today_str and item.get("lapses", 0) < leech_threshold)
+
+    def count_leech_cards(self, subject: str, leech_threshold: int) -> int:
+        return len(self.get_leech_cards(subject, leech_threshold))
+
+    def get_leech_cards(self, subject: str, leech_threshold: int) -> List[Dict[str, Any]]:
+        return [item for item in self.load_deck(subject).values() if item.get("lapses", 0) >= leech_threshold]
+
+class JsonStorage(Storage):
+    """
+    Backend predefinito: quiz_settings.json, app_data.json e un file *_srs_deck.json per materia.
+    In app_data.json resta solo il log dei ripassi del mese in corso, tenuto in memoria come ReviewLog a
+    colonne (le finestre di ritenzione sono ricerche binarie); all'avvio i mesi chiusi vengono spostati nei
+    segmenti compressi di ReviewArchive, di cui si caricano solo i totali precalcolati.
+    Le valutazioni delle carte vanno in un journal append-only, riapplicato al caricamento e
+    svuotato quando il deck viene compattato. I file vengono riscritti in modo atomico (file temporaneo e
+    rinomina) dal thread di scrittura, a partire da una copia dello stato fatta al momento della richiesta.
+    """
+    NAME = "json"
+    JOURNAL_COMPACT_THRESHOLD = 200  # Record nel journal oltre i quali conviene riscrivere il deck
+
+    def __init__(self, data_path: Path):
+        super().__init__(data_path)
+        self.settings_path = self.data_path / "quiz_settings.json"
+        self.app_data_path = self.data_path / "app_data.json"
+        self.review_log = ReviewLog()
+        self.archive = ReviewArchive(self.data_path / "review_log")
+        self._journal_records: Dict[str, int] = {}
+        self._pending_journal: Dict[str, List[str]] = {}  # Record accodati e non ancora scritti nel journal
+        # Per materia: firma dei file dopo l'ultima lettura o scrittura di questo processo, e contatore dei
+        # cambiamenti esterni (vedi deck_signature)
+        self._known_files: Dict[str, Tuple] = {}
+        self._external_changes: Dict[str, int] = {}
+        # Append al journal e riscritture del deck avvengono fuori da `lock` e vengono serializzati da qui.
+        # Ogni riscrittura incrementa la generazione della materia: le righe prese dalla coda prima della
+        # riscrittura sono già nella fotografia e non vanno più aggiunte al journal
+        self._file_lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self._writing: Dict[str, int] = {}  # Append e riscritture in corso per materia (vedi deck_signature)
+
+    def _read_json(self, path: Path) -> Optional[Any]:
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_json(self, path: Path, data: Any):
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+    def load_settings(self) -> Optional[Dict[str, Any]]:
+        self.writer.flush("settings")
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        return self._read_json(self.settings_path)
+
+    def save_settings(self, settings: Dict[str, Any]):
+        # Le impostazioni sono piccole: la copia profonda costa molto meno della scrittura che evita
+        self.writer.schedule("settings", partial(self._write_json, self.settings_path, copy.deepcopy(settings)))
+
+    def load_app_data(self) -> Optional[Dict[str, Any]]:
+        self.writer.flush("app_data")
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        data = self._read_json(self.app_data_path)
+        if data is not None:
+            self.review_log = ReviewLog.from_records(self._archive_closed_months(data))
+        return data
+
+    def _archive_closed_months(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Sposta nell'archivio i ripassi dei mesi precedenti a quello corrente e restituisce quelli del mese in corso."""
+        current_month = datetime.date.today().strftime("%Y-%m")
+        hot, closed = [], {}
+        for review in data.pop("review_log", []):
+            month = ReviewArchive.month_of(review["timestamp"])
+            if month < current_month:
+                closed.setdefault(month, []).append(review)
+            else:
+                hot.append(review)
+        if closed:
+            # Prima i segmenti, poi app_data.json: un'interruzione a metà lascia al massimo ripassi già archiviati,
+            # che archive_month riconosce e salta al tentativo successivo
+            for month in sorted(closed):
+                self.archive.archive_month(month, sorted(closed[month], key=lambda r: r["timestamp"]))
+            self._write_app_data_file(data, lambda: hot)
+        return hot
+
+    def _write_app_data_file(self, data: Dict[str, Any], review_records: Callable[[], List[Dict[str, Any]]]):
+        # Scritto in forma compatta: è un file di dati, riscritto dopo ogni ripasso
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        # I campi assenti dei ripassi più vecchi (domanda, valutazione, latenza) non vengono scritti
+        review_log = [{key: value for key, value in review.items() if value is not None} for review in review_records()]
+        atomic_write_text(self.app_data_path, json.dumps({**data, "review_log": review_log}, ensure_ascii=False, separators=(",", ":")))
+
+    def save_app_data(self, data: Dict[str, Any]):
+        # Il log cresce solo in coda: non serve copiarlo, i record JSON vengono creati dal thread di scrittura
+        snapshot = {key: copy.deepcopy(value) for key, value in data.items() if key != "review_log"}
+        self.writer.schedule("app_data", partial(self._write_app_data_file, snapshot, self.review_log.frozen_records()))
+
+    def add_review(self, review: Dict[str, Any]):
+        self.review_log.append(review)
+
+    def iter_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        yield from self.archive.iter_reviews(since, subject)
+        hot = self.review_log.records(subject) if since is None else self.review_log.records_since(since)
+        yield from (r for r in hot if subject is None or r["subject"] == subject)
+
+    def get_reviews(self, subject: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(self.iter_reviews(subject=subject))
+
+    def get_reviews_since(self, since: str) -> List[Dict[str, Any]]:
+        return list(self.iter_reviews(since))
+
+    def get_recent_reviews(self, subject: str, limit: int) -> List[Dict[str, Any]]:
+        recent = self.review_log.recent(subject, limit)
+        if len(recent) < limit:
+            recent = self.archive.recent(subject, limit - len(recent)) + recent
+        return recent
+
+    def count_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Tuple[int, int]:
+        archived_correct, archived_total = self.archive.count(since, subject)
+        correct, total = self.review_log.count(since, subject)
+        return archived_correct + correct, archived_total + total
+
+    def count_reviews_by_subject(self) -> Dict[str, int]:
+        counts = self.archive.count_by_subject()
+        for subject, count in self.review_log.count_by_subject().items():
+            counts[subject] = counts.get(subject, 0) + count
+        return counts
+
+    def _deck_paths(self, subject: str) -> Tuple[Path, Path]:
+        deck_path = self.data_path / self.deck_file_name(subject)
+        return deck_path, deck_path.with_suffix('.journal')
+
+    def _file_signature(self, subject: str) -> Tuple:
+        signature = []
+        for path in self._deck_paths(subject):
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load_deck(self, subject: str) -> Dict[str, Dict[str, Any]]:
+        self.writer.flush(("journal", subject))
+        deck_path, journal_path = self._deck_paths(subject)
+        # Deck e journal letti insieme: una compattazione a metà darebbe il deck nuovo con il journal vecchio
+        with self._file_lock:
+            signature = self._file_signature(subject)
+            deck = self._read_json(deck_path)
+            try:
+                lines = journal_path.read_text(encoding='utf-8').splitlines()
+            except OSError:
+                lines = []
+        with self.lock:
+            self._known_files[subject] = signature
+        if not isinstance(deck, dict):
+            deck = {}
+        records = 0
+        for line in lines:
+            # Ogni record contiene lo stato completo della carta: riapplicarlo più volte non cambia il risultato
+            try:
+                record = json.loads(line)
+                deck[record["id"]] = record["item"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue  # Riga troncata da un'interruzione durante la scrittura
+            records += 1
+        self._journal_records[subject] = records
+        return deck
+
+    def save_card(self, subject: str, item_id: str, item_data: Dict[str, Any]) -> bool:
+        record = self._journal_line(item_id, item_data)
+        with self.lock:
+            self._pending_journal.setdefault(subject, []).append(record)
+            self._bump_revision(subject)
+            self._journal_records[subject] = self._journal_records.get(subject, 0) + 1
+            compact = self._journal_records[subject] >= self.JOURNAL_COMPACT_THRESHOLD
+        # Le valutazioni ravvicinate finiscono nel journal con un'unica scrittura
+        self.writer.schedule(("journal", subject), partial(self._append_journal, subject))
+        return compact
+
+    @staticmethod
+    def _journal_line(item_id: str, item_data: Dict[str, Any]) -> str:
+        return json.dumps({"id": item_id, "item": item_data}, ensure_ascii=False) + "\n"
+
+    def _append_journal(self, subject: str):
+        # Sotto `lock` si prendono solo le righe in coda: save_card, chiamato dal thread di Tk, non attende il disco
+        _, journal_path = self._deck_paths(subject)
+        with self.lock:
+            lines = self._pending_journal.pop(subject, None)
+            if not lines: return
+            generation = self._generations.get(subject, 0)
+            self._writing[subject] = self._writing.get(subject, 0) + 1
+        signature = None
+        try:
+            with self._file_lock:
+                if generation != self._generations.get(subject, 0): return  # Righe già comprese nel deck riscritto
+                self.data_path.mkdir(parents=True, exist_ok=True)
+                with open(journal_path, 'a', encoding='utf-8') as f:
+                    f.write("".join(lines))
+                signature = self._file_signature(subject)
+        except OSError:
+            with self.lock:
+                if generation == self._generations.get(subject, 0):
+                    self._pending_journal[subject] = lines + self._pending_journal.get(subject, [])
+            raise
+        finally:
+            self._end_write(subject, generation, signature)
+
+    def _end_write(self, subject: str, generation: int, signature: Optional[Tuple]):
+        """Fine di un append o di una riscrittura: la firma nota vale se nel frattempo il deck non è stato riscritto."""
+        with self.lock:
+            self._writing[subject] -= 1
+            if not self._writing[subject]:
+                del self._writing[subject]
+            if signature is not None and generation == self._generations.get(subject, 0):
+                self._known_files[subject] = signature
+
+    def has_pending_changes(self, subject: str) -> bool:
+        return self._journal_records.get(subject, 0) > 0
+
+    def deck_signature(self, subject: str) -> Any:
+        # Le scritture (anche differite) di questo processo aggiornano la firma nota dei file: ogni altra
+        # differenza viene da fuori e conta come cambiamento esterno (tranne durante una scrittura, che la aggiorna alla fine)
+        with self.lock:
+            files = self._file_signature(subject)
+            if files != self._known_files.get(subject) and subject not in self._writing:
+                self._known_files[subject] = files
+                self._external_changes[subject] = self._external_changes.get(subject, 0) + 1
+            return self._external_changes.get(subject, 0), self._revisions.get(subject, 0)
+
+    def save_deck(self, subject: str, snapshot: Callable[[], Dict[str, Dict[str, Any]]]):
+        """Fotografia completa scritta in modo atomico, poi il journal viene svuotato."""
+        deck_path, journal_path = self._deck_paths(subject)
+        # Il lock dei file è preso prima della fotografia: gli append delle valutazioni successive attendono la
+        # riscrittura e finiscono nel journal nuovo
+        with self._file_lock:
+            with self.lock:
+                items = snapshot()
+                # La fotografia comprende già i record ancora in coda, anche quelli presi da un append non ancora
+                # scritto: non vanno più aggiunti al journal
+                self._pending_journal.pop(subject, None)
+                generation = self._generations[subject] = self._generations.get(subject, 0) + 1
+                self._writing[subject] = self._writing.get(subject, 0) + 1
+                self._journal_records[subject] = 0
+                self._bump_revision(subject)
+            signature = None
+            try:
+                self._write_json(deck_path, items)
+                if journal_path.exists():
+                    journal_path.unlink()
+                signature = self._file_signature(subject)
+            except OSError:
+                # Le righe scartate sono comprese nella fotografia: torna in coda per intero, davanti alle valutazioni
+                # successive, così il journal resta completo anche se il deck non è stato riscritto
+                with self.lock:
+                    lines = [self._journal_line(item_id, item_data) for item_id, item_data in items.items()]
+                    self._pending_journal[subject] = lines + self._pending_journal.get(subject, [])
+                    self._journal_records[subject] = self._journal_records.get(subject, 0) + len(lines)
+                self.writer.schedule(("journal", subject), partial(self._append_journal, subject))
+                raise
+            finally:
+                self._end_write(subject, generation, signature)
+
+    def delete_deck(self, subject: str):
+        with self._file_lock:
+            with self.lock:
+                self._pending_journal.pop(subject, None)
+                generation = self._generations[subject] = self._generations.get(subject, 0) + 1
+                self._writing[subject] = self._writing.get(subject, 0) + 1
+                self._journal_records.pop(subject, None)
+                self._bump_revision(subject)
+            signature = None
+            try:
+                for path in self._deck_paths(subject):
+                    if path.exists():
+                        path.unlink()
+                signature = self._file_signature(subject)
+            finally:
+                self._end_write(subject, generation, signature)
+
+    @classmethod
+    def files_signature(cls, data_path: Path) -> List[List[Any]]:
+        """Nome, dimensione e mtime di tutti i file di dati JSON della cartella: cambia a ogni loro scrittura."""
+        data_path = Path(data_path)
+        paths = [data_path / "quiz_settings.json", data_path / "app_data.json", data_path / "review_log" / ReviewArchive.ROLLUPS_NAME]
+        paths += sorted(data_path.glob("*_srs_deck.json")) + sorted(data_path.glob("*_srs_deck.journal"))
+        signature = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature.append([path.name, stat.st_size, stat.st_mtime_ns])
+        return signature
+
+    def import_from(self, source: Storage):
+        # Le scritture in coda di entrambi i backend devono arrivare su disco prima della copia
+        WriteBehindWriter.flush_all()
+        settings = source.load_settings()
+        app_data = source.load_app_data()
+        reviews = list(source.iter_reviews())
+        decks = {subject: source.load_deck(subject) for subject in self._deck_subjects(settings)}
+        for subject, deck in decks.items():
+            self.save_deck(subject, lambda deck=deck: deck)
+        with self.lock:
+            if settings is not None:
+                self._write_json(self.settings_path, settings)
+            else:
+                self.settings_path.unlink(missing_ok=True)
+            # Il log arriva per intero: l'archivio dei mesi chiusi viene ricostruito da zero da load_app_data
+            shutil.rmtree(self.archive.directory, ignore_errors=True)
+            self.archive = ReviewArchive(self.archive.directory)
+            if app_data is not None or reviews:
+                self._write_app_data_file(app_data or {}, lambda: reviews)
+            else:
+                self.app_data_path.unlink(missing_ok=True)
+                self.review_log = ReviewLog()
+        # Archivia i mesi chiusi e ricarica in memoria il log del mese in corso
+        self.load_app_data()
+
+class SqliteStorage(Storage):
+    """
+    Backend SQLite: un unico file studio.sqlite3 nella cartella dati, con tabelle indicizzate per le carte
+    (materia e giorno di ripasso), i ripassi (timestamp e materia) e le impostazioni.
+    Conteggi della dashboard, finestre di ritenzione e liste di leech diventano query sugli indici.
+    All'apertura reimporta i file JSON della cartella se sono cambiati dall'ultima importazione (profilo usato nel
+    frattempo con il backend JSON); i file restano nella cartella come copia di sicurezza.
+    Valutazioni, ripassi e impostazioni vengono accodati e il thread di scrittura li esegue, accorpati in un
+    unico commit, su una connessione propria: chi li accoda non attende mai il disco. Le letture scrivono
+    prima quanto è ancora in coda, così vedono sempre le modifiche già fatte.
+    """
+    NAME = "sqlite"
+    INDEXED_QUERIES = True
+    DB_NAME = "studio.sqlite3"
+    INSERT_REVIEW = "INSERT INTO reviews (timestamp, subject, is_correct, question_id, rating, latency) VALUES (?, ?, ?, ?, ?, ?)"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS app_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS reviews (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, subject TEXT NOT NULL, is_correct INTEGER NOT NULL,
+                                            question_id TEXT, rating TEXT, latency REAL);
+        CREATE INDEX IF NOT EXISTS reviews_by_timestamp ON reviews (timestamp);
+        CREATE INDEX IF NOT EXISTS reviews_by_subject ON reviews (subject, timestamp);
+        CREATE TABLE IF NOT EXISTS cards (
+            subject TEXT NOT NULL, item_id TEXT NOT NULL, srs_level INTEGER NOT NULL, due_day INTEGER NOT NULL,
+            lapses INTEGER NOT NULL, history TEXT NOT NULL, question TEXT NOT NULL, PRIMARY KEY (subject, item_id));
+        CREATE INDEX IF NOT EXISTS cards_by_due ON cards (subject, due_day, lapses);
+        CREATE INDEX IF NOT EXISTS cards_by_lapses ON cards (subject, lapses);
+    """
+
+    def __init__(self, data_path: Path):
+        super().__init__(data_path)
+        self.data_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.data_path / self.DB_NAME
+        # La connessione delle letture è condivisa tra thread (accesso serializzato da `lock`); quella del thread
+        # di scrittura viene usata solo da _commit, senza `lock`. Con il journal WAL le letture non attendono i commit
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._write_conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._pending: List[Callable[[sqlite3.Connection], None]] = []  # Scritture accodate, eseguite da _commit
+        self._committing = False
+        # Alla chiusura di Python ci pensa WriteBehindWriter.flush_all (il commit in coda serve ancora le connessioni)
+        weakref.finalize(self, self._close_connections, self._conn, self._write_conn).atexit = False
+        with self.lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+            self._upgrade_schema()
+        self._known_version = self._data_version()
+        self._external_changes = 0
+        json_signature = JsonStorage.files_signature(self.data_path)
+        stored_signature = self._get_state("json_signature")
+        if stored_signature != json_signature:
+            # File JSON cambiati dall'ultima importazione (profilo usato con il backend JSON): i dati più recenti sono
+            # lì. Non lo sono invece se mancano (copia di sicurezza rimossa) o se il database viene da una versione
+            # precedente, che importava i file una sola volta
+            legacy = stored_signature is None and self._get_state("migrated_from_json") is not None
+            has_json_data = any((self.data_path / name).exists() for name in ("quiz_settings.json", "app_data.json"))
+            if has_json_data and not legacy:
+                self.import_from(Storage.open(self.data_path, JsonStorage.NAME))
+            else:
+                with self.lock, self._conn:
+                    self._set_state(self._conn, "json_signature", json_signature)
+
+    @staticmethod
+    def _close_connections(*connections: sqlite3.Connection):
+        for conn in connections:
+            conn.close()
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _commit(self):
+        # Sotto `lock` si prende solo la coda: esecuzione e commit avvengono dopo averlo rilasciato
+        with self.lock:
+            batch, self._pending = self._pending, []
+            if not batch: return
+            self._committing = True
+        try:
+            with self._write_conn:
+                for write in batch:
+                    write(self._write_conn)
+        except sqlite3.OperationalError as e:
+            # Database bloccato da un altro processo: le scritture tornano in testa alla coda e si riprova
+            with self.lock:
+                self._pending[:0] = batch
+            raise OSError(str(e)) from e
+        finally:
+            with self.lock:
+                self._committing = False
+                self._known_version = self._data_version()
+
+    def _queue(self, write: Callable[[sqlite3.Connection], None], subject: Optional[str] = None):
+        with self.lock:
+            self._pending.append(write)
+            if subject is not None:
+                self._bump_revision(subject)
+        self.writer.schedule("commit", self._commit)
+
+    def _sync(self):
+        """Scrive le modifiche ancora in coda prima di una lettura (mai tenendo `lock`, vedi Storage)."""
+        self.writer.flush("commit")
+
+    def _upgrade_schema(self):
+        """Aggiunge le colonne introdotte dopo la creazione del database (i ripassi già registrati restano NULL)."""
+        review_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(reviews)")}
+        for column, column_type in (("question_id", "TEXT"), ("rating", "TEXT"), ("latency", "REAL")):
+            if column not in review_columns:
+                self._conn.execute(f"ALTER TABLE reviews ADD COLUMN {column} {column_type}")
+
+    @staticmethod
+    def _review_row(review: Dict[str, Any]) -> Tuple:
+        return (review["timestamp"], review["subject"], int(bool(review["is_correct"])), review.get("question_id"), review.get("rating"), review.get("latency"))
+
+    def _get_state(self, key: str) -> Optional[Any]:
+        self._sync()
+        with self.lock:
+            row = self._conn.execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: Any):
+        conn.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+
+    def import_from(self, source: Storage):
+        WriteBehindWriter.flush_all()
+        settings = source.load_settings()
+        app_data = source.load_app_data()
+        subjects = self._deck_subjects(settings)
+        with self.lock, self._conn:
+            for table in ("settings", "cards", "reviews"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("DELETE FROM app_state WHERE key IN ('user_stats', 'retention_trend')")
+            if settings is not None:
+                self._write_settings(self._conn, settings)
+            for subject in subjects:
+                for item_id, item_data in source.load_deck(subject).items():
+                    self._write_card(self._conn, subject, item_id, item_data)
+                self._bump_revision(subject)
+            if app_data is not None:
+                self._write_app_data(self._conn, app_data)
+            self._conn.executemany(self.INSERT_REVIEW, map(self._review_row, source.iter_reviews()))
+            # Firma presa dopo la lettura: caricare i dati JSON può archiviare i mesi chiusi e riscrivere app_data.json
+            self._set_state(self._conn, "json_signature", JsonStorage.files_signature(self.data_path))
+
+    # --- Impostazioni ---
+    def load_settings(self) -> Optional[Dict[str, Any]]:
+        self._sync()
+        with self.lock:
+            rows = self._conn.execute("SELECT key, value FROM settings ORDER BY rowid").fetchall()
+        return {key: json.loads(value) for key, value in rows} if rows else None
+
+    @staticmethod
+    def _write_settings(conn: sqlite3.Connection, settings: Dict[str, Any]):
+        conn.execute("DELETE FROM settings")
+        conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)", [(key, json.dumps(value, ensure_ascii=False)) for key, value in settings.items()])
+
+    def save_settings(self, settings: Dict[str, Any]):
+        self._queue(partial(self._write_settings, settings=copy.deepcopy(settings)))
+
+    # --- Dati dell'applicazione e log dei ripassi ---
+    def load_app_data(self) -> Optional[Dict[str, Any]]:
+        user_stats = self._get_state("user_stats")
+        if user_stats is None: return None
+        return {"user_stats": user_stats, "retention_trend": self._get_state("retention_trend") or []}
+
+    @classmethod
+    def _write_app_data(cls, conn: sqlite3.Connection, data: Dict[str, Any]):
+        # Il log dei ripassi è nella tabella reviews: qui solo le statistiche riassuntive
+        cls._set_state(conn, "user_stats", data.get("user_stats", {}))
+        cls._set_state(conn, "retention_trend", data.get("retention_trend", []))
+
+    def save_app_data(self, data: Dict[str, Any]):
+        snapshot = {key: copy.deepcopy(data.get(key, default)) for key, default in (("user_stats", {}), ("retention_trend", []))}
+        self._queue(partial(self._write_app_data, data=snapshot))
+
+    def add_review(self, review: Dict[str, Any]):
+        row = self._review_row(review)
+        self._queue(lambda conn: conn.execute(self.INSERT_REVIEW, row))
+
+    @staticmethod
+    def _review_from_row(timestamp: str, subject: str, is_correct: int, question_id: Optional[str], rating: Optional[str], latency: Optional[float]) -> Dict[str, Any]:
+        return {"timestamp": timestamp, "subject": subject, "is_correct": bool(is_correct), "question_id": question_id, "rating": rating, "latency": latency}
+
+    def _reviews(self, query: str, params: Tuple) -> List[Dict[str, Any]]:
+        self._sync()
+        with self.lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._review_from_row(*row) for row in rows]
+
+    def get_reviews(self, subject: Optional[str] = None) -> List[Dict[str, Any]]:
+        if subject is None:
+            return self._reviews("SELECT timestamp, subject, is_correct, question_id, rating, latency FROM reviews ORDER BY id", ())
+        return self._reviews("SELECT timestamp, subject, is_correct, question_id, rating, latency FROM reviews WHERE subject = ? ORDER BY id", (subject,))
+
+    def iter_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        # A blocchi, per non tenere il lock (né l'intero risultato in memoria) durante l'analisi
+        conditions, params = ["id > ?"], [0]
+        if subject is not None:
+            conditions.append("subject = ?"); params.append(subject)
+        if since is not None:
+            conditions.append("timestamp >= ?"); params.append(since)
+        query = f"SELECT id, timestamp, subject, is_correct, question_id, rating, latency FROM reviews WHERE {' AND '.join(conditions)} ORDER BY id LIMIT 5000"
+        self._sync()
+        while True:
+            with self.lock:
+                rows = self._conn.execute(query, params).fetchall()
+            if not rows: return
+            for row in rows:
+                yield self._review_from_row(*row[1:])
+            params[0] = rows[-1][0]
+
+    def get_reviews_since(self, since: str) -> List[Dict[str, Any]]:
+        return self._reviews("SELECT timestamp, subject, is_correct, question_id, rating, latency FROM reviews WHERE timestamp >= ? ORDER BY id", (since,))
+
+    def get_recent_reviews(self, subject: str, limit: int) -> List[Dict[str, Any]]:
+        recent = self._reviews("SELECT timestamp, subject, is_correct, question_id, rating, latency FROM reviews WHERE subject = ? ORDER BY id DESC LIMIT ?", (subject, limit))
+        return recent[::-1]
+
+    def count_reviews(self, since: Optional[str] = None, subject: Optional[str] = None) -> Tuple[int, int]:
+        conditions, params = [], []
+        if subject is not None:
+            conditions.append("subject = ?"); params.append(subject)
+        if since is not None:
+            conditions.append("timestamp >= ?"); params.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        self._sync()
+        with self.lock:
+            correct, total = self._conn.execute(f"SELECT SUM(is_correct), COUNT(*) FROM reviews{where}", params).fetchone()
+        return correct or 0, total
+
+    def count_reviews_by_subject(self) -> Dict[str, int]:
+        self._sync()
+        with self.lock:
+            return dict(self._conn.execute("SELECT subject, COUNT(*) FROM reviews GROUP BY subject ORDER BY MIN(id)").fetchall())
+
+    # --- Deck SRS ---
+    @staticmethod
+    def _card_from_row(srs_level: int, due_day: int, lapses: int, history: str, question: str) -> Dict[str, Any]:
+        return {"question": json.loads(question), "srs_level": srs_level, "next_review_date": datetime.date.fromordinal(due_day).isoformat(),
+                "lapses": lapses, "history": json.loads(history)}
+
+    def load_deck(self, subject: str) -> Dict[str, Dict[str, Any]]:
+        self._sync()
+        with self.lock:
+            rows = self._conn.execute("SELECT item_id, srs_level, due_day, lapses, history, question FROM cards WHERE subject = ? ORDER BY rowid", (subject,)).fetchall()
+        return {item_id: self._card_from_row(*row) for item_id, *row in rows}
+
+    @staticmethod
+    def _write_card(conn: sqlite3.Connection, subject: str, item_id: str, item_data: Dict[str, Any]):
+        due_day = datetime.date.fromisoformat(item_data["next_review_date"]).toordinal()
+        # Upsert invece di INSERT OR REPLACE: la riga mantiene il suo rowid, quindi l'ordine del deck non cambia
+        conn.execute("INSERT INTO cards (subject, item_id, srs_level, due_day, lapses, history, question) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                           "ON CONFLICT (subject, item_id) DO UPDATE SET srs_level = excluded.srs_level, due_day = excluded.due_day, "
+                           "lapses = excluded.lapses, history = excluded.history, question = excluded.question",
+                           (subject, item_id, item_data["srs_level"], due_day, item_data.get("lapses", 0),
+                            json.dumps(item_data.get("history", {}), ensure_ascii=False), json.dumps(item_data["question"], ensure_ascii=False)))
+
+    def save_card(self, subject: str, item_id: str, item_data: Dict[str, Any]) -> bool:
+        self._queue(partial(self._write_card, subject=subject, item_id=item_id, item_data=item_data), subject)
+        return False  # Ogni carta è già scritta nella sua riga: non c'è niente da compattare
+
+    @classmethod
+    def _replace_deck(cls, conn: sqlite3.Connection, subject: str, items: Dict[str, Dict[str, Any]]):
+        conn.execute("DELETE FROM cards WHERE subject = ?", (subject,))
+        for item_id, item_data in items.items():
+            cls._write_card(conn, subject, item_id, item_data)
+
+    def save_deck(self, subject: str, snapshot: Callable[[], Dict[str, Dict[str, Any]]]):
+        with self.lock:
+            items = snapshot()
+        self._queue(partial(self._replace_deck, subject=subject, items=items), subject)
+
+    def delete_deck(self, subject: str):
+        self._queue(partial(self._replace_deck, subject=subject, items={}), subject)
+
+    def deck_signature(self, subject: str) -> Any:
+        # data_version cambia per i commit delle altre connessioni, compresa quella di scrittura: i commit di
+        # questo processo aggiornano la versione nota (e le sue scritture sono contate a parte, per materia),
+        # ogni altra differenza viene da fuori e conta come cambiamento esterno
+        with self.lock:
+            version = self._data_version()
+            if version != self._known_version and not self._committing:
+                self._known_version = version
+                self._external_changes += 1
+            return self._external_changes, self._revisions.get(subject, 0)
+
+    def count_due_cards(self, subject: str, today: datetime.date, leech_threshold: int) -> int:
+        self._sync()
+        with self.lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cards WHERE subject = ? AND due_day <= ? AND lapses < ?", (subject, today.toordinal(), leech_threshold)).fetchone()[0]
+
+    def get_card_ids(self, subject: str) -> List[str]:
+        self._sync()
+        with self.lock:
+            return [row[0] for row in self._conn.execute("SELECT item_id FROM cards WHERE subject = ? ORDER BY rowid", (subject,))]
+
+    def count_leech_cards(self, subject: str, leech_threshold: int) -> int:
+        self._sync()
+        with self.lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cards WHERE subject = ? AND lapses >= ?", (subject, leech_threshold)).fetchone()[0]
+
+    def get_leech_cards(self, subject: str, leech_threshold: int) -> List[Dict[str, Any]]:
+        self._sync()
+        with self.lock:
+            rows = self._conn.execute("SELECT srs_level, due_day, lapses, history, question FROM cards WHERE subject = ? AND lapses >= ? ORDER BY rowid", (subject, leech_threshold)).fetchall()
+        return [self._card_from_row(*row) for row in rows]
@@ -1,76 +1,110 @@
 import re
-import math
 import collections
 from pathlib import Path
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple, Iterator, Optional
 
 from app.models.question_model import Question
+from app.services.similarity_engine import SparseTfidfMatrix, MinHashLSH
 
 class TextFileParser:
     BOOKMARK = "---SEGNALIBRO_STUDIO---"
+    # Classificatori precompilati delle righe di opzione: le righe "spazzatura" (intestazioni e piè di pagina
+    # dei PDF) vengono riconosciute ovunque compaia la parola chiave, gli altri tipi dal prefisso.
+    JUNK_PATTERN = re.compile(r'INGEGNERIA INFORMATICA|eCampus|Data Stampa|©')
+    OPTION_PREFIX = re.compile(r'(?P<image>\[image:)|(?P<correct>\*|\[x\])|(?P<wrong>\[ \])')
+
     def __init__(self, file_path: Path): self.file_path = file_path
+
     def parse(self) -> List[Question]:
-        questions: List[Question] = []
-        question_counter = 1
         try:
-            content = self.file_path.read_text(encoding='utf-8')
+            return list(self.iter_questions())
         except Exception:
             return []
 
-        if self.BOOKMARK in content:
-            content, _ = content.split(self.BOOKMARK, 1)
-
-        # Split content into question blocks
-        blocks = re.split(r'^\s*#\s*', content, flags=re.MULTILINE)
-        for block in filter(None, (b.strip() for b in blocks)):
-            lines = [line.strip() for line in block.split('\n') if line.strip()]
-            if not lines:
-                continue
-
-            q_text_full = lines.pop(0)
-            # Use a sequential counter for the question ID to avoid duplicates
-            q_number = str(question_counter)
-
+    def iter_questions(self) -> Iterator[Question]:
+        """
+        Legge il paniere riga per riga e restituisce le domande man mano che vengono completate,
+        senza caricare l'intero file: chi ha bisogno solo del conteggio o delle prime N domande
+        non costruisce mai la lista completa. Il risultato è identico a quello di parse().
+        """
+        try:
+            file = open(self.file_path, encoding='utf-8')
+        except OSError:
+            return
+        with file:
+            question_counter = 1
+            q_text_full: Optional[str] = None
             options, correct_answer, image_path = [], None, None
-
-            # Keywords to identify and filter out junk lines
-            JUNK_KEYWORDS = ["INGEGNERIA INFORMATICA", "eCampus", "Data Stampa", "©"]
-
-            for line in lines:
-                # Check if the line is junk and should be ignored
-                if any(keyword in line for keyword in JUNK_KEYWORDS):
-                    continue
-
-                # Process valid lines
-                if line.startswith('[image:'):
-                    image_path = Path(line.replace('[image:', '').replace(']', '').strip())
-                elif line.startswith('*'):
-                    option_text = line[1:].strip()
-                    options.append(option_text)
-                    correct_answer = option_text
-                elif line.startswith('[x]'): # Support for another format
-                    option_text = line[3:].strip()
-                    options.append(option_text)
-                    correct_answer = option_text
-                elif line.startswith('[ ]'): # Support for another format
-                    option_text = line[3:].strip()
-                    options.append(option_text)
-                else:
-                    # Assume any other non-junk line is a regular option
-                    options.append(line)
-
-            if options:
-                questions.append(Question(q_number, q_text_full, options, correct_answer, image_path))
-                question_counter += 1
-        return questions
+            after_bare_marker = False  # Riga "#" senza testo: la domanda inizia alla prossima riga non vuota
+
+            for raw_line in file:
+                bookmark_index = raw_line.find(self.BOOKMARK)
+                if bookmark_index != -1:
+                    raw_line = raw_line[:bookmark_index]
+                line = raw_line.strip()
+                if line:
+                    # Una riga che inizia con "#" apre una nuova domanda. Unica eccezione, come nel formato originale:
+                    # dopo un "#" senza testo, un "#" preceduto da spazi fa parte del testo della domanda.
+                    if line.startswith('#') and not (q_text_full is None and after_bare_marker and raw_line[0].isspace()):
+                        if q_text_full is not None and options:
+                            # Use a sequential counter for the question ID to avoid duplicates
+                            yield Question(str(question_counter), q_text_full, options, correct_answer, image_path)
+                            question_counter += 1
+                        q_text_full, options, correct_answer, image_path = None, [], None, None
+                        line = line[1:].strip()
+                        after_bare_marker = not line
+                    if not line:
+                        pass
+                    elif q_text_full is None:
+                        q_text_full = line
+                    else:
+                        line_type = self.OPTION_PREFIX.match(line)
+                        kind = 'junk' if self.JUNK_PATTERN.search(line) else (line_type.lastgroup if line_type else None)
+                        if kind == 'junk':
+                            pass
+                        elif kind == 'image':
+                            image_path = Path(line.replace('[image:', '').replace(']', '').strip())
+                        elif kind == 'correct':
+                            option_text = line[line_type.end():].strip()
+                            options.append(option_text)
+                            correct_answer = option_text
+                        elif kind == 'wrong':
+                            options.append(line[3:].strip())
+                        else:
+                            # Assume any other non-junk line is a regular option
+                            options.append(line)
+                if bookmark_index != -1:
+                    break
+
+            if q_text_full is not None and options:
+                yield Question(str(question_counter), q_text_full, options, correct_answer, image_path)
 
 class SimilarityAnalyser:
     ITALIAN_STOP_WORDS = set(['a', 'adesso', 'ai', 'al', 'alla', 'allo', 'allora', 'altre', 'altri', 'altro', 'anche', 'ancora', 'avere', 'aveva', 'avevano', 'c', 'che', 'chi', 'ci', 'come', 'con', 'contro', 'cui', 'da', 'dagli', 'dai', 'dal', 'dall', 'dalla', 'dalle', 'dallo', 'de', 'degli', 'dei', 'del', 'dell', 'della', 'delle', 'dello', 'dentro', 'di', 'dov', 'dove', 'e', 'ed', 'era', 'erano', 'essere', 'fa', 'fino', 'fra', 'fu', 'furono', 'gli', 'ha', 'hanno', 'hai', 'ho', 'i', 'il', 'in', 'io', 'la', 'le', 'lei', 'li', 'lo', 'loro', 'lui', 'ma', 'me', 'mi', 'mia', 'mie', 'miei', 'mio', 'ne', 'negli', 'nei', 'nel', 'nell', 'nella', 'nelle', 'nello', 'noi', 'non', 'nostra', 'nostre', 'nostri', 'nostro', 'o', 'ogni', 'per', 'perche', 'perché', 'piu', 'più', 'quale', 'quando', 'quanta', 'quante', 'quanti', 'quanto', 'quella', 'quelle', 'quelli', 'quello', 'questa', 'queste', 'questi', 'questo', 're', 'se', 'sei', 'senza', 'si', 'sia', 'siamo', 'siete', 'sono', 'sta', 'stata', 'state', 'stati', 'stato', 'su', 'sua', 'sue', 'sui', 'suo', 'tra', 'tu', 'tua', 'tue', 'tui', 'tuo', 'un', 'una', 'uno', 'vi', 'voi', 'vostra', 'vostre', 'vostri', 'vostro'])
     SIMILARITY_THRESHOLD = 0.35
-
-    def __init__(self, questions: List[Question]):
+    # Modalità di analisi selezionabili per materia dalle impostazioni
+    MODE_EXACT = "Esatta"
+    MODE_APPROXIMATE = "Approssimata"
+    MODES = [MODE_EXACT, MODE_APPROXIMATE]
+    LSH_WEIGHT_LEVELS = 20  # Copie di un termine con peso 1 nei multinsiemi dell'LSH (vedi SparseTfidfMatrix.weight_counts)
+    LSH_MIN_QUESTIONS = 2000  # Sotto questa soglia il confronto esatto costa meno delle sole firme MinHash
+
+    def __init__(self, questions: List[Question], mode: str = MODE_EXACT):
         self.questions = questions
         self.question_map = {q.id: q for q in questions}
+        self.mode = mode if mode in self.MODES else self.MODE_EXACT
+
+    @classmethod
+    def cache_path_for(cls, txt_path: Path, mode: str = MODE_EXACT) -> Path:
+        """Percorso della cache di similarità di un paniere: ogni modalità ha la sua, perché i risultati differiscono."""
+        if mode == cls.MODE_APPROXIMATE:
+            return Path(txt_path).with_suffix('.txt.lsh.cache.bin')
+        return Path(txt_path).with_suffix('.txt.cache.bin')
+
+    @classmethod
+    def legacy_cache_path_for(cls, txt_path: Path, mode: str = MODE_EXACT) -> Path:
+        """Percorso della vecchia cache JSON, letta solo per migrarla al formato binario."""
+        return cls.cache_path_for(txt_path, mode).with_suffix('.json')
 
     def _preprocess(self, text: str) -> List[str]:
         text = text.lower()
@@ -78,37 +112,32 @@ class SimilarityAnalyser:
         words = text.split()
         return [word for word in words if word not in self.ITALIAN_STOP_WORDS]
 
-    def _calculate_cosine_similarity(self, vec1: Dict, vec2: Dict) -> float:
-        intersection = set(vec1.keys()) & set(vec2.keys())
-        dot_product = sum(vec1[x] * vec2[x] for x in intersection)
-        sum_sq_vec1 = sum(val**2 for val in vec1.values())
-        sum_sq_vec2 = sum(val**2 for val in vec2.values())
-        magnitude = math.sqrt(sum_sq_vec1) * math.sqrt(sum_sq_vec2)
-        return dot_product / magnitude if magnitude != 0 else 0
+    def documents(self) -> Dict[str, List[str]]:
+        """Token di ogni domanda (testo e opzioni), indicizzati per id."""
+        return {q.id: self._preprocess(q.text + " " + " ".join(q.options)) for q in self.questions}
+
+    def similar_pairs(self, matrix: SparseTfidfMatrix) -> Iterator[Tuple[int, int]]:
+        """Coppie di righe della matrice sopra SIMILARITY_THRESHOLD, calcolate secondo la modalità scelta."""
+        if self.mode == self.MODE_APPROXIMATE and matrix.num_rows >= self.LSH_MIN_QUESTIONS:
+            # Solo le coppie candidate dell'LSH vengono confrontate con la similarità coseno esatta.
+            # Le firme pesano i termini con il loro TF-IDF: due domande simili condividono spesso un solo
+            # termine raro, che si perderebbe nella similarità di Jaccard sugli insiemi di termini.
+            token_counts = [matrix.weight_counts(i, self.LSH_WEIGHT_LEVELS) for i in range(matrix.num_rows)]
+            candidates, oversized = MinHashLSH().candidate_pairs(token_counts)
+            pairs = set(matrix.pair_similarities(candidates, self.SIMILARITY_THRESHOLD))
+            for members in oversized:
+                pairs.update(matrix.similar_pairs(self.SIMILARITY_THRESHOLD, members))
+            return iter(sorted(pairs))
+        return matrix.similar_pairs(self.SIMILARITY_THRESHOLD)
 
     def compute_similarity_map(self) -> Dict[str, List[str]]:
-        docs = {q.id: self._preprocess(q.text + " " + " ".join(q.options)) for q in self.questions}
-        vocab = set(word for words in docs.values() for word in words)
-        if not vocab: return {}
-        num_docs = len(docs)
-        idf = {word: math.log(num_docs / (1 + sum(1 for doc_words in docs.values() if word in doc_words))) for word in vocab}
-
-        tfidf_vectors = {}
-        for doc_id, words in docs.items():
-            term_counts = collections.Counter(words)
-            total_terms = len(words)
-            if total_terms == 0: continue
-            vector = {word: (count / total_terms) * idf[word] for word, count in term_counts.items()}
-            tfidf_vectors[doc_id] = vector
+        docs = self.documents()
+        if not any(docs.values()): return {}
+        matrix = SparseTfidfMatrix.from_documents(docs)
 
         similarity_map = collections.defaultdict(list)
-        question_ids = list(self.question_map.keys())
-        for i in range(len(question_ids)):
-            for j in range(i + 1, len(question_ids)):
-                id1, id2 = question_ids[i], question_ids[j]
-                if id1 in tfidf_vectors and id2 in tfidf_vectors:
-                    sim = self._calculate_cosine_similarity(tfidf_vectors[id1], tfidf_vectors[id2])
-                    if sim > self.SIMILARITY_THRESHOLD:
-                        similarity_map[id1].append(id2)
-                        similarity_map[id2].append(id1)
+        for i, j in self.similar_pairs(matrix):
+            id1, id2 = matrix.doc_ids[i], matrix.doc_ids[j]
+            similarity_map[id1].append(id2)
+            similarity_map[id2].append(id1)
         return {k: list(v) for k, v in similarity_map.items()} # Convert back to dict for JSON
@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Iterable, Callable
+
+from app.services.write_behind import WriteBehindWriter, atomic_write_text
+
+class ThumbnailCache:
+    """
+    Versioni ridotte delle figure delle domande, salvate nella cartella "<img_path>.miniature" accanto a quella
+    delle immagini. Ogni figura ha copie PNG ai lati lunghi standard LONG_SIDES, create al primo bisogno
+    (ensure) o in blocco in background (build); la finestra di studio decodifica la copia più piccola che
+    basta per il riquadro invece dell'originale. index.json registra per ogni figura dimensione, mtime,
+    hash del contenuto e dimensioni originali: una figura modificata invalida le sue copie, e le copie sono
+    nominate per hash, quindi figure identiche le condividono.
+    """
+    LONG_SIDES = (480, 720, 1080, 1600)
+    INDEX_NAME = "index.json"
+    HASH_CHUNK_SIZE = 1 << 20
+
+    def __init__(self, img_path: Path, loader: Callable[[Path], Any]):
+        self.img_path = Path(img_path)
+        self.directory = self.directory_for(self.img_path)
+        # Decodifica delle figure passata da fuori, come per ImagePrefetcher: la libreria di immagini si importa al primo uso
+        self.loader = loader
+        self.writer = WriteBehindWriter(f"miniature {self.directory}")
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        try:
+            self._index = json.loads((self.directory / self.INDEX_NAME).read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @staticmethod
+    def directory_for(img_path: Path) -> Path:
+        img_path = Path(img_path)
+        return img_path.with_name(img_path.name + ".miniature")
+
+    def _key(self, path: Path) -> str:
+        try:
+            return Path(path).relative_to(self.img_path).as_posix()
+        except ValueError:
+            return Path(path).as_posix()
+
+    @staticmethod
+    def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _valid_entry(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Voce dell'indice della figura, se corrisponde ancora al file (dimensione e mtime)."""
+        with self._lock:
+            entry = self._index.get(self._key(path))
+        stat_key = self._stat_key(path)
+        if entry is None or stat_key is None or (entry["size"], entry["mtime_ns"]) != stat_key:
+            return None
+        return entry
+
+    @classmethod
+    def long_side_for(cls, source_size: Tuple[int, int], box: Tuple[int, int]) -> Optional[int]:
+        """Lato lungo standard più piccolo che basta per il riquadro; None se serve l'originale."""
+        width, height = source_size
+        ratio = min(box[0] / width, box[1] / height, 1.0)
+        needed = max(width, height) * ratio
+        for long_side in cls.LONG_SIDES:
+            if needed <= long_side < max(width, height):
+                return long_side
+        return None
+
+    def _derivative_path(self, entry: Dict[str, Any], long_side: int) -> Path:
+        return self.directory / f"{entry['hash']}_{long_side}.png"
+
+    def source_for(self, path: Path, box: Tuple[int, int]) -> Path:
+        """File da decodificare per il riquadro: la copia ridotta più piccola che basta, se esiste già, o l'originale."""
+        entry = self._valid_entry(path)
+        if entry is None: return path
+        long_side = self.long_side_for((entry["width"], entry["height"]), box)
+        if long_side is None or long_side not in entry["long_sides"]: return path
+        derivative = self._derivative_path(entry, long_side)
+        return derivative if derivative.exists() else path
+
+    def _content_hash(self, path: Path) -> str:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def ensure(self, path: Path, box: Tuple[int, int]) -> Path:
+        """
+        Come source_for, ma crea la copia ridotta se manca (decodificando l'originale): da chiamare solo fuori dal
+        thread di Tk. Se la copia non può essere scritta si usa l'originale.
+        """
+        source = self.source_for(path, box)
+        if source != path: return source
+        stat_key = self._stat_key(path)
+        if stat_key is None: return path
+        entry = self._valid_entry(path)
+        try:
+            image = self.loader(path)
+            if entry is None:
+                entry = {"size": stat_key[0], "mtime_ns": stat_key[1], "hash": self._content_hash(path),
+                         "width": image.size[0], "height": image.size[1], "long_sides": []}
+            long_side = self.long_side_for(image.size, box)
+            if long_side is None: return path
+            from PIL import Image
+            ratio = long_side / max(image.size)
+            thumbnail = image.resize((max(1, round(image.size[0] * ratio)), max(1, round(image.size[1] * ratio))), Image.Resampling.LANCZOS)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            derivative = self._derivative_path(entry, long_side)
+            # Un file temporaneo per thread: pool di ridimensionamento e lavoro in blocco possono creare la stessa copia insieme
+            tmp_path = derivative.with_name(f"{derivative.name}.{threading.get_ident()}.tmp")
+            thumbnail.save(tmp_path, format="PNG")
+            os.replace(tmp_path, derivative)
+        except Exception as e:
+            print(f"Impossibile creare la miniatura di {path}: {e}")
+            return path
+        with self._lock:
+            current = self._index.get(self._key(path))
+            # Se un altro thread ha già registrato la stessa versione della figura se ne estende la voce
+            if current is not None and (current["size"], current["mtime_ns"]) == (entry["size"], entry["mtime_ns"]):
+                entry = current
+            self._index[self._key(path)] = entry
+            if long_side not in entry["long_sides"]:
+                entry["long_sides"] = sorted(entry["long_sides"] + [long_side])
+            text = json.dumps(self._index, ensure_ascii=False, separators=(",", ":"))
+        self.writer.schedule("index", partial(atomic_write_text, self.directory / self.INDEX_NAME, text))
+        return derivative
+
+    def build(self, paths: Iterable[Optional[Path]], box: Tuple[int, int], cancelled: Callable[[], bool] = lambda: False):
+        """Crea in blocco le copie mancanti per il riquadro (lavoro in background all'inizio di una sessione)."""
+        for path in paths:
+            if cancelled(): return
+            if path is not None and path.exists():
+                self.ensure(path, box)
@@ -0,0 +1,105 @@
+import os
+import time
+import atexit
+import signal
+import weakref
+import threading
+from pathlib import Path
+from typing import Dict, Callable, Hashable, Optional
+
+class WriteBehindWriter:
+    """
+    Scritture differite su un thread in background. Chi modifica un documento lo segna come da scrivere
+    con schedule(chiave, scrittura): richieste ripetute per la stessa chiave entro la finestra di accorpamento
+    diventano una sola scrittura (vince l'ultima). flush() scrive subito quanto è in sospeso, ed è chiamato
+    prima di rileggere un documento, alla chiusura dell'applicazione e alla ricezione di un segnale di terminazione.
+    """
+    DEFAULT_DELAY = 0.5  # Secondi di accorpamento tra la prima modifica e la scrittura
+    _writers: 'weakref.WeakSet[WriteBehindWriter]' = weakref.WeakSet()
+
+    def __init__(self, name: str, delay: float = DEFAULT_DELAY):
+        self.name = name
+        self.delay = delay
+        self._pending: Dict[Hashable, Callable[[], None]] = {}
+        self._deadline = 0.0
+        self._condition = threading.Condition()
+        # Serializza le scritture del thread con i flush espliciti, in modo che l'ordine sul disco sia quello delle richieste
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._writers.add(self)
+
+    def schedule(self, key: Hashable, write: Callable[[], None]):
+        """Registra la scrittura da eseguire per `key`, sostituendo quella eventualmente ancora in sospeso."""
+        with self._condition:
+            if not self._pending:
+                self._deadline = time.monotonic() + self.delay
+            self._pending[key] = write
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"write-behind {self.name}", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def has_pending(self, key: Optional[Hashable] = None) -> bool:
+        with self._condition:
+            return bool(self._pending) if key is None else key in self._pending
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Finestra di accorpamento: le richieste che arrivano nel frattempo sostituiscono le precedenti
+                while self._pending and (remaining := self._deadline - time.monotonic()) > 0:
+                    self._condition.wait(remaining)
+            self.flush()
+
+    def flush(self, key: Optional[Hashable] = None):
+        """Esegue subito le scritture in sospeso (tutte, o solo quella di `key`) nel thread chiamante."""
+        with self._write_lock:
+            with self._condition:
+                if key is None:
+                    writes, self._pending = self._pending, {}
+                else:
+                    write = self._pending.pop(key, None)
+                    writes = {key: write} if write is not None else {}
+            for write_key, write in writes.items():
+                try:
+                    write()
+                except OSError as e:
+                    print(f"Scrittura differita '{write_key}' non riuscita ({self.name}): {e}")
+                    # Riprova al giro successivo, a meno che nel frattempo non sia arrivata una versione più recente
+                    with self._condition:
+                        if not self._pending:
+                            self._deadline = time.monotonic() + self.delay
+                        self._pending.setdefault(write_key, write)
+                        self._condition.notify()
+
+    @classmethod
+    def flush_all(cls):
+        for writer in list(cls._writers):
+            writer.flush()
+
+def atomic_write_text(path: Path, text: str):
+    """Scrive su un file temporaneo accanto a `path` e lo rinomina: un'interruzione non lascia mai un file a metà."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+def install_exit_handlers():
+    """
+    Svuota le scritture in sospeso all'uscita del processo e su SIGTERM/SIGINT (SIGBREAK su Windows),
+    prima di lasciare che il segnale termini l'applicazione. Va chiamata dal thread principale.
+    """
+    atexit.register(WriteBehindWriter.flush_all)
+
+    def handle(signum, frame):
+        WriteBehindWriter.flush_all()
+        signal.signal(signum, previous.get(signum) or signal.SIG_DFL)
+        signal.raise_signal(signum)
+
+    previous = {}
+    for name in ("SIGTERM", "SIGINT", "SIGBREAK"):
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            previous[signum] = signal.getsignal(signum)
+            signal.signal(signum, handle)
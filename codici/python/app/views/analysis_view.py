@@ -2,8 +2,6 @@ import tkinter as tk
 from tkinter import ttk
 from typing import Dict, Any
 import datetime
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from app.views.dialogs import Tooltip
 
 class AnalysisView(tk.Toplevel):
@@ -11,13 +9,20 @@ class AnalysisView(tk.Toplevel):
     def __init__(self, parent: tk.Tk, stats: Dict[str, Any]):
         super().__init__(parent)
         self.title("Analisi Performance")
-        self.geometry("800x950") # Aumentato per fare spazio a tutti i nuovi elementi
+        self.geometry("800x1150") # Aumentato per fare spazio a tutti i nuovi elementi, tempi di risposta compresi
         self.transient(parent)
         self.grab_set()
 
         self._configure_styles()
         self._create_widgets(stats)
 
+    def refresh(self, stats: Dict[str, Any]):
+        """Ridisegna la finestra con statistiche aggiornate (es. al termine del ricalcolo dello snapshot)."""
+        if not self.winfo_exists(): return
+        for widget in self.winfo_children():
+            widget.destroy()
+        self._create_widgets(stats)
+
     def _configure_styles(self):
         BG_COLOR = "#ECECEC"
         self.configure(background=BG_COLOR)
@@ -78,6 +83,8 @@ class AnalysisView(tk.Toplevel):
             leech_tree.insert("", "end", values=(leech['subject'], leech['question_text']))
         leech_scrollbar.pack(side="right", fill="y"); leech_tree.pack(side="left", expand=True, fill="both")
 
+        self._create_latency_section(container, stats.get('latency', {}))
+
         graph_frame = ttk.LabelFrame(container, text="Andamento Ritenzione")
         graph_frame.pack(expand=True, fill="both", padx=10, pady=(10, 0))
         self.graph_canvas = tk.Canvas(graph_frame, bg="white")
@@ -88,6 +95,37 @@ class AnalysisView(tk.Toplevel):
 
         self.after(100, lambda: self._draw_retention_graph(stats))
 
+    def _create_latency_section(self, container: ttk.Frame, latency: Dict[str, Any]):
+        """Percentili dei tempi di risposta per materia, domande più lente e andamento settimanale della mediana."""
+        latency_frame = ttk.LabelFrame(container, text="Tempi di Risposta")
+        latency_frame.pack(expand=True, fill='both', padx=10, pady=(10, 0))
+        latency_frame.columnconfigure(1, weight=1)
+
+        subject_columns = ("subject", "count", "p50", "p90")
+        subject_tree = ttk.Treeview(latency_frame, columns=subject_columns, show="headings", height=5)
+        subject_tree.heading("subject", text="Materia"); subject_tree.heading("count", text="Ripassi"); subject_tree.heading("p50", text="Mediana"); subject_tree.heading("p90", text="90° perc.")
+        subject_tree.column("subject", width=170, anchor='w'); subject_tree.column("count", width=60, anchor='center'); subject_tree.column("p50", width=70, anchor='center'); subject_tree.column("p90", width=70, anchor='center')
+        for subject, data in sorted(latency.get('subjects', {}).items()):
+            subject_tree.insert("", "end", values=(subject, data['count'], f"{data['p50']:.1f} s", f"{data['p90']:.1f} s"))
+        subject_tree.grid(row=0, column=0, sticky="nsew", padx=(0, 10))
+
+        slow_columns = ("subject", "question", "median", "correct")
+        slow_tree = ttk.Treeview(latency_frame, columns=slow_columns, show="headings", height=5)
+        slow_tree.heading("subject", text="Materia"); slow_tree.heading("question", text="Domande più lente"); slow_tree.heading("median", text="Mediana"); slow_tree.heading("correct", text="Corrette")
+        slow_tree.column("subject", width=110, anchor='w'); slow_tree.column("question", width=260, anchor='w'); slow_tree.column("median", width=65, anchor='center'); slow_tree.column("correct", width=65, anchor='center')
+        slow_tree.tag_configure("slow_but_correct", background="#FFF4CC")
+        for item in latency.get('slowest', []):
+            tags = ("slow_but_correct",) if item['slow_but_correct'] else ()
+            slow_tree.insert("", "end", values=(item['subject'], item['question_text'], f"{item['median']:.1f} s", f"{item['correct_rate'] * 100:.0f}%"), tags=tags)
+        slow_tree.grid(row=0, column=1, sticky="nsew")
+        help_icon = ttk.Label(latency_frame, text="?", font=('Helvetica', 9, 'bold'), cursor="question_arrow", style="Stat.TLabel")
+        help_icon.grid(row=0, column=2, sticky="n", padx=5)
+        Tooltip(help_icon, "In giallo le domande lente ma risposte correttamente: mediana oltre il 90° percentile della materia e almeno l'80% di risposte corrette.")
+
+        trend = latency.get('trend', [])[-8:]
+        trend_text = "  →  ".join(f"{item['week'][-3:]}: {item['median']:.1f} s" for item in trend) if trend else "Nessun tempo di risposta registrato."
+        ttk.Label(latency_frame, text=f"Mediana settimanale: {trend_text}", style="Stat.TLabel", wraplength=740).grid(row=1, column=0, columnspan=3, sticky="w", pady=(8, 0))
+
     def _draw_retention_graph(self, stats: Dict[str, Any]):
         trend_data = stats.get("retention_trend", [])
         trend_data.sort(key=lambda x: x['date'])
@@ -96,6 +134,10 @@ class AnalysisView(tk.Toplevel):
         if len(trend_data) < 2:
             ttk.Label(self.graph_canvas, text="Dati insufficienti per generare il grafico.\nServono almeno due giorni di studio.", justify='center', background='white').pack(expand=True)
             return
+        # matplotlib e il suo backend Tk vengono caricati solo quando serve disegnare il grafico
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        import matplotlib.dates as mdates
         dates = [datetime.datetime.fromisoformat(item['date']).date() for item in trend_data]
         retention_rates = [item['retention'] for item in trend_data]
         fig = Figure(figsize=(8, 3.5), dpi=100); fig.patch.set_facecolor('#ECECEC')
@@ -103,7 +145,6 @@ class AnalysisView(tk.Toplevel):
         ax.plot(dates, retention_rates, marker='o', linestyle='-', color='#007acc', markersize=5, label="Tasso di Ritenzione")
         ax.set_title("Andamento del Tasso di Ritenzione", fontsize=12); ax.set_ylabel("Ritenzione (%)", fontsize=10)
         ax.grid(True, linestyle='--', alpha=0.6); ax.set_ylim(0, 105)
-        import matplotlib.dates as mdates
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%m')); fig.autofmt_xdate(rotation=45, ha='right')
         fig.tight_layout()
         canvas = FigureCanvasTkAgg(fig, master=self.graph_canvas); canvas.draw()
@@ -57,8 +57,9 @@ class MainView(ThemedTk):
         # Statistiche
         stats_frame = ttk.LabelFrame(left_panel, text="Le tue Statistiche")
         stats_frame.pack(fill="x", expand=True)
-        self.streak_var = tk.StringVar(value="0 giorni")
-        self.retention_var = tk.StringVar(value="N/D")
+        # Segnaposto finché il controller non consegna le statistiche calcolate in background
+        self.streak_var = tk.StringVar(value="…")
+        self.retention_var = tk.StringVar(value="…")
         ttk.Label(stats_frame, text="🔥 Serie di Studio:", font=("Helvetica", 11)).pack(anchor="w", padx=5)
         ttk.Label(stats_frame, textvariable=self.streak_var, style="StatValue.TLabel").pack(anchor="w", padx=5, pady=(0,10))
         ttk.Label(stats_frame, text="🎯 Tasso di Ritenzione:", font=("Helvetica", 11)).pack(anchor="w", padx=5)
@@ -67,7 +68,7 @@ class MainView(ThemedTk):
         # Suggerimenti
         suggestion_frame = ttk.LabelFrame(left_panel, text="Suggerimenti")
         suggestion_frame.pack(fill="x", expand=True, pady=(20, 0))
-        self.suggestion_var = tk.StringVar(value="Inizia una sessione di ripasso per vedere i suggerimenti.")
+        self.suggestion_var = tk.StringVar(value="Caricamento delle statistiche...")
         ttk.Label(suggestion_frame, textvariable=self.suggestion_var, wraplength=250, justify="left", style="Suggestion.TLabel").pack(padx=5, pady=5)
 
         # --- Pannello Destro: Azioni ---
@@ -99,6 +100,10 @@ class MainView(ThemedTk):
         ttk.Button(bottom_frame, text="Analisi Performance", command=self.analysis_callback).pack(side='left', expand=True, fill='x', ipady=8, padx=(0,5))
         ttk.Button(bottom_frame, text="Impostazioni", command=self.settings_callback).pack(side='left', expand=True, fill='x', ipady=8, padx=(5,0))
 
+    def show_dashboard_progress(self, done: int, total: int, subject: str):
+        """Mostra l'avanzamento del calcolo delle statistiche mentre le materie vengono elaborate."""
+        self.suggestion_var.set(f"Caricamento delle statistiche... ({done}/{total})\nUltima materia: {subject}")
+
     def update_dashboard(self, stats: Dict[str, any]):
         """Aggiorna i widget della dashboard con le nuove statistiche."""
         # Aggiorna il pulsante di ripasso SRS
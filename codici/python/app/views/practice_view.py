@@ -4,6 +4,7 @@ from typing import List, Dict, Optional, Any, Callable
 from PIL import Image, ImageTk
 
 from app.models.question_model import Question
+from app.models.session_model import QuizSession
 
 class PracticeView(Toplevel):
     MAX_OPTIONS = 10
@@ -13,6 +14,8 @@ class PracticeView(Toplevel):
         self.image_update_callback = image_update_callback
         self.protocol("WM_DELETE_WINDOW", self.on_close); self.title(f"Modalità: {mode.capitalize()}"); self.state('zoomed')
         self.img_ref, self._after_id = None, None; self.nav_buttons: List[ttk.Button] = []
+        # Unica variabile Tk delle risposte, legata di volta in volta alla domanda mostrata
+        self.answer_var = tk.StringVar(self, value="")
         self._setup_styles(); self._setup_ui()
         self._setup_key_bindings() # Centralized key bindings
         self.bind("<Configure>", self._on_resize)
@@ -138,11 +141,11 @@ class PracticeView(Toplevel):
         for widget in self.nav_panel.winfo_children(): widget.destroy(); self.nav_buttons.clear()
         for i in range(count):
             btn = ttk.Button(self.nav_panel, text=f"{i + 1}", command=lambda idx=i: jump_callback(idx)); btn.pack(fill='x', pady=2, padx=2); self.nav_buttons.append(btn)
-    def update_navigation_panel(self, questions: List[Question], current_index: int):
+    def update_navigation_panel(self, session: QuizSession, current_index: int):
         if not self.is_exam_mode: return
         for i, btn in enumerate(self.nav_buttons):
-            q = questions[i]; style_name = "TButton"
-            if q.user_answer.get(): style_name = "Answered.TButton"
+            style_name = "TButton"
+            if session.is_answered(i): style_name = "Answered.TButton"
             if i == current_index: style_name = "Current.TButton"
             btn.configure(style=style_name)
     def _on_resize(self, event: tk.Event):
@@ -185,16 +188,21 @@ class PracticeView(Toplevel):
 
         self.after(750, clear_feedback)
 
-    def display_question(self, q: Question, status_text: str, image: Optional[ImageTk.PhotoImage]):
-        self.status_label.config(text=status_text); self.question_text_label.config(text=q.text)
+    def show_image(self, image: Optional[ImageTk.PhotoImage]):
         self.image_label.config(image=image or ''); self.img_ref = image
+
+    def display_question(self, q: Question, status_text: str, image: Optional[ImageTk.PhotoImage], selected_answer: str = ""):
+        self.status_label.config(text=status_text); self.question_text_label.config(text=q.text)
+        self.answer_var.set(selected_answer)
+        self.show_image(image)
         for i in range(self.MAX_OPTIONS):
             widget = self.option_widgets[i]
             if i < len(q.options):
                 option_text = q.options[i]; widget['frame'].pack(anchor='w', fill='x', pady=4)
-                widget['radio'].config(variable=q.user_answer, value=option_text); widget['label'].config(text=option_text, style="TLabel")
+                widget['radio'].config(variable=self.answer_var, value=option_text); widget['label'].config(text=option_text, style="TLabel")
             else: widget['frame'].pack_forget()
 
+    def get_selected_answer(self) -> str: return self.answer_var.get()
     def show_correct_answer(self, correct_answer: str):
         for widget in self.option_widgets:
             if widget['radio']['value'] == correct_answer: widget['label'].config(style="CorrectAnswer.TLabel")
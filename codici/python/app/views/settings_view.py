@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, Toplevel, simpledialog
 import datetime
+import sqlite3
 from typing import Dict
 from pathlib import Path
 
 from app.services.settings_manager import SettingsManager
 from app.services.config_manager import ConfigManager
+from app.services.text_processing import SimilarityAnalyser
+from app.services.storage import Storage, JsonStorage, SqliteStorage
 from app.views.dialogs import Tooltip
 
 class SettingsView(Toplevel):
@@ -42,7 +45,7 @@ class SettingsView(Toplevel):
         self._refresh_profile_combobox()
 
     def create_materie_tab(self):
-        self.subject_vars = {"txt_path": tk.StringVar(), "img_path": tk.StringVar(), "exam_date": tk.StringVar(), "status": tk.StringVar()}
+        self.subject_vars = {"txt_path": tk.StringVar(), "img_path": tk.StringVar(), "exam_date": tk.StringVar(), "status": tk.StringVar(), "similarity_mode": tk.StringVar()}
 
         subject_frame = ttk.LabelFrame(self.materie_tab, text="Selezione Materia", padding=10)
         subject_frame.pack(fill='x', expand=True)
@@ -69,10 +72,18 @@ class SettingsView(Toplevel):
         ttk.Entry(details_frame, textvariable=self.subject_vars["exam_date"]).grid(row=2, column=1, columnspan=2, sticky='ew', pady=5, padx=5)
         ttk.Label(details_frame, text="Stato:").grid(row=3, column=0, sticky='w', pady=5, padx=5)
         ttk.Combobox(details_frame, textvariable=self.subject_vars["status"], values=["In Corso", "Passato"], state="readonly").grid(row=3, column=1, columnspan=2, sticky='ew', pady=5, padx=5)
+        similarity_label_frame = ttk.Frame(details_frame)
+        similarity_label_frame.grid(row=4, column=0, sticky='w', pady=5, padx=5)
+        ttk.Label(similarity_label_frame, text="Analisi Similarità:").pack(side='left')
+        help_icon = ttk.Label(similarity_label_frame, text="?", font=('Helvetica', 9, 'bold'), cursor="question_arrow")
+        help_icon.pack(side='left', padx=5)
+        Tooltip(help_icon, "'Esatta' confronta ogni coppia di domande. 'Approssimata' (MinHash/LSH) confronta solo le coppie candidate: consigliata per panieri con decine di migliaia di domande (sotto le 2000 domande il confronto resta esatto).")
+        ttk.Combobox(details_frame, textvariable=self.subject_vars["similarity_mode"], values=SimilarityAnalyser.MODES, state="readonly").grid(row=4, column=1, columnspan=2, sticky='ew', pady=5, padx=5)
 
     def create_generali_tab(self):
         self.global_vars = {
-            "retention_period_days": tk.IntVar(value=7), "new_cards_per_day": tk.IntVar(value=20),
+            "retention_period_days": tk.IntVar(value=7), "new_cards_per_day": tk.IntVar(value=20), "image_cache_mb": tk.IntVar(value=128),
+            "warmup_on_launch": tk.BooleanVar(value=True),
             "srs_again": tk.IntVar(value=10), "srs_hard": tk.IntVar(value=120),
             "srs_good": tk.IntVar(value=1440), "srs_easy": tk.IntVar(value=4320)
         }
@@ -98,6 +109,17 @@ class SettingsView(Toplevel):
         path_entry.grid(row=1, column=1, sticky='ew', pady=5, padx=5)
         ttk.Button(profile_frame, text="Cambia Percorso", command=self._edit_profile_path).grid(row=1, column=2, sticky='ew', pady=5, padx=5)
 
+        storage_label_frame = ttk.Frame(profile_frame)
+        storage_label_frame.grid(row=2, column=0, sticky='w', pady=5, padx=5)
+        ttk.Label(storage_label_frame, text="Archivio Dati:").pack(side='left')
+        storage_help_icon = ttk.Label(storage_label_frame, text="?", font=('Helvetica', 9, 'bold'), cursor="question_arrow")
+        storage_help_icon.pack(side='left', padx=5)
+        Tooltip(storage_help_icon, "'json' salva un file per materia e per i dati dell'app. 'sqlite' usa un unico database indicizzato, più veloce con deck e log molto grandi. Al cambio di archivio i dati vengono copiati in quello nuovo; i file JSON restano come copia di sicurezza.")
+        self.storage_var = tk.StringVar()
+        storage_combo = ttk.Combobox(profile_frame, textvariable=self.storage_var, values=[JsonStorage.NAME, SqliteStorage.NAME], state="readonly")
+        storage_combo.grid(row=2, column=1, columnspan=2, sticky='ew', pady=5, padx=5)
+        storage_combo.bind("<<ComboboxSelected>>", self._on_storage_selected)
+
         # --- SRS Frame ---
         srs_frame = ttk.LabelFrame(self.generali_tab, text="Intervalli di Ripetizione (in minuti)", padding=10)
         srs_frame.pack(fill='x', expand=True)
@@ -113,6 +135,9 @@ class SettingsView(Toplevel):
         ttk.Entry(other_frame, textvariable=self.global_vars["retention_period_days"], width=10).grid(row=0, column=1, padx=5, pady=5, sticky='w')
         ttk.Label(other_frame, text="Nuove Carte per Sessione:").grid(row=1, column=0, padx=5, pady=5, sticky='w')
         ttk.Entry(other_frame, textvariable=self.global_vars["new_cards_per_day"], width=10).grid(row=1, column=1, padx=5, pady=5, sticky='w')
+        ttk.Label(other_frame, text="Memoria Cache Immagini (MB):").grid(row=2, column=0, padx=5, pady=5, sticky='w')
+        ttk.Entry(other_frame, textvariable=self.global_vars["image_cache_mb"], width=10).grid(row=2, column=1, padx=5, pady=5, sticky='w')
+        ttk.Checkbutton(other_frame, text="Prepara le materie 'In Corso' all'avvio", variable=self.global_vars["warmup_on_launch"]).grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky='w')
 
     # --- Profile Methods ---
     def _refresh_profile_combobox(self):
@@ -130,8 +155,10 @@ class SettingsView(Toplevel):
         if selected_profile:
             path = self.config_manager.config["profiles"][selected_profile]["data_path"]
             self.data_path_var.set(path)
+            self.storage_var.set(self.config_manager.config["profiles"][selected_profile].get("storage", JsonStorage.NAME))
         else:
             self.data_path_var.set("")
+            self.storage_var.set("")
 
     def _on_profile_selected_in_combo(self, event=None):
         self._update_path_display()
@@ -166,6 +193,19 @@ class SettingsView(Toplevel):
         except ValueError as e:
             messagebox.showerror("Errore", str(e), parent=self)
 
+    def _on_storage_selected(self, event=None):
+        selected_profile = self.profile_combo.get()
+        if not selected_profile: return
+        try:
+            # I dati del backend in uso vengono copiati nel nuovo prima di cambiarlo
+            Storage.switch_backend(self.config_manager, selected_profile, self.storage_var.get())
+        except (OSError, sqlite3.Error) as e:
+            self._update_path_display()
+            return messagebox.showerror("Errore", f"Impossibile copiare i dati nel nuovo archivio: {e}", parent=self)
+        if selected_profile == self.config_manager.get_active_profile():
+            # Le modifiche fatte da questa finestra devono finire nel nuovo archivio
+            self.settings_manager.reload_settings()
+
     def _edit_profile_path(self):
         selected_profile = self.profile_combo.get()
         if not selected_profile:
@@ -182,6 +222,8 @@ class SettingsView(Toplevel):
         settings = self.settings_manager.get_global_settings()
         self.global_vars["retention_period_days"].set(settings.get("retention_period_days", 7))
         self.global_vars["new_cards_per_day"].set(settings.get("new_cards_per_day", 20))
+        self.global_vars["image_cache_mb"].set(settings.get("image_cache_mb", 128))
+        self.global_vars["warmup_on_launch"].set(settings.get("warmup_on_launch", True))
         srs_intervals = settings.get("srs_intervals", {})
         self.global_vars["srs_again"].set(srs_intervals.get("again", 10))
         self.global_vars["srs_hard"].set(srs_intervals.get("hard", 120))
@@ -192,6 +234,8 @@ class SettingsView(Toplevel):
         new_settings = {
             "retention_period_days": self.global_vars["retention_period_days"].get(),
             "new_cards_per_day": self.global_vars["new_cards_per_day"].get(),
+            "image_cache_mb": self.global_vars["image_cache_mb"].get(),
+            "warmup_on_launch": self.global_vars["warmup_on_launch"].get(),
             "srs_intervals": {
                 "again": self.global_vars["srs_again"].get(),
                 "hard": self.global_vars["srs_hard"].get(),
@@ -0,0 +1,61 @@
+import random
+import sys
+import time
+import itertools
+from typing import List, Callable, Tuple, Any
+
+from app.models.question_model import Question
+
+def synthetic_vocabulary(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    letters = "abcdefghilmnoprstuvz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+def synthetic_questions(count: int, seed: int = 0) -> List[Question]:
+    """
+    Genera domande sintetiche simili a un paniere reale: termini con distribuzione di tipo Zipf,
+    vocabolario che cresce con il deck e gruppi di domande "parenti" che condividono gran parte del testo.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(max(4000, count * 4), seed)
+    # Pesi cumulativi calcolati una volta: con weights= choices() li ricalcola su tutto il vocabolario a ogni chiamata
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 20) for rank in range(len(vocabulary))))
+
+    def words(length: int) -> List[str]:
+        return rng.choices(vocabulary, cum_weights=cum_weights, k=length)
+
+    def variant(base: List[str]) -> str:
+        return " ".join(word if rng.random() > 0.35 else words(1)[0] for word in base)
+
+    questions = []
+    topic_size = 3
+    for topic_start in range(0, count, topic_size):
+        base_text, base_options = words(rng.randint(6, 14)), [words(rng.randint(3, 7)) for _ in range(4)]
+        for n in range(topic_start, min(topic_start + topic_size, count)):
+            options = [variant(option) for option in base_options]
+            questions.append(Question(str(n + 1), f"{n + 1:05d}. {variant(base_text)}?", options, options[0]))
+    return questions
+
+def timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def peak_rss_bytes() -> int:
+    """Picco di memoria residente del processo corrente (ru_maxrss; su Windows PeakWorkingSetSize)."""
+    try:
+        import resource
+    except ImportError:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD), ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t), ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS(); counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux riporta KiB, macOS byte
@@ -0,0 +1,154 @@
+"""
+Picco di memoria (RSS) di una sessione di studio su un paniere con molte figure: caricamento di tutte le
+immagini a piena risoluzione in un dizionario (implementazione originale di _image_loader_worker) contro la
+cache LRU con budget in byte e prefetch delle sole domande vicine al cursore. Ogni modalità gira in un processo
+separato, così il picco misurato è solo il suo. Misura anche il tempo per domanda sul thread dell'interfaccia:
+copia e ridimensionamento LANCZOS a ogni domanda (originale) contro il ritiro di un'immagine già scalata dal pool.
+Infine confronta il lavoro del pool per figura partendo dall'originale o dalla miniatura su disco (ThumbnailCache).
+
+Uso (da codici/python, serve Pillow):  python -m benchmarks.image_cache_benchmark [--figures 500] [--budget-mb 64]
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.image_cache import ImageCache, ImagePrefetcher, ImageResizer
+from app.services.thumbnail_cache import ThumbnailCache
+from benchmarks.bench_utils import peak_rss_bytes, timed
+
+def write_synthetic_figures(directory: Path, figures: int, size=(1400, 1000), seed: int = 0) -> List[Path]:
+    """Figure simili a quelle ritagliate dai PDF: sfondo bianco con qualche rettangolo e linea."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    paths = []
+    for n in range(figures):
+        image = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x0, y0 = rng.randrange(size[0] - 100), rng.randrange(size[1] - 100)
+            draw.rectangle((x0, y0, x0 + rng.randrange(20, 100), y0 + rng.randrange(20, 100)), outline=(0, 0, 0), width=3)
+            draw.line((rng.randrange(size[0]), rng.randrange(size[1]), rng.randrange(size[0]), rng.randrange(size[1])), fill=(30, 30, 160), width=2)
+        path = directory / f"figura_{n:04d}.png"
+        image.save(path)
+        paths.append(path)
+    return paths
+
+def load_image(path: Path):
+    from PIL import Image
+    image = Image.open(path)
+    image.load()
+    return image
+
+def run_legacy(paths: List[Path]) -> dict:
+    cache = {}
+    for path in paths:
+        cache[path] = load_image(path)
+    return {"images": len(cache)}
+
+def run_lru(paths: List[Optional[Path]], budget_mb: int, steps: int) -> dict:
+    """Percorre la sessione domanda per domanda (con qualche salto) come farebbe display_current_question."""
+    cache = ImageCache(budget_mb * 1024 * 1024)
+    prefetcher = ImagePrefetcher(cache, load_image)
+    rng = random.Random(1)
+    index, waits = 0, []
+    for step in range(steps):
+        index = rng.randrange(len(paths)) if step % 25 == 24 else min(index + 1, len(paths) - 1)
+        prefetcher.prioritize(paths, index)
+        wait, _ = timed(lambda: prefetcher.load(paths[index]))
+        waits.append(wait)
+        time.sleep(0.02)  # Tempo di lettura della domanda: il prefetch lavora nel frattempo
+    prefetcher.stop()
+    return {"images": len(cache), "cache_mb": cache.nbytes / 1e6, "max_wait_ms": max(waits) * 1000}
+
+def step_costs(paths: List[Path], steps: int, box=(1152, 384)) -> dict:
+    """Tempo speso sul thread dell'interfaccia per mostrare la figura di ogni domanda visitata in sequenza."""
+    from PIL import Image
+    cache = ImageCache(budget_bytes=1 << 40)  # Nessuno scarto: si misura solo il ridimensionamento
+    prefetcher = ImagePrefetcher(cache, load_image)
+    for path in paths[:steps]:
+        prefetcher.load(path)  # Entrambe le varianti partono da immagini già decodificate
+
+    def legacy_step(path):
+        image = cache.get(path).copy()
+        width, height = image.size
+        ratio = min(box[0] / width, box[1] / height)
+        return image.resize((int(width * ratio), int(height * ratio)), Image.Resampling.LANCZOS)
+
+    legacy = [timed(lambda: legacy_step(path))[0] for path in paths[:steps]]
+    resizer = ImageResizer(prefetcher, lambda image: image)
+    pipelined = []
+    for index, path in enumerate(paths[:steps]):
+        elapsed, photo = timed(lambda: resizer.photo(path, box))
+        for neighbour in prefetcher.window(paths, index):
+            resizer.request(neighbour, box)
+        pipelined.append(elapsed)
+        time.sleep(0.02)
+    resizer.shutdown(); prefetcher.stop()
+    return {"legacy_max_ms": max(legacy) * 1000, "legacy_mean_ms": sum(legacy) / len(legacy) * 1000,
+            "pipelined_max_ms": max(pipelined) * 1000, "pipelined_mean_ms": sum(pipelined) / len(pipelined) * 1000}
+
+def thumbnail_costs(directory: Path, paths: List[Path], box=(1152, 384)) -> dict:
+    """Decodifica + ridimensionamento per figura dall'originale e dalla miniatura già creata (a cache fredda)."""
+    from PIL import Image
+    thumbnails = ThumbnailCache(directory, load_image)
+    build_time, _ = timed(lambda: thumbnails.build(paths, box))
+    thumbnails.writer.flush()
+
+    def scale(source):
+        image = load_image(source)
+        ratio = min(box[0] / image.size[0], box[1] / image.size[1], 1.0)
+        return image.resize((int(image.size[0] * ratio), int(image.size[1] * ratio)), Image.Resampling.LANCZOS)
+
+    original = [timed(lambda: scale(path))[0] for path in paths]
+    derivative = [timed(lambda: scale(thumbnails.source_for(path, box)))[0] for path in paths]
+    shutil.rmtree(thumbnails.directory)  # Sta accanto alla cartella temporanea, non dentro
+    return {"build_s": build_time, "original_ms": sum(original) / len(original) * 1000,
+            "thumbnail_ms": sum(derivative) / len(derivative) * 1000}
+
+def child(args):
+    paths = sorted(Path(args.directory).glob("figura_*.png"))
+    result = run_legacy(paths) if args.mode == "legacy" else run_lru(paths, args.budget_mb, args.steps)
+    result["peak_rss_mb"] = peak_rss_bytes() / 1e6
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--figures", type=int, default=500)
+    parser.add_argument("--budget-mb", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200, help="domande visitate nella sessione simulata")
+    parser.add_argument("--mode", choices=["legacy", "lru"], help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_time, _ = timed(lambda: write_synthetic_figures(Path(tmp_dir), args.figures))
+        print(f"{args.figures} figure sintetiche generate in {write_time:.1f} s")
+        for mode in ("legacy", "lru"):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.image_cache_benchmark", "--mode", mode, "--directory", tmp_dir,
+                                     "--budget-mb", str(args.budget_mb), "--steps", str(args.steps)],
+                                    cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            name = "tutte in memoria (originale)" if mode == "legacy" else f"LRU {args.budget_mb} MB + prefetch"
+            extra = f", attesa massima {result['max_wait_ms']:.1f} ms" if mode == "lru" else ""
+            print(f"{name:<30} | picco RSS {result['peak_rss_mb']:>8.1f} MB | immagini in memoria {result['images']:>4}{extra}")
+        paths = sorted(Path(tmp_dir).glob("figura_*.png"))
+        costs = step_costs(paths, min(args.steps, len(paths), 40))
+        print(f"thread dell'interfaccia per domanda: ridimensionamento sincrono {costs['legacy_mean_ms']:.1f} ms (max {costs['legacy_max_ms']:.1f}), "
+              f"pool di ridimensionamento {costs['pipelined_mean_ms']:.3f} ms (max {costs['pipelined_max_ms']:.3f})")
+        costs = thumbnail_costs(Path(tmp_dir), paths[:40])
+        print(f"pool di ridimensionamento per figura: dall'originale {costs['original_ms']:.1f} ms, dalla miniatura "
+              f"{costs['thumbnail_ms']:.1f} ms (miniature create in {costs['build_s']:.1f} s, una volta sola)")
+
+if __name__ == "__main__":
+    main()
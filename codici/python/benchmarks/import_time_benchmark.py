@@ -0,0 +1,69 @@
+"""
+Profilo delle importazioni all'avvio: esegue `python -X importtime` in un processo pulito sull'import di
+app.main (quanto serve per aprire la dashboard) e riporta il tempo totale, i pacchetti di primo livello più
+costosi e se i moduli pesanti caricati solo al primo utilizzo (matplotlib, PIL, PyPDF2, strumenti, viste delle
+sessioni e dell'analisi) sono stati importati lo stesso. Con --eager misura anche l'import anticipato di quei
+moduli, come faceva il controller prima, per mostrare il tempo risparmiato.
+
+Uso (da codici/python):  python -m benchmarks.import_time_benchmark [--top 15] [--eager]
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ["matplotlib", "PIL", "PyPDF2", "tools.pdf_merger", "tools.image_snipper", "tools.text_formatter",
+                "app.views.analysis_view", "app.views.practice_view", "app.views.results_view"]
+EAGER_IMPORTS = ["matplotlib.figure", "matplotlib.backends.backend_tkagg", "PIL.Image", "PIL.ImageTk", "tools.pdf_merger",
+                 "tools.image_snipper", "tools.text_formatter", "app.views.analysis_view", "app.views.practice_view", "app.views.results_view"]
+
+def profile_imports(modules: List[str]) -> Tuple[List[Tuple[str, int, int, int]], str]:
+    """
+    Importa i moduli in un nuovo interprete con -X importtime. Restituisce le righe (modulo, profondità, self µs,
+    cumulativo µs) e l'eventuale errore di importazione (le dipendenze mancanti non interrompono il profilo).
+    """
+    code = "import importlib, sys\n" \
+           f"for name in {modules!r}:\n" \
+           "    try: importlib.import_module(name)\n" \
+           "    except Exception as e: print(f'{name}: {type(e).__name__}: {e}', file=sys.stdout)\n"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PROJECT_DIR, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line: continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows, result.stdout.strip()
+
+def report(title: str, rows: List[Tuple[str, int, int, int]], errors: str, top: int) -> int:
+    top_level = [row for row in rows if row[1] == 0]
+    total = sum(row[3] for row in top_level)
+    print(f"\n{title}: {total / 1000:.1f} ms, {len(rows)} moduli")
+    if errors:
+        print(f"  importazioni non riuscite (dipendenze mancanti?):\n    " + errors.replace("\n", "\n    "))
+    print(f"  {'modulo':<48} | {'cumulativo (ms)':>15} | {'proprio (ms)':>12}")
+    for name, _, self_us, cumulative_us in sorted(top_level, key=lambda row: row[3], reverse=True)[:top]:
+        print(f"  {name:<48} | {cumulative_us / 1000:>15.1f} | {self_us / 1000:>12.1f}")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="pacchetti di primo livello da mostrare")
+    parser.add_argument("--eager", action="store_true", help="confronta con l'import anticipato dei moduli pesanti")
+    args = parser.parse_args()
+
+    rows, errors = profile_imports(["app.main"])
+    startup_total = report("Avvio (import di app.main)", rows, errors, args.top)
+    loaded: Dict[str, int] = {name: cumulative for name, _, _, cumulative in rows}
+    eager_loaded = [name for name in LAZY_MODULES if name in loaded]
+    print(f"\nModuli caricati al primo utilizzo già importati all'avvio: {', '.join(eager_loaded) if eager_loaded else 'nessuno'}")
+
+    if args.eager:
+        rows, errors = profile_imports(["app.main"] + EAGER_IMPORTS)
+        eager_total = report("Avvio con import anticipato (controller originale)", rows, errors, args.top)
+        print(f"\nTempo di import risparmiato all'avvio: {(eager_total - startup_total) / 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Recall e tempi della modalità approssimata (MinHash/LSH) rispetto a quella esatta.
+
+Uso (da codici/python):  python -m benchmarks.lsh_recall_benchmark [--sizes 1000 10000 50000]
+Misura la recall sui panieri in materie/ (singolarmente e uniti) e poi i tempi su deck sintetici.
+Sotto SimilarityAnalyser.LSH_MIN_QUESTIONS domande la modalità approssimata usa il confronto esatto.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.text_processing import TextFileParser, SimilarityAnalyser
+from benchmarks.bench_utils import synthetic_questions, timed
+
+MATERIE_DIR = Path(__file__).resolve().parent.parent.parent.parent / "materie"
+
+def _pairs(similarity_map: Dict[str, List[str]]) -> Set[Tuple[str, str]]:
+    return {(a, b) for a, neighbours in similarity_map.items() for b in neighbours if a < b}
+
+def compare(label: str, questions) -> None:
+    exact_time, exact_map = timed(lambda: SimilarityAnalyser(questions, SimilarityAnalyser.MODE_EXACT).compute_similarity_map())
+    approx_time, approx_map = timed(lambda: SimilarityAnalyser(questions, SimilarityAnalyser.MODE_APPROXIMATE).compute_similarity_map())
+    exact_pairs, approx_pairs = _pairs(exact_map), _pairs(approx_map)
+    recall = len(exact_pairs & approx_pairs) / len(exact_pairs) if exact_pairs else 1.0
+    print(f"{label[:40]:<40} | {len(questions):>7} | {len(exact_pairs):>7} | {recall:7.1%} | {exact_time:9.2f} | {approx_time:9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'paniere':<40} | {'domande':>7} | {'coppie':>7} | {'recall':>7} | {'esatta (s)':>9} | {'LSH (s)':>9}")
+    merged = []
+    for txt_path in sorted(MATERIE_DIR.rglob("domande chiuse*.txt")):
+        questions = TextFileParser(txt_path).parse()
+        merged.extend(questions)
+        compare(txt_path.stem, questions)
+    if merged:
+        compare("panieri uniti", merged)
+    for size in args.sizes:
+        compare(f"sintetico {size}", synthetic_questions(size))
+    print(f"(sotto {SimilarityAnalyser.LSH_MIN_QUESTIONS} domande la modalità approssimata usa il confronto esatto)")
+
+if __name__ == "__main__":
+    main()
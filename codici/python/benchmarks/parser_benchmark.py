@@ -0,0 +1,98 @@
+"""
+Confronta il parsing originale (lettura completa e split con regex) con il parser a flusso di TextFileParser.
+
+Uso (da codici/python):  python -m benchmarks.parser_benchmark [--size-mb 100]
+Il paniere sintetico viene generato in una cartella temporanea e rimosso al termine.
+"""
+import argparse
+import itertools
+import re
+import sys
+import tempfile
+import random
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.models.question_model import Question
+from app.services.text_processing import TextFileParser
+from benchmarks.bench_utils import synthetic_vocabulary, timed
+
+def legacy_parse(file_path: Path) -> List[Question]:
+    """Implementazione originale di TextFileParser.parse."""
+    questions: List[Question] = []
+    question_counter = 1
+    try:
+        content = file_path.read_text(encoding='utf-8')
+    except Exception:
+        return []
+    if TextFileParser.BOOKMARK in content:
+        content, _ = content.split(TextFileParser.BOOKMARK, 1)
+    blocks = re.split(r'^\s*#\s*', content, flags=re.MULTILINE)
+    for block in filter(None, (b.strip() for b in blocks)):
+        lines = [line.strip() for line in block.split('\n') if line.strip()]
+        if not lines:
+            continue
+        q_text_full = lines.pop(0)
+        options, correct_answer, image_path = [], None, None
+        JUNK_KEYWORDS = ["INGEGNERIA INFORMATICA", "eCampus", "Data Stampa", "©"]
+        for line in lines:
+            if any(keyword in line for keyword in JUNK_KEYWORDS):
+                continue
+            if line.startswith('[image:'):
+                image_path = Path(line.replace('[image:', '').replace(']', '').strip())
+            elif line.startswith('*'):
+                correct_answer = line[1:].strip(); options.append(correct_answer)
+            elif line.startswith('[x]'):
+                correct_answer = line[3:].strip(); options.append(correct_answer)
+            elif line.startswith('[ ]'):
+                options.append(line[3:].strip())
+            else:
+                options.append(line)
+        if options:
+            questions.append(Question(str(question_counter), q_text_full, options, correct_answer, image_path))
+            question_counter += 1
+    return questions
+
+def write_synthetic_paniere(path: Path, size_mb: int):
+    rng = random.Random(0)
+    vocabulary = synthetic_vocabulary(5000)
+    target = size_mb * 1024 * 1024
+    with open(path, 'w', encoding='utf-8') as f:
+        n = 0
+        while f.tell() < target:
+            n += 1
+            block = [f"# {n:02d}. " + " ".join(rng.choices(vocabulary, k=rng.randint(6, 16))) + "?"]
+            if rng.random() < 0.1:
+                block.append(f"[image: {n:03d}.png]")
+            correct = rng.randrange(4)
+            for i in range(4):
+                block.append(("*" if i == correct else "") + " ".join(rng.choices(vocabulary, k=rng.randint(3, 9))))
+            if rng.random() < 0.05:
+                block.append("INGEGNERIA INFORMATICA - eCampus - Data Stampa")
+            f.write("\n".join(block) + "\n\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "paniere_sintetico.txt"
+        write_synthetic_paniere(path, args.size_mb)
+        print(f"Paniere sintetico: {path.stat().st_size / 2**20:.0f} MB")
+
+        legacy_time, legacy_questions = timed(lambda: legacy_parse(path))
+        print(f"{'parse originale':<32} {legacy_time:8.2f} s  ({len(legacy_questions)} domande)")
+        del legacy_questions
+        parse_time, questions = timed(TextFileParser(path).parse)
+        print(f"{'parse a flusso':<32} {parse_time:8.2f} s  ({len(questions)} domande)")
+        del questions
+        count_time, count = timed(lambda: sum(1 for _ in TextFileParser(path).iter_questions()))
+        print(f"{'conteggio con iter_questions':<32} {count_time:8.2f} s  ({count} domande)")
+        first_time, first = timed(lambda: list(itertools.islice(TextFileParser(path).iter_questions(), 100)))
+        print(f"{'prime 100 domande':<32} {first_time * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
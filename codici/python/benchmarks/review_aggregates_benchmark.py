@@ -0,0 +1,76 @@
+"""
+Verifica gli aggregati dei ripassi (buffer degli ultimi ripassi per materia e finestra di ritenzione) contro
+la scansione completa del log, e misura il costo di un ripasso al crescere dello storico: con gli aggregati
+resta costante, con la scansione (implementazione originale) cresce con il log.
+
+Uso (da codici/python):  python -m benchmarks.review_aggregates_benchmark [--sizes 10000 100000 1000000]
+"""
+import argparse
+import datetime
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.storage import JsonStorage
+from app.services.review_aggregates import ReviewAggregates
+from benchmarks.bench_utils import timed
+from benchmarks.review_log_benchmark import SUBJECTS, synthetic_review_log, legacy_count
+
+RETENTION_DAYS = 7
+
+def legacy_recent(review_log: List[Dict[str, Any]], subject: str) -> Tuple[int, int]:
+    """Implementazione originale della ricalibrazione: filtro dell'intero log e ultimi 50 ripassi."""
+    recent = [r for r in review_log if r["subject"] == subject][-ReviewAggregates.RECENT_SIZE:]
+    return sum(1 for r in recent if r["is_correct"]), len(recent)
+
+def check(aggregates: ReviewAggregates, review_log: List[Dict[str, Any]]):
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=RETENTION_DAYS)
+    assert aggregates.window(RETENTION_DAYS) == legacy_count(review_log, cutoff)
+    for subject in SUBJECTS:
+        assert aggregates.window(RETENTION_DAYS, subject) == legacy_count(review_log, cutoff, subject), subject
+        assert aggregates.recent(subject) == legacy_recent(review_log, subject), subject
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--reviews", type=int, default=200, help="ripassi registrati per ogni misura")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'storico':>9} | {'ricostruzione (s)':>17} | {'scansione (ms/ripasso)':>22} | {'aggregati (ms/ripasso)':>22}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage = JsonStorage(Path(tmp_dir))
+            for review in synthetic_review_log(size):
+                storage.add_review(review)
+            rebuild_time, aggregates = timed(lambda: ReviewAggregates(storage, RETENTION_DAYS))
+            review_log = storage.get_reviews()
+            check(aggregates, review_log)
+
+            new_reviews = [{"timestamp": datetime.datetime.now().isoformat(), "subject": rng.choice(SUBJECTS), "is_correct": rng.random() < 0.8}
+                           for _ in range(args.reviews)]
+            cutoff = datetime.datetime.now() - datetime.timedelta(days=RETENTION_DAYS)
+
+            def legacy_reviews():
+                for review in new_reviews[:10]:  # La scansione è lenta: bastano pochi ripassi per la media
+                    review_log.append(review)
+                    legacy_recent(review_log, review["subject"]); legacy_count(review_log, cutoff)
+                return 10
+
+            def aggregated_reviews():
+                for review in new_reviews:
+                    storage.add_review(review); aggregates.add(review)
+                    aggregates.recent(review["subject"]); aggregates.window(RETENTION_DAYS)
+                return len(new_reviews)
+
+            legacy_time, legacy_count_done = timed(legacy_reviews)
+            aggregated_time, aggregated_count_done = timed(aggregated_reviews)
+            check(aggregates, storage.get_reviews())
+            print(f"{size:>9} | {rebuild_time:>17.2f} | {legacy_time / legacy_count_done * 1000:>22.2f} | {aggregated_time / aggregated_count_done * 1000:>22.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Confronta le finestre di ritenzione calcolate scandendo la lista dei ripassi (implementazione originale, con
+datetime.fromisoformat su ogni voce) con il ReviewLog a colonne e le sue ricerche binarie.
+
+Uso (da codici/python):  python -m benchmarks.review_log_benchmark [--reviews 1000000]
+Il log sintetico copre un anno di studio su otto materie.
+"""
+import argparse
+import datetime
+import random
+import sys
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.models.review_log import ReviewLog
+from benchmarks.bench_utils import timed
+
+SUBJECTS = [f"MATERIA {n}" for n in range(8)]
+
+def synthetic_review_log(reviews: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(days=365)
+    step = (end - start) / reviews
+    return [{"timestamp": (start + step * n).isoformat(), "subject": rng.choice(SUBJECTS), "is_correct": rng.random() < 0.8}
+            for n in range(reviews)]
+
+def legacy_count(review_log: List[Dict[str, Any]], cutoff: datetime.datetime, subject: Optional[str] = None) -> Tuple[int, int]:
+    """Implementazione originale: ogni timestamp viene convertito e confrontato."""
+    relevant = [r for r in review_log if (subject is None or r["subject"] == subject) and datetime.datetime.fromisoformat(r["timestamp"]) >= cutoff]
+    return sum(1 for r in relevant if r["is_correct"]), len(relevant)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=7, help="ampiezza della finestra di ritenzione")
+    args = parser.parse_args()
+
+    records = synthetic_review_log(args.reviews)
+    build_time, log = timed(lambda: ReviewLog.from_records(records))
+    print(f"Log sintetico: {args.reviews} ripassi (colonne costruite in {build_time:.2f} s)")
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=args.days)
+    print(f"{'finestra':<34} | {'scansione (ms)':>14} | {'colonne (ms)':>12} | {'ripassi':>9}")
+    rows = [("ritenzione globale", None)] + [(f"ritenzione {subject}", subject) for subject in SUBJECTS[:2]]
+    for name, subject in rows:
+        legacy_time, legacy_result = timed(lambda: legacy_count(records, cutoff, subject))
+        columnar_time, columnar_result = timed(lambda: log.count(cutoff, subject))
+        assert legacy_result == columnar_result, (legacy_result, columnar_result)
+        print(f"{name:<34} | {legacy_time * 1000:>14.2f} | {columnar_time * 1000:>12.4f} | {columnar_result[1]:>9}")
+
+    # Statistiche complete come in get_overall_stats: una finestra per materia più i totali
+    stats_time, _ = timed(lambda: ([log.count(cutoff, subject) for subject in SUBJECTS], log.count_by_subject(), log.count(cutoff)))
+    print(f"statistiche complete ({len(SUBJECTS)} materie): {stats_time * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
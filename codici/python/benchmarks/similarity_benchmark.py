@@ -0,0 +1,84 @@
+"""
+Confronta il calcolo della similarity_map a coppie (implementazione originale) con il motore TF-IDF sparso.
+
+Uso (da codici/python):  python -m benchmarks.similarity_benchmark [--sizes 1000 10000 50000] [--legacy-max 2000]
+Oltre --legacy-max il tempo dell'implementazione originale non viene misurato ma stimato per estrapolazione
+quadratica: nella tabella quei tempi e i relativi speedup sono marcati con "*" e spiegati in fondo.
+"""
+import argparse
+import collections
+import math
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.text_processing import SimilarityAnalyser
+from benchmarks.bench_utils import synthetic_questions, timed
+
+def legacy_similarity_map(analyser: SimilarityAnalyser) -> Dict[str, List[str]]:
+    """Implementazione originale: IDF con scansione di tutti i documenti e confronto coseno a coppie."""
+    def cosine(vec1: Dict, vec2: Dict) -> float:
+        intersection = set(vec1.keys()) & set(vec2.keys())
+        dot_product = sum(vec1[x] * vec2[x] for x in intersection)
+        magnitude = math.sqrt(sum(v**2 for v in vec1.values())) * math.sqrt(sum(v**2 for v in vec2.values()))
+        return dot_product / magnitude if magnitude != 0 else 0
+
+    docs = {q.id: analyser._preprocess(q.text + " " + " ".join(q.options)) for q in analyser.questions}
+    vocab = set(word for words in docs.values() for word in words)
+    if not vocab: return {}
+    num_docs = len(docs)
+    idf = {word: math.log(num_docs / (1 + sum(1 for doc_words in docs.values() if word in doc_words))) for word in vocab}
+    tfidf_vectors = {}
+    for doc_id, words in docs.items():
+        term_counts = collections.Counter(words)
+        if not words: continue
+        tfidf_vectors[doc_id] = {word: (count / len(words)) * idf[word] for word, count in term_counts.items()}
+
+    similarity_map = collections.defaultdict(list)
+    question_ids = list(analyser.question_map.keys())
+    for i in range(len(question_ids)):
+        for j in range(i + 1, len(question_ids)):
+            id1, id2 = question_ids[i], question_ids[j]
+            if id1 in tfidf_vectors and id2 in tfidf_vectors and cosine(tfidf_vectors[id1], tfidf_vectors[id2]) > analyser.SIMILARITY_THRESHOLD:
+                similarity_map[id1].append(id2)
+                similarity_map[id2].append(id1)
+    return dict(similarity_map)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'domande':>8} | {'originale (s)':>14} | {'sparso (s)':>10} | {'speedup':>8} | {'coppie':>8}")
+    legacy_reference = None  # (n, secondi) dell'ultima misura reale, per l'estrapolazione
+    estimated = False
+    for size in args.sizes:
+        analyser = SimilarityAnalyser(synthetic_questions(size))
+        sparse_time, sparse_map = timed(analyser.compute_similarity_map)
+        pairs = sum(len(v) for v in sparse_map.values()) // 2
+
+        if size <= args.legacy_max:
+            legacy_time, legacy_map = timed(lambda: legacy_similarity_map(analyser))
+            legacy_reference = (size, legacy_time)
+            if legacy_map != sparse_map:
+                print(f"ATTENZIONE: risultati diversi per {size} domande", file=sys.stderr)
+            legacy_str = f"{legacy_time:14.2f}"
+            speedup = f"{legacy_time / sparse_time:7.1f}x"
+        elif legacy_reference:
+            ref_size, ref_time = legacy_reference
+            legacy_time = ref_time * (size / ref_size) ** 2
+            legacy_str, speedup = f"{f'~{legacy_time:.0f}*':>14}", f"{f'~{legacy_time / sparse_time:.0f}x*':>8}"
+            estimated = True
+        else:
+            legacy_str, speedup = f"{'n/d':>14}", f"{'n/d':>8}"
+
+        print(f"{size:>8} | {legacy_str} | {sparse_time:10.2f} | {speedup} | {pairs:>8}")
+    if estimated:
+        ref_size, ref_time = legacy_reference
+        print(f"* stima, non misura: tempo originale estrapolato come {ref_time:.2f} s x (n / {ref_size})^2 dall'ultima misura reale (--legacy-max {args.legacy_max})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Confronta le query del deck SRS a scansione completa (implementazione originale) con l'indice per giorno di ripasso.
+
+Uso (da codici/python):  python -m benchmarks.srs_benchmark [--cards 100000]
+Il deck sintetico ha date di ripasso distribuite su un mese e circa il 5% di leech.
+"""
+import argparse
+import datetime
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.models.question_model import Question
+from app.services.srs_manager import SRSManager
+from benchmarks.bench_utils import timed
+
+class _DataPath:
+    """Sostituto minimo del ConfigManager: SRSManager ne usa solo il percorso dei dati e il backend di persistenza."""
+    def __init__(self, path: Path, storage: str = "json"): self.path = path; self.storage = storage
+    def get_data_path(self) -> Path: return self.path
+    def get_storage_backend(self) -> str: return self.storage
+
+def write_synthetic_deck(path: Path, cards: int, seed: int = 0):
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    deck = {}
+    for n in range(cards):
+        text = f"Domanda sintetica numero {n}?"
+        deck[text] = {"question": {"number": str(n + 1), "text": text, "options": ["Vero", "Falso"], "image_path": None, "correct_answer": "Vero"},
+                      "srs_level": rng.randint(0, 5), "next_review_date": (today + datetime.timedelta(days=rng.randint(-3, 30))).isoformat(),
+                      "lapses": SRSManager.LEECH_THRESHOLD if rng.random() < 0.05 else rng.randint(0, 3), "history": {"again": 0, "hard": 0, "good": 1, "easy": 0}}
+    path.write_text(json.dumps(deck), encoding='utf-8')
+
+def legacy_due_questions(manager: SRSManager) -> List[Question]:
+    """Implementazione originale: filtro di tutto il deck e ordinamento per data."""
+    today = datetime.date.today()
+    due_items = [item for item in manager.deck.values() if item.next_review_date <= today and item.lapses < manager.LEECH_THRESHOLD]
+    return [item.question for item in sorted(due_items, key=lambda x: x.next_review_date)]
+
+def legacy_leech_questions(manager: SRSManager) -> List[Question]:
+    return [item.question for item in manager.deck.values() if item.lapses >= manager.LEECH_THRESHOLD]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir)
+        write_synthetic_deck(data_path / "sintetica_srs_deck.json", args.cards)
+        load_time, manager = timed(lambda: SRSManager("Sintetica", None, 1.0, None, None, _DataPath(data_path)))
+
+    print(f"Deck sintetico: {args.cards} carte (caricamento e indicizzazione {load_time:.2f} s)")
+    for item in manager.deck.values():
+        item.question  # Le domande vengono create una volta sola, così entrambe le query partono alla pari
+    print(f"{'query':<28} | {'scansione (ms)':>14} | {'indice (ms)':>11} | {'risultati':>9}")
+    rows = [
+        ("carte da ripassare", lambda: legacy_due_questions(manager), manager.get_due_questions),
+        ("conteggio da ripassare", lambda: len(legacy_due_questions(manager)), manager.get_due_count),
+        ("domande leech", lambda: legacy_leech_questions(manager), manager.get_leech_questions),
+        ("conteggio leech", lambda: len(legacy_leech_questions(manager)), manager.get_leech_count),
+    ]
+    for name, legacy, indexed in rows:
+        legacy_time, legacy_result = timed(legacy)
+        indexed_time, indexed_result = timed(indexed)
+        count = indexed_result if isinstance(indexed_result, int) else len(indexed_result)
+        assert count == (legacy_result if isinstance(legacy_result, int) else len(legacy_result))
+        print(f"{name:<28} | {legacy_time * 1000:>14.2f} | {indexed_time * 1000:>11.2f} | {count:>9}")
+
+    # Aggiornamento dell'indice come dopo un ripasso (senza il salvataggio su disco)
+    rng = random.Random(1)
+    ids = rng.sample(list(manager.deck), min(args.updates, len(manager.deck)))
+    def reschedule():
+        for item_id in ids:
+            item = manager.deck[item_id]
+            manager._unindex_item(item_id, item)
+            item.next_review_date = datetime.date.today() + datetime.timedelta(days=rng.randint(1, 30))
+            manager._index_item(item_id, item)
+    update_time, _ = timed(reschedule)
+    print(f"{len(ids)} aggiornamenti dell'indice: {update_time * 1000:.1f} ms ({update_time / max(len(ids), 1) * 1e6:.1f} µs ciascuno)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Misura l'avvio a freddo dell'applicazione su un profilo sintetico: tempo fino alla dashboard interattiva
+(primo ciclo idle del mainloop, con i segnaposto) e tempo fino all'arrivo delle statistiche calcolate in
+background. Per confronto riporta quanto bloccherebbe la finestra il calcolo sincrono dei conteggi per materia
+(implementazione originale). Termina con codice 1 se la dashboard non è interattiva entro l'obiettivo.
+
+Uso (da codici/python, serve un display):  python -m benchmarks.startup_benchmark [--subjects 8] [--cards 5000] [--target 1.0]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.config_manager import ConfigManager
+from app.services.storage import Storage, JsonStorage
+from benchmarks.bench_utils import timed
+from benchmarks.review_log_benchmark import synthetic_review_log
+from benchmarks.srs_benchmark import write_synthetic_deck
+
+TARGET_SECONDS = 1.0  # Obiettivo per la dashboard interattiva dopo un avvio a freddo
+
+def write_synthetic_profile(data_path: Path, subjects: int, cards: int, reviews: int):
+    names = [f"MATERIA {n}" for n in range(subjects)]
+    settings = {"global_settings": {"retention_period_days": 7}}
+    for n, name in enumerate(names):
+        settings[name] = {"txt_path": "", "img_path": "", "exam_date": "", "status": "In Corso"}
+        write_synthetic_deck(data_path / Storage.deck_file_name(name), cards, seed=n)
+    (data_path / "quiz_settings.json").write_text(json.dumps(settings), encoding='utf-8')
+    review_log = synthetic_review_log(reviews)
+    for n, review in enumerate(review_log):
+        review["subject"] = names[n % subjects]
+    (data_path / "app_data.json").write_text(json.dumps({"user_stats": {}, "retention_trend": [], "review_log": review_log}), encoding='utf-8')
+    # Un primo caricamento archivia i mesi chiusi, come avviene una sola volta su un profilo reale
+    storage = JsonStorage(data_path)
+    storage.load_app_data()
+    storage.flush()
+
+def legacy_blocking_time(config_manager: ConfigManager) -> float:
+    """Tempo per cui la vecchia update_dashboard_and_srs_status teneva occupato il thread di Tk."""
+    from app.services.settings_manager import SettingsManager
+    from app.services.app_data_manager import AppDataManager
+    from app.services.deck_registry import DeckRegistry
+    settings_manager = SettingsManager(config_manager)
+    registry = DeckRegistry(AppDataManager(settings_manager, config_manager), settings_manager, config_manager)
+    subjects = settings_manager.get_subjects(status_filter="In Corso")
+    elapsed, _ = timed(lambda: (registry.total_due(subjects), registry.total_leeches(subjects)))
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--cards", type=int, default=5000, help="carte per materia")
+    parser.add_argument("--reviews", type=int, default=200000)
+    parser.add_argument("--target", type=float, default=TARGET_SECONDS, help="secondi entro cui la dashboard deve essere interattiva")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = Path(tmp_dir) / "dati"; data_path.mkdir()
+        write_synthetic_profile(data_path, args.subjects, args.cards, args.reviews)
+        ConfigManager.DEFAULT_JSON_DIR = Path(tmp_dir)
+        (Path(tmp_dir) / "config.json").write_text(json.dumps({"active_profile": "Bench", "profiles": {"Bench": {"data_path": str(data_path)}}}), encoding='utf-8')
+
+        # Stessa sequenza di main.launch_app, con i tempi rilevati sul thread di Tk
+        start = time.perf_counter()
+        from app.controllers.quiz_controller import QuizController
+        from app.services.settings_manager import SettingsManager
+        from app.views.main_view import MainView
+        config_manager = ConfigManager()
+        settings_manager = SettingsManager(config_manager)
+        main_window = MainView(start_callback=lambda mode: None, settings_callback=lambda: None, analysis_callback=lambda: None,
+                               tools_callbacks={"pdf_merger": lambda: None, "text_formatter": lambda: None, "image_snipper": lambda: None})
+        controller = QuizController(main_window, settings_manager, config_manager)
+        main_window.after_idle(controller.update_dashboard_and_srs_status)
+        times = {}
+        main_window.after_idle(lambda: times.setdefault("interattiva", time.perf_counter() - start))
+        update_dashboard = main_window.update_dashboard
+
+        def on_stats(stats):
+            update_dashboard(stats)
+            times["statistiche"] = time.perf_counter() - start
+            main_window.after(0, main_window.destroy)
+        main_window.update_dashboard = on_stats
+        main_window.mainloop()
+        controller.app_data_manager.storage.writer.flush()
+
+        blocking = legacy_blocking_time(ConfigManager())
+
+    print(f"Profilo sintetico: {args.subjects} materie da {args.cards} carte, {args.reviews} ripassi")
+    print(f"dashboard interattiva:            {times['interattiva'] * 1000:>8.1f} ms (obiettivo {args.target * 1000:.0f} ms)")
+    print(f"statistiche consegnate:           {times['statistiche'] * 1000:>8.1f} ms")
+    print(f"blocco del calcolo sincrono:      {blocking * 1000:>8.1f} ms (implementazione originale)")
+    if times["interattiva"] > args.target:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Preparazione delle materie all'avvio: costo della preparazione di una sessione (analisi del paniere e cache di
+similarità, come _background_analysis_and_setup) su una materia fredda, tempo della preparazione di tutte le
+materie in parallelo nel pool di processi di JobExecutor (una materia per core) contro la stessa preparazione in
+sequenza, e costo della preparazione di una sessione su una materia già pronta.
+
+Uso (da codici/python):  python -m benchmarks.warmup_benchmark [--subjects 4] [--size-mb 1]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.deck_cache import DeckCache
+from app.services.job_executor import JobExecutor
+from app.services.similarity_cache import SimilarityCache, SimilarityCacheView
+from app.services.text_processing import SimilarityAnalyser
+from benchmarks.bench_utils import timed
+from benchmarks.parser_benchmark import write_synthetic_paniere
+
+def session_setup(txt_path: Path, mode: str = SimilarityAnalyser.MODE_EXACT) -> int:
+    """Il lavoro di avvio di una sessione nel processo dell'applicazione: paniere, poi cache di similarità."""
+    analyser = SimilarityAnalyser(DeckCache(txt_path).load_questions(), mode)
+    similarity_map = SimilarityCache(SimilarityAnalyser.cache_path_for(txt_path, mode), SimilarityAnalyser.legacy_cache_path_for(txt_path, mode)).refresh(analyser)
+    count = len(similarity_map)
+    if isinstance(similarity_map, SimilarityCacheView):
+        similarity_map.close()
+    return count
+
+def copy_panieri(source: Path, directory: Path, subjects: int) -> List[Path]:
+    directory.mkdir()
+    paths = [directory / f"materia_{n}.txt" for n in range(subjects)]
+    for path in paths:
+        shutil.copy(source, path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=1, help="dimensione di ogni paniere sintetico")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = Path(tmp_dir) / "paniere.txt"
+        write_synthetic_paniere(source, args.size_mb)
+
+        serial = copy_panieri(source, Path(tmp_dir) / "sequenza", args.subjects)
+        cold_times = [timed(lambda: session_setup(path))[0] for path in serial]
+        print(f"avvio di una sessione su una materia fredda: {sum(cold_times) / len(cold_times):.2f} s "
+              f"(tutte le {args.subjects} materie in sequenza: {sum(cold_times):.2f} s)")
+
+        jobs = JobExecutor()
+        parallel = copy_panieri(source, Path(tmp_dir) / "parallelo", args.subjects)
+
+        def warm_up():
+            for job in [jobs.submit_process(SimilarityCache.refresh_deck, path, SimilarityAnalyser.MODE_EXACT) for path in parallel]:
+                job.result()
+        warm_time, _ = timed(warm_up)
+        print(f"preparazione in parallelo ({min(jobs.max_processes, args.subjects)} processi, avvio compreso): {warm_time:.2f} s")
+        warm_times = [timed(lambda: session_setup(path))[0] for path in parallel]
+        print(f"avvio di una sessione su una materia già pronta: {sum(warm_times) / len(warm_times) * 1000:.1f} ms")
+        jobs.shutdown()
+
+if __name__ == "__main__":
+    main()
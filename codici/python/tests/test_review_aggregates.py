@@ -0,0 +1,113 @@
+"""
+ReviewAggregates contro una scansione completa del log dello storage, dopo la ricostruzione e dopo add(), con
+ripassi a cavallo dei limiti della finestra di ritenzione, della mezzanotte e del cambio di mese (il backend
+JSON sposta i mesi chiusi nell'archivio compresso).
+
+Uso (da codici/python):  python -m pytest tests
+"""
+import sys
+import json
+import random
+import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.review_aggregates import ReviewAggregates
+from app.services.storage import Storage, JsonStorage, SqliteStorage
+
+SUBJECTS = ["ELETTROTECNICA", "FONDAMENTI DI INFORMATICA", "INGLESE"]
+WINDOWS = [1, 7, 30, 45]
+
+def boundary_timestamps(now: datetime.datetime) -> List[datetime.datetime]:
+    """Istanti attorno ai limiti delle finestre, alle mezzanotti recenti e all'inizio del mese corrente e del precedente."""
+    margin = datetime.timedelta(minutes=5)  # Largo rispetto al tempo tra il calcolo atteso e quello degli aggregati
+    stamps = []
+    for days in WINDOWS:
+        cutoff = now - datetime.timedelta(days=days)
+        stamps += [cutoff - margin, cutoff + margin]
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    for days in range(3):
+        day_start = midnight - datetime.timedelta(days=days)
+        stamps += [day_start - datetime.timedelta(microseconds=1), day_start]
+    month_start = midnight.replace(day=1)
+    previous_month_start = (month_start - datetime.timedelta(days=1)).replace(day=1)
+    for start in (month_start, previous_month_start):
+        stamps += [start - datetime.timedelta(microseconds=1), start, start + datetime.timedelta(microseconds=1)]
+    return [stamp for stamp in stamps if stamp < now - margin]
+
+def synthetic_log(now: datetime.datetime, count: int = 3000) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    stamps = [now - datetime.timedelta(seconds=rng.uniform(600, 80 * 86400)) for _ in range(count)] + boundary_timestamps(now)
+    return [{"timestamp": stamp.isoformat(), "subject": rng.choice(SUBJECTS), "is_correct": rng.random() < 0.7} for stamp in sorted(stamps)]
+
+def full_scan_window(storage: Storage, retention_days: int, subject: Optional[str] = None) -> Tuple[int, int]:
+    since = (datetime.datetime.now() - datetime.timedelta(days=retention_days)).isoformat()
+    relevant = [r for r in storage.get_reviews(subject) if r["timestamp"] >= since]
+    return sum(bool(r["is_correct"]) for r in relevant), len(relevant)
+
+def full_scan_recent(storage: Storage, subject: str) -> Tuple[int, int]:
+    recent = storage.get_reviews(subject)[-ReviewAggregates.RECENT_SIZE:]
+    return sum(bool(r["is_correct"]) for r in recent), len(recent)
+
+def assert_matches_full_scan(aggregates: ReviewAggregates, storage: Storage):
+    for retention_days in WINDOWS:
+        assert aggregates.window(retention_days) == full_scan_window(storage, retention_days)
+        for subject in SUBJECTS + ["MATERIA SENZA RIPASSI"]:
+            assert aggregates.window(retention_days, subject) == full_scan_window(storage, retention_days, subject)
+    for subject in SUBJECTS + ["MATERIA SENZA RIPASSI"]:
+        assert aggregates.recent(subject) == full_scan_recent(storage, subject)
+
+@pytest.fixture(params=[JsonStorage, SqliteStorage])
+def storage(request, tmp_path: Path) -> Storage:
+    log = synthetic_log(datetime.datetime.now())
+    (tmp_path / "app_data.json").write_text(json.dumps({"user_stats": {}, "review_log": log}), encoding='utf-8')
+    storage = request.param(tmp_path)  # SqliteStorage importa app_data.json all'apertura
+    storage.load_app_data()
+    assert len(storage.get_reviews()) == len(log)
+    return storage
+
+def test_json_log_spans_archive_and_current_month(tmp_path: Path):
+    now = datetime.datetime.now()
+    (tmp_path / "app_data.json").write_text(json.dumps({"user_stats": {}, "review_log": synthetic_log(now)}), encoding='utf-8')
+    storage = JsonStorage(tmp_path)
+    storage.load_app_data()
+    # Il log attraversa mesi chiusi (archiviati) e il mese in corso: le finestre leggono entrambi
+    assert storage.archive.months() and len(storage.review_log)
+    assert all(r["timestamp"] >= now.strftime("%Y-%m") for r in storage.review_log.records())
+
+def test_rebuild_matches_full_scan(storage: Storage):
+    assert_matches_full_scan(ReviewAggregates(storage, 7), storage)
+
+def test_add_matches_full_scan(storage: Storage):
+    aggregates = ReviewAggregates(storage, 7)
+    rng = random.Random(1)
+    # Oltre RECENT_SIZE ripassi per materia: i buffer circolari scartano i più vecchi
+    for _ in range(2 * ReviewAggregates.RECENT_SIZE * len(SUBJECTS)):
+        review = {"timestamp": datetime.datetime.now().isoformat(), "subject": rng.choice(SUBJECTS), "is_correct": rng.random() < 0.5}
+        storage.add_review(review)
+        aggregates.add(review)
+    assert_matches_full_scan(aggregates, storage)
+
+def test_add_first_review_of_new_subject(storage: Storage):
+    aggregates = ReviewAggregates(storage, 7)
+    review = {"timestamp": datetime.datetime.now().isoformat(), "subject": "NUOVA MATERIA", "is_correct": True}
+    storage.add_review(review)
+    aggregates.add(review)
+    assert aggregates.recent("NUOVA MATERIA") == (1, 1)
+    assert aggregates.window(7, "NUOVA MATERIA") == (1, 1)
+    assert_matches_full_scan(aggregates, storage)
+
+def test_rebuild_after_add_is_unchanged(storage: Storage):
+    aggregates = ReviewAggregates(storage, 30)
+    review = {"timestamp": datetime.datetime.now().isoformat(), "subject": SUBJECTS[0], "is_correct": False}
+    storage.add_review(review)
+    aggregates.add(review)
+    rebuilt = ReviewAggregates(storage, 30)
+    for retention_days in WINDOWS:
+        assert aggregates.window(retention_days) == rebuilt.window(retention_days)
+    for subject in SUBJECTS:
+        assert aggregates.recent(subject) == rebuilt.recent(subject)
@@ -0,0 +1,65 @@
+"""
+Tempo di risposta dei ripassi SRS: nella modalità ripasso le opzioni non si selezionano, quindi il tempo va misurato
+dalla domanda mostrata a "Mostra Risposta" (o alla valutazione) e deve arrivare positivo nel log dei ripassi.
+
+Uso (da codici/python):  python -m pytest tests
+"""
+import sys
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+pytest.importorskip("ttkthemes")  # Il controller importa la finestra principale
+
+from app.controllers.quiz_controller import QuizController
+from app.models.question_model import Question
+from app.models.session_model import QuizSession
+from app.services.app_data_manager import AppDataManager
+from app.services.config_manager import ConfigManager
+from app.services.settings_manager import SettingsManager
+from app.services.srs_manager import SRSManager
+
+SUBJECT = "MATERIA"
+
+class FakePracticeView:
+    def show_correct_answer(self, answer: str): pass
+    def switch_to_srs_feedback(self, show: bool): pass
+
+@pytest.fixture
+def controller(tmp_path: Path, monkeypatch) -> SimpleNamespace:
+    monkeypatch.setattr(ConfigManager, "DEFAULT_JSON_DIR", tmp_path / "config")
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "config.json").write_text(json.dumps({"active_profile": "P", "profiles": {"P": {"data_path": str(tmp_path)}}}), encoding='utf-8')
+    config_manager = ConfigManager()
+    settings_manager = SettingsManager(config_manager)
+    settings_manager.add_subject(SUBJECT)
+    app_data_manager = AppDataManager(settings_manager, config_manager)
+    srs_manager = SRSManager(SUBJECT, None, 1.0, app_data_manager, settings_manager, config_manager)
+    question = Question("01", "01. DOMANDA DI PROVA", ["A", "B"], "A")
+    srs_manager.add_or_update_from_exam(question)
+    # Solo lo stato che rate_srs_question e submit_or_show_answer usano, senza finestre
+    return SimpleNamespace(current_mode='review', active_questions=[question], current_question_index=0, session=QuizSession([question]),
+                           question_start_time=time.monotonic(), srs_manager=srs_manager, srs_session_results=[], current_subject=SUBJECT,
+                           practice_view=FakePracticeView(), analytics_snapshot=SimpleNamespace(record_review=lambda *args: None),
+                           next_question=lambda: None, storage=app_data_manager.storage)
+
+def last_latency(controller: SimpleNamespace) -> float:
+    return controller.storage.get_recent_reviews(SUBJECT, 1)[-1]["latency"]
+
+def test_review_rating_after_show_answer_logs_positive_latency(controller: SimpleNamespace):
+    time.sleep(0.02)
+    QuizController.submit_or_show_answer(controller)
+    time.sleep(0.3)
+    QuizController.rate_srs_question(controller, "medio")
+    # Il tempo è quello fino a "Mostra Risposta", non fino alla valutazione
+    assert 0.02 <= last_latency(controller) < 0.3
+
+def test_review_rating_without_show_answer_logs_positive_latency(controller: SimpleNamespace):
+    time.sleep(0.02)
+    QuizController.rate_srs_question(controller, "facile")
+    assert last_latency(controller) >= 0.02